@@ -0,0 +1,202 @@
+# -*- coding: utf-8 -*-
+"""
+对流指数：向量化整层计算 与 MetPy 逐气柱计算 对照 + 计时
+
+- 生成一批有对流潜势的合成廓线（湿边界层 + 条件不稳定层结 + 平流层等温层），
+  带随机扰动，使 CAPE 从 0 到数千 J/kg 都有
+- wrf_stability.convective_indices 一次算完（湿绝热段分别用 RK4 和假绝热查算表）
+- 抽样若干气柱用 MetPy 逐个算：
+    surface_based_cape_cin / mixed_layer_cape_cin / most_unstable_cape_cin,
+    lcl / lfc, lifted_index, k_index, total_totals_index
+  给出各指数的最大偏差和耗时，超过 TOLERANCE 时以非零状态退出
+
+WRF 的最低层常有轻微过饱和（Td > T）。MetPy 此时不截断，LCL 算在起点以下，
+湿绝热从 (p_lcl, T0) 出发；这里按饱和起点处理（Td0 取 min(Td0, T0)），
+所以参考值也把气块起点层的露点截到气温再交给 MetPy（混合层气块仍用原始露点做层平均）。
+
+用法：
+    python bench_convective_indices.py --shape 45,100,100 --sample 50
+    python bench_convective_indices.py --times 4 --shape 45,120,120 --sample 0   # 只计时
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import metpy.calc as mpcalc
+from metpy.units import units
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_thermo import G, Rd, dewpoint_from_vapor_pressure, vapor_pressure, ZERO_DEGC
+from wrf_stability import convective_indices
+from wrf_moist_adiabat import get_table
+
+# 与 MetPy 的允许偏差：(RK4, 查表)
+TOLERANCE = {
+    "mlcape": (0.1, 1.0), "mlcin": (0.01, 0.1),             # J/kg
+    "sbcape": (0.1, 1.0), "sbcin": (0.01, 0.1),
+    "mucape": (0.1, 1.0), "mucin": (0.01, 0.1),
+    "sblcl_p": (1e-6, 1e-6), "sblfc_p": (0.05, 0.5),        # hPa
+    "lifted_index": (0.05, 0.05),                           # K（MetPy 在 500 hPa 上插值气块廓线）
+    "k_index": (1e-6, 1e-6), "total_totals": (1e-6, 1e-6),
+}
+
+
+# =========================================================
+# 1. 合成廓线
+# =========================================================
+def make_convective_profiles(nt, nz, ny, nx, seed=0):
+    """
+    返回 (p hPa, tc degC, qv kg/kg, z m, hgt m)，形状 (T, Z, Y, X)，hgt 为 (Y, X)
+    """
+    rng = np.random.default_rng(seed)
+    shape2 = (nt, 1, ny, nx)
+
+    hgt = rng.uniform(0.0, 300.0, (ny, nx))
+    z = hgt[None, None] + np.linspace(20.0, 18000.0, nz)[None, :, None, None] * np.ones(shape2)
+    z_agl = z - hgt
+
+    t_sfc = rng.uniform(22.0, 33.0, shape2)
+    lapse = rng.uniform(5.5, 8.0, shape2)           # K/km
+    z_trop = rng.uniform(12000.0, 15000.0, shape2)
+    tc = t_sfc - lapse * np.minimum(z_agl, z_trop) / 1000.0
+    tc += rng.normal(0.0, 0.4, tc.shape)
+
+    # 湿边界层 + 向上指数衰减
+    q_sfc = rng.uniform(0.006, 0.020, shape2)
+    qv = q_sfc * np.exp(-z_agl / rng.uniform(1800.0, 3000.0, shape2))
+    qv = np.maximum(qv, 1e-6)
+
+    # 静力平衡积分气压
+    p_sfc = 1013.25 * np.exp(-hgt / 8000.0)
+    tv = (tc + ZERO_DEGC) * (1.0 + 0.61 * qv)
+    dz = np.diff(z, axis=1)
+    tv_mid = 0.5 * (tv[:, 1:] + tv[:, :-1])
+    lnp = np.log(p_sfc)[None, None] - np.concatenate(
+        [np.zeros(shape2), np.cumsum(G * dz / (Rd * tv_mid), axis=1)], axis=1)
+    p = np.exp(lnp)
+
+    # 不能过饱和
+    td_k = dewpoint_from_vapor_pressure(vapor_pressure(p, qv))
+    qv = np.where(td_k > tc + ZERO_DEGC, qv * 0.95, qv)
+
+    return p, tc, qv, z, hgt
+
+
+# =========================================================
+# 2. MetPy 逐气柱参考
+# =========================================================
+def metpy_column(p, tc, qv):
+    P = p * units.hPa
+    T = tc * units.degC
+    Td = mpcalc.dewpoint(mpcalc.vapor_pressure(P, qv * units("kg/kg"))).to("degC")
+    ref = {}
+    # 混合层气块用原始露点做层平均
+    ref["mlcape"], ref["mlcin"] = (v.m for v in mpcalc.mixed_layer_cape_cin(P, T, Td))
+
+    # 最不稳定层按截断后的露点选，起点露点截断、其上环境露点不变
+    k = mpcalc.most_unstable_parcel(P, T, np.minimum(Td.m, tc) * units.degC)[3]
+    td = Td.m[k:].copy()
+    td[0] = min(td[0], tc[k])
+    pp, tt, dd, prof = mpcalc.parcel_profile_with_lcl(P[k:], T[k:], td * units.degC)
+    ref["mucape"], ref["mucin"] = (v.m for v in mpcalc.cape_cin(pp, tt, dd, prof))
+
+    # 过饱和起点按饱和处理（见模块说明）
+    td = Td.m.copy()
+    td[0] = min(td[0], tc[0])
+    Td = td * units.degC
+
+    ref["sbcape"], ref["sbcin"] = (v.m for v in mpcalc.surface_based_cape_cin(P, T, Td))
+
+    ref["sblcl_p"] = mpcalc.lcl(P[0], T[0], Td[0])[0].m
+
+    # CAPE 所用的 LFC：虚温廓线、取最低的一个（cape_cin 内部的做法）
+    pp, tt, dd, prof = mpcalc.parcel_profile_with_lcl(P, T, Td)
+    p_lcl = mpcalc.lcl(pp[0], tt[0], dd[0])[0]
+    w = np.where(pp > p_lcl, mpcalc.saturation_mixing_ratio(pp[0], dd[0]),
+                 mpcalc.saturation_mixing_ratio(pp, prof))
+    tv_env = mpcalc.virtual_temperature_from_dewpoint(pp, tt, dd)
+    tv_par = mpcalc.virtual_temperature(prof, w)
+    ref["sblfc_p"] = mpcalc.lfc(pp, tv_env, dd, parcel_temperature_profile=tv_par, which="bottom")[0].m
+
+    prof = mpcalc.parcel_profile(P, T[0], Td[0])
+    ref["lifted_index"] = np.asarray(mpcalc.lifted_index(P, T, prof).m).item()
+    ref["k_index"] = mpcalc.k_index(P, T, Td).m
+    ref["total_totals"] = mpcalc.total_totals_index(P, T, Td).m
+    return {k: float(np.asarray(v).squeeze()) for k, v in ref.items()}
+
+
+# =========================================================
+# 3. 主程序
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="对流指数向量化与 MetPy 对照")
+    parser.add_argument("--times", type=int, default=1, help="时次数")
+    parser.add_argument("--shape", default="45,100,100", help="nz,ny,nx")
+    parser.add_argument("--sample", type=int, default=50, help="MetPy 抽样气柱数，0 表示只计时")
+    args = parser.parse_args()
+
+    nz, ny, nx = (int(s) for s in args.shape.split(","))
+    p, tc, qv, z, hgt = make_convective_profiles(args.times, nz, ny, nx)
+    n_col = args.times * ny * nx
+
+    t0 = time.perf_counter()
+    res_rk4 = convective_indices(p, tc, qv, z=z, hgt=hgt, axis=1)
+    t_rk4 = time.perf_counter() - t0
+
+    table = get_table()
+    t0 = time.perf_counter()
+    res_tab = convective_indices(p, tc, qv, z=z, hgt=hgt, axis=1, table=table)
+    t_tab = time.perf_counter() - t0
+
+    print(f"气柱数: {n_col}（{args.times} 个时次 x {ny} x {nx}，{nz} 层）")
+    print(f"向量化 RK4 : {t_rk4:.2f} s")
+    print(f"向量化查表: {t_tab:.2f} s")
+    print(f"SB CAPE 范围: {np.nanmin(res_tab['sbcape']):.0f} ~ {np.nanmax(res_tab['sbcape']):.0f} J/kg")
+
+    if args.sample <= 0:
+        return
+
+    rng = np.random.default_rng(1)
+    picks = rng.choice(n_col, size=min(args.sample, n_col), replace=False)
+
+    diffs = {"rk4": {}, "table": {}}
+    t0 = time.perf_counter()
+    for k in picks:
+        it, rem = divmod(int(k), ny * nx)
+        j, i = divmod(rem, nx)
+        ref = metpy_column(p[it, :, j, i], tc[it, :, j, i], qv[it, :, j, i])
+        for tag, res in (("rk4", res_rk4), ("table", res_tab)):
+            for name, v_ref in ref.items():
+                v = res[name][it, j, i]
+                if np.isnan(v_ref) and np.isnan(v):
+                    d = 0.0
+                else:
+                    d = abs(v - v_ref)
+                diffs[tag].setdefault(name, []).append(d)
+    t_ref = time.perf_counter() - t0
+
+    print(f"MetPy : {len(picks)} 个气柱，耗时 {t_ref:.2f} s（折合全部约 {t_ref / len(picks) * n_col:.0f} s）\n")
+    print(f"{'index':>14} {'max|d| RK4':>12} {'max|d| table':>13} {'tol':>14}")
+    failed = []
+    for name in diffs["rk4"]:
+        d_rk4, d_tab = np.nanmax(diffs["rk4"][name]), np.nanmax(diffs["table"][name])
+        tol_rk4, tol_tab = TOLERANCE[name]
+        ok = d_rk4 <= tol_rk4 and d_tab <= tol_tab
+        print(f"{name:>14} {d_rk4:12.3g} {d_tab:13.3g} {tol_rk4:6.2g} / {tol_tab:<6.2g}{'' if ok else '  <-- 超出'}")
+        if not ok:
+            failed.append(name)
+    if failed:
+        raise SystemExit(f"与 MetPy 的偏差超过允许值: {failed}")
+
+
+if __name__ == "__main__":
+    main()
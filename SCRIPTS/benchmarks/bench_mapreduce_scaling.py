@@ -0,0 +1,156 @@
+# -*- coding: utf-8 -*-
+"""
+map-reduce 时间平均的并行扩展性测试
+
+对同一批 wrfout 文件，分别用 1, 2, 4, ... 个进程跑一遍
+“读三维场 -> 取 120E 附近剖面 -> 累加” 的 map-reduce，
+输出耗时、加速比和并行效率，并检查各进程数的结果和串行完全一致。
+
+加速比在某个进程数之后变平，一般说明已经到了磁盘 / 网络存储的 I/O 上限。
+
+用法：
+    # 真实数据
+    python bench_mapreduce_scaling.py --files "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+    # 没有数据时，生成一批合成 wrfout 文件来测试
+    python bench_mapreduce_scaling.py --synthetic 64 --shape 45,300,300
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+import tempfile
+
+import numpy as np
+from netCDF4 import Dataset
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_mapreduce import MeanAccumulator, map_reduce_files, resolve_workers
+
+
+BENCH_VARS = ["T", "U", "V", "QVAPOR", "P", "PB"]
+
+
+# =========================================================
+# 1. 合成 wrfout 文件
+# =========================================================
+def make_synthetic_files(out_dir, n_files, nz, ny, nx):
+    rng = np.random.default_rng(0)
+    files = []
+
+    for k in range(n_files):
+        path = os.path.join(out_dir, f"wrfout_d01_2022-11-{26 + k // 8:02d}_{(k % 8) * 3:02d}_00_00")
+        with Dataset(path, "w") as nc:
+            nc.createDimension("Time", None)
+            nc.createDimension("bottom_top", nz)
+            nc.createDimension("south_north", ny)
+            nc.createDimension("west_east", nx)
+
+            lon = np.linspace(110.0, 130.0, nx)[None, :].repeat(ny, axis=0)
+            v = nc.createVariable("XLONG", "f4", ("Time", "south_north", "west_east"))
+            v[0] = lon
+
+            for name in BENCH_VARS:
+                v = nc.createVariable(name, "f4", ("Time", "bottom_top", "south_north", "west_east"))
+                v[0] = rng.standard_normal((nz, ny, nx)).astype(np.float32)
+
+        files.append(path)
+
+    return files
+
+
+# =========================================================
+# 2. map 函数：读三维场，取固定经度剖面，累加
+# =========================================================
+def accumulate_bench_sections(file_chunk, lon_section=120.0):
+    acc = MeanAccumulator()
+
+    for f in file_chunk:
+        with Dataset(f) as nc:
+            lons = np.asarray(nc.variables["XLONG"][0], dtype=np.float64)
+            ny = lons.shape[0]
+            jj = np.arange(ny)
+            i_sec = np.argmin(np.abs(lons - lon_section), axis=1)
+
+            for name in BENCH_VARS:
+                arr3d = np.asarray(nc.variables[name][0], dtype=np.float64)
+                acc.add(name, arr3d[:, jj, i_sec])
+
+        acc.mark_file(f)
+
+    return acc
+
+
+# =========================================================
+# 3. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="map-reduce 并行扩展性测试")
+    parser.add_argument("--files", default=None, help="wrfout 通配符路径")
+    parser.add_argument("--synthetic", type=int, default=0, help="生成合成文件数")
+    parser.add_argument("--shape", default="45,200,200", help="合成文件 nz,ny,nx")
+    parser.add_argument("--workers-list", default=None,
+                        help="逗号分隔的进程数，默认 1,2,4,... 直到 CPU 核数；"
+                             "串行（1）总会先跑一次作为加速比的基准")
+    args = parser.parse_args()
+
+    tmp = None
+    if args.files:
+        files = sorted(glob.glob(args.files))
+    elif args.synthetic > 0:
+        nz, ny, nx = (int(s) for s in args.shape.split(","))
+        tmp = tempfile.TemporaryDirectory(prefix="bench_wrf_")
+        print(f"生成 {args.synthetic} 个合成文件 ({nz}x{ny}x{nx}) 到 {tmp.name}")
+        files = make_synthetic_files(tmp.name, args.synthetic, nz, ny, nx)
+    else:
+        parser.error("需要 --files 或 --synthetic")
+
+    if len(files) == 0:
+        raise FileNotFoundError("没有找到任何文件。")
+
+    if args.workers_list:
+        workers_list = [int(s) for s in args.workers_list.split(",")]
+        # 加速比和并行效率都相对串行计算
+        workers_list = [1] + [w for w in workers_list if w != 1]
+    else:
+        n_cpu = resolve_workers(0)
+        workers_list = [1]
+        while workers_list[-1] * 2 <= n_cpu:
+            workers_list.append(workers_list[-1] * 2)
+
+    print(f"文件数: {len(files)}，测试进程数: {workers_list}\n")
+
+    ref = None
+    t_serial = None
+    print(f"{'workers':>8} {'time(s)':>10} {'speedup':>9} {'eff':>7}")
+
+    for w in workers_list:
+        t0 = time.perf_counter()
+        acc = map_reduce_files(files, accumulate_bench_sections, workers=w, verbose=False)
+        dt = time.perf_counter() - t0
+
+        if ref is None:
+            ref = acc
+            t_serial = dt
+        else:
+            for name in BENCH_VARS:
+                if not np.allclose(acc.mean(name), ref.mean(name), equal_nan=True):
+                    raise AssertionError(f"workers={w} 时 {name} 结果与串行不一致")
+
+        speedup = t_serial / dt
+        print(f"{w:>8d} {dt:>10.2f} {speedup:>9.2f} {speedup / w:>7.2f}")
+
+    if tmp is not None:
+        tmp.cleanup()
+
+
+if __name__ == "__main__":
+    main()
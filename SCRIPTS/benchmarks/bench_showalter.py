@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+向量化 Showalter Index 与 MetPy 逐气柱结果对照 + 计时
+
+- 生成一批类 WRF 的合成廓线（eta 层气压随地面气压变化，温度带随机扰动）
+- wrf_stability.showalter_index 一次算完整个区域（湿绝热段分别用 RK4 积分和假绝热查算表）
+- 抽样若干气柱用 mpcalc.showalter_index 逐个算，给出最大偏差和两者耗时
+
+用法：
+    python bench_showalter.py --shape 45,120,120 --sample 200
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import metpy.calc as mpcalc
+from metpy.units import units
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_stability import showalter_index
+from wrf_moist_adiabat import get_table
+
+
+# =========================================================
+# 1. 合成廓线
+# =========================================================
+def make_synthetic_profiles(nz, ny, nx, seed=0):
+    """
+    返回 (p hPa, t degC, td degC)，形状 (nz, ny, nx)，气压随下标减小
+    """
+    rng = np.random.default_rng(seed)
+    psfc = rng.uniform(960.0, 1015.0, (ny, nx))
+    eta = np.linspace(1.0, 0.02, nz)[:, None, None]
+    p = 50.0 + (psfc - 50.0) * eta
+
+    # 约 6.5 K/km 递减，标高取 8 km
+    z_km = -8.0 * np.log(p / psfc)
+    t = 25.0 + rng.normal(0.0, 3.0, (ny, nx)) - 6.5 * z_km + rng.normal(0.0, 0.5, p.shape)
+    t = np.maximum(t, -70.0)
+    td = t - rng.uniform(0.5, 15.0, (ny, nx))
+    return p, t, td
+
+
+# =========================================================
+# 2. 主程序
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="向量化 SI 与 MetPy 对照")
+    parser.add_argument("--shape", default="45,120,120", help="nz,ny,nx")
+    parser.add_argument("--sample", type=int, default=200, help="MetPy 抽样气柱数")
+    parser.add_argument("--tol", type=float, default=1e-3, help="允许的最大偏差（K）")
+    args = parser.parse_args()
+
+    nz, ny, nx = (int(s) for s in args.shape.split(","))
+    p, t, td = make_synthetic_profiles(nz, ny, nx)
+
+    t0 = time.perf_counter()
+    si = showalter_index(p, t, td, axis=0, log_interp=False)
+    t_vec = time.perf_counter() - t0
+    print(f"向量化 RK4 : {ny}x{nx} 个气柱，耗时 {t_vec:.3f} s")
+
+    table = get_table()
+    t0 = time.perf_counter()
+    si_tab = showalter_index(p, t, td, axis=0, log_interp=False, table=table)
+    t_tab = time.perf_counter() - t0
+    print(f"向量化查表: {ny}x{nx} 个气柱，耗时 {t_tab:.3f} s")
+
+    rng = np.random.default_rng(1)
+    n = min(args.sample, ny * nx)
+    picks = rng.choice(ny * nx, size=n, replace=False)
+
+    t0 = time.perf_counter()
+    diffs = []
+    diffs_tab = []
+    for k in picks:
+        j, i = divmod(int(k), nx)
+        ref = mpcalc.showalter_index(p[:, j, i] * units.hPa,
+                                     t[:, j, i] * units.degC,
+                                     td[:, j, i] * units.degC)
+        diffs.append(abs(np.asarray(ref.m).item() - si[j, i]))
+        diffs_tab.append(abs(np.asarray(ref.m).item() - si_tab[j, i]))
+    t_ref = time.perf_counter() - t0
+
+    max_diff = float(np.nanmax(diffs))
+    max_diff_tab = float(np.nanmax(diffs_tab))
+    print(f"MetPy : {n} 个气柱，耗时 {t_ref:.3f} s（折合全区域约 {t_ref / n * ny * nx:.1f} s）")
+    print(f"最大偏差: RK4 {max_diff:.2e} K，查表 {max_diff_tab:.2e} K")
+
+    if not max(max_diff, max_diff_tab) <= args.tol:
+        raise SystemExit(f"偏差超过 {args.tol} K")
+
+
+if __name__ == "__main__":
+    main()
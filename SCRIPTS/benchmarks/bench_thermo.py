@@ -0,0 +1,113 @@
+# -*- coding: utf-8 -*-
+"""
+wrf_thermo.thermo_fields（无单位）与 MetPy（pint 数组）对照 + 计时
+
+对同一批 (T, Z, Y, X) 合成廓线分别计算 e、Td、RH、θe、Tv、饱和混合比、
+最低层气块温度，给出最大偏差和两者耗时，超过 TOLERANCE 时以非零状态退出。
+气块温度 MetPy 只能逐气柱算，抽样对照；起点过饱和（Td > T）时 wrf_thermo 按饱和处理，
+参考值也把起点露点截到气温再交给 MetPy（见 bench_convective_indices.py）。
+
+用法：
+    python bench_thermo.py --times 2 --shape 45,100,100 --sample 20
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+import metpy.calc as mpcalc
+from metpy.units import units
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+sys.path.insert(0, current_dir)
+
+from wrf_thermo import ZERO_DEGC, thermo_fields
+from wrf_moist_adiabat import get_table
+from bench_convective_indices import make_convective_profiles
+
+# 与 MetPy 的允许最大偏差（t_parcel 为查表的湿绝热段，K）
+TOLERANCE = {"e": 1e-9, "td": 1e-9, "rh": 1e-9, "theta_e": 1e-8, "tv": 1e-9, "ws": 1e-12,
+             "t_parcel": 0.01}
+
+
+# =========================================================
+# 1. MetPy 整块参考
+# =========================================================
+def metpy_fields(p, tc, qv):
+    P = p * units.hPa
+    T = (tc + ZERO_DEGC) * units.K
+    w = qv * units("kg/kg")
+
+    e = mpcalc.vapor_pressure(P, w)
+    td = mpcalc.dewpoint(e)
+    return {
+        "e": e.m_as("hPa"),
+        "td": td.m_as("K"),
+        "rh": mpcalc.relative_humidity_from_mixing_ratio(P, T, w).m_as(""),
+        "theta_e": mpcalc.equivalent_potential_temperature(P, T, td).m_as("K"),
+        "tv": mpcalc.virtual_temperature(T, w).m_as("K"),
+        "ws": mpcalc.saturation_mixing_ratio(P, T).m_as("kg/kg"),
+    }
+
+
+# =========================================================
+# 2. 主程序
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="无单位热力学派生量与 MetPy 对照")
+    parser.add_argument("--times", type=int, default=2, help="时次数")
+    parser.add_argument("--shape", default="45,100,100", help="nz,ny,nx")
+    parser.add_argument("--sample", type=int, default=20, help="气块温度抽样对照的气柱数")
+    args = parser.parse_args()
+
+    nz, ny, nx = (int(s) for s in args.shape.split(","))
+    p, tc, qv, _, _ = make_convective_profiles(args.times, nz, ny, nx)
+    names = ("e", "td", "rh", "theta_e", "tv", "ws")
+
+    t0 = time.perf_counter()
+    ours = thermo_fields(p, tc + ZERO_DEGC, qv, names=names)
+    t_ours = time.perf_counter() - t0
+
+    t0 = time.perf_counter()
+    ref = metpy_fields(p, tc, qv)
+    t_ref = time.perf_counter() - t0
+
+    print(f"数组形状: {p.shape}")
+    print(f"thermo_fields: {t_ours:.3f} s    MetPy: {t_ref:.3f} s    ({t_ref / t_ours:.1f}x)")
+    max_diff = {}
+    for name in names:
+        max_diff[name] = np.nanmax(np.abs(ours[name] - ref[name]))
+        print(f"  {name:>8}: max|d| = {max_diff[name]:.3g}")
+
+    # 气块温度：整块查表 vs 逐气柱 mpcalc.parcel_profile
+    t0 = time.perf_counter()
+    tp = thermo_fields(p, tc + ZERO_DEGC, qv, names=["t_parcel"], axis=1, table=get_table())["t_parcel"]
+    print(f"t_parcel（查表，整块）: {time.perf_counter() - t0:.3f} s")
+
+    rng = np.random.default_rng(1)
+    diffs = []
+    for _ in range(args.sample):
+        it, j, i = rng.integers(args.times), rng.integers(ny), rng.integers(nx)
+        P = p[it, :, j, i] * units.hPa
+        td0 = mpcalc.dewpoint(mpcalc.vapor_pressure(P[0], qv[it, 0, j, i] * units("kg/kg"))).m_as("degC")
+        td0 = min(td0, tc[it, 0, j, i]) * units.degC
+        prof = mpcalc.parcel_profile(P, tc[it, 0, j, i] * units.degC, td0).m_as("K")
+        diffs.append(np.nanmax(np.abs(prof - tp[it, :, j, i])))
+    if diffs:
+        max_diff["t_parcel"] = max(diffs)
+        print(f"  t_parcel: {len(diffs)} 个气柱 max|d| = {max(diffs):.3g} K")
+
+    failed = [name for name, d in max_diff.items() if not d <= TOLERANCE[name]]
+    if failed:
+        raise SystemExit(f"与 MetPy 的偏差超过允许值: {failed}")
+
+
+if __name__ == "__main__":
+    main()
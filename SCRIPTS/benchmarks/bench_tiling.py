@@ -0,0 +1,103 @@
+# -*- coding: utf-8 -*-
+"""
+分块并行（wrf_tiling.run_tiled）与整块串行 对照 + 计时
+
+- SI：bench_showalter 的合成廓线，(Z, Y, X)
+- 对流指数：bench_convective_indices 的合成廓线，(T, Z, Y, X)，hgt 为 (Y, X)
+分别用 1 个进程整块算和 -j 个进程分块算，检查结果逐点一致（NaN 位置也一致），给出加速比
+
+用法：
+    python bench_tiling.py -j 4 --shape 45,240,240
+    python bench_tiling.py -j 8 --shape 45,200,200 --times 2 --tile 50,50
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+sys.path.insert(0, current_dir)
+
+from wrf_stability import showalter_index, convective_indices
+from wrf_moist_adiabat import get_table
+from wrf_mapreduce import add_workers_argument, resolve_workers
+from wrf_tiling import run_tiled
+from bench_showalter import make_synthetic_profiles
+from bench_convective_indices import make_convective_profiles
+
+
+# =========================================================
+# 1. 对照
+# =========================================================
+def compare(name, serial, tiled):
+    """
+    逐点相同（NaN 视为相同）时返回 True
+    """
+    if not isinstance(serial, dict):
+        serial, tiled = {name: serial}, {name: tiled}
+    ok = True
+    for key in serial:
+        a, b = np.asarray(serial[key]), np.asarray(tiled[key])
+        same = a.shape == b.shape and np.array_equal(a, b, equal_nan=True)
+        if not same:
+            print(f"  {key}: 不一致，max|d| = {np.nanmax(np.abs(a - b)):.3g}")
+            ok = False
+    return ok
+
+
+def timed(func, inputs, workers, tile_shape, **kwargs):
+    t0 = time.perf_counter()
+    out = run_tiled(func, inputs, workers=workers, tile_shape=tile_shape, verbose=False, **kwargs)
+    return out, time.perf_counter() - t0
+
+
+# =========================================================
+# 2. 主程序
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="分块并行与串行对照")
+    parser.add_argument("--shape", default="45,200,200", help="nz,ny,nx")
+    parser.add_argument("--times", type=int, default=1, help="对流指数的时次数")
+    parser.add_argument("--tile", default=None, help="块大小 ty,tx；默认按进程数切整行条带")
+    add_workers_argument(parser, default=0)
+    args = parser.parse_args()
+
+    nz, ny, nx = (int(s) for s in args.shape.split(","))
+    workers = resolve_workers(args.workers)
+    tile_shape = tuple(int(s) for s in args.tile.split(",")) if args.tile else None
+    table = get_table()
+    ok = True
+
+    print(f"网格 {ny}x{nx}，{nz} 层，{workers} 个进程")
+
+    # ---------------- SI ----------------
+    p, t, td = make_synthetic_profiles(nz, ny, nx)
+    inputs = {"p_hpa": p, "t_c": t, "td_c": td}
+    si_1, t_1 = timed(showalter_index, inputs, 1, None, axis=0, log_interp=False, table=table)
+    si_n, t_n = timed(showalter_index, inputs, workers, tile_shape, axis=0, log_interp=False, table=table)
+    print(f"SI       : 串行 {t_1:.2f} s，分块 {t_n:.2f} s，加速 {t_1 / t_n:.2f}x")
+    ok &= compare("si", si_1, si_n)
+
+    # ---------------- 对流指数 ----------------
+    p, tc, qv, z, hgt = make_convective_profiles(args.times, nz, ny, nx)
+    inputs = {"p_hpa": p, "t_c": tc, "qv": qv, "z": z, "hgt": hgt}
+    res_1, t_1 = timed(convective_indices, inputs, 1, None, axis=1, table=table)
+    res_n, t_n = timed(convective_indices, inputs, workers, tile_shape, axis=1, table=table)
+    print(f"对流指数 : 串行 {t_1:.2f} s，分块 {t_n:.2f} s，加速 {t_1 / t_n:.2f}x")
+    ok &= compare("convective", res_1, res_n)
+
+    if not ok:
+        raise SystemExit("分块结果与串行不一致")
+    print("分块结果与串行逐点一致")
+
+
+if __name__ == "__main__":
+    main()
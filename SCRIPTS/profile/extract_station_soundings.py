@@ -0,0 +1,108 @@
+# -*- coding: utf-8 -*-
+"""
+批量提取站点探空廓线，写成一个 station × Time × level 的站点库
+
+- 站点表（id, lat, lon）在第一个 wrfout 上定位一次，区域外的站点直接剔除
+- 之后每个文件只读这些站点的气柱（wrf_stations.read_station_profiles）
+- 站点库：气压 / 温度 / 露点 / 地球坐标 u、v / 高度，之后画探空图直接读库
+
+用法：
+    python extract_station_soundings.py
+    python extract_station_soundings.py --stations my_stations.csv --out soundings.nc
+    python extract_station_soundings.py --resume        # 已写入的时次跳过，只追加新文件
+"""
+
+import os
+import sys
+import time
+import argparse
+
+import numpy as np
+from netCDF4 import Dataset
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader
+from wrf_stations import read_station_list, locate_stations, StationStore, extract_file
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+default_stations = os.path.join(current_dir, "stations.csv")
+default_out = os.path.join(current_dir, "wrf_station_soundings", "station_soundings.nc")
+
+
+# =========================================================
+# 2. 建库：定位站点
+# =========================================================
+def create_store(first_file, stations, out_nc):
+    with Dataset(first_file) as nc:
+        lat = np.asarray(nc.variables["XLAT"][0], dtype=np.float64)
+        lon = np.asarray(nc.variables["XLONG"][0], dtype=np.float64)
+        n_level = len(nc.dimensions["bottom_top"])
+
+    loc = locate_stations(stations, lat, lon)
+    inside = loc["inside"]
+    for s, ok, d in zip(stations, inside, loc["dist_km"]):
+        if not ok:
+            print(f"站点 {s.id} ({s.lat:.2f}, {s.lon:.2f}) 不在区域内（最近格点 {d:.1f} km），跳过")
+
+    stations = [s for s, ok in zip(stations, inside) if ok]
+    if len(stations) == 0:
+        raise ValueError("没有站点落在模式区域内。")
+    loc = {name: arr[inside] for name, arr in loc.items()}
+
+    return StationStore.create(out_nc, stations, loc, n_level, source=os.path.dirname(first_file))
+
+
+# =========================================================
+# 3. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="多站点探空廓线批量提取")
+    parser.add_argument("--stations", default=default_stations, help="站点表 CSV（id,lat,lon）")
+    parser.add_argument("--out", default=default_out, help="输出站点库 netCDF")
+    parser.add_argument("--resume", action="store_true", help="在已有站点库后追加，已写入的时次跳过")
+    parser.add_argument("--box-factor", type=float, default=16.0,
+                        help="包围矩形格点数 <= 站数 x 该值时整块读，否则逐站读")
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+
+    if args.resume and os.path.exists(args.out):
+        store = StationStore.open_append(args.out)
+        times = store.times()
+        after = times[-1] if times else None
+        print(f"续写: {args.out}，已有 {len(times)} 个时次")
+    else:
+        stations = read_station_list(args.stations)
+        store = create_store(wrf_files[0], stations, args.out)
+        after = None
+
+    loc = store.locations()
+    t0 = time.perf_counter()
+    n_written = 0
+    try:
+        for wrf_file in wrf_files:
+            n = extract_file(wrf_file, loc, store, after=after, box_factor=args.box_factor)
+            n_written += n
+            if n:
+                print(f"处理: {os.path.basename(wrf_file)}（{n} 个时次）")
+    finally:
+        store.close()
+
+    print(f"完成: {len(loc['j'])} 个站，新写入 {n_written} 个时次，用时 {time.perf_counter() - t0:.1f} s")
+    print(f"已保存: {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,206 @@
+# -*- coding: utf-8 -*-
+"""
+区域平均 / 分位数垂直廓线（温度、风速、水凝物）
+
+对一个经纬度框（默认杭州附近 [118E, 122E, 28.5N, 31.5N]）和一段时间：
+- 每个文件只读区域窗口（wrf_profilestats.region_window）
+- 插值到公共离地高度（--coord height）或公共气压层（--coord pressure），
+  每个时次的插值权重只算一次，所有变量共用
+- 逐层流式累加 均值 / 标准差 / 分位数，文件之间用 map_reduce_files 并行
+- 输出一个很小的 netCDF（level、quantile 两个维度）和一张廓线图
+
+风速由 U/V 反跳点到质量点后直接求模；地图旋转不改变风速大小，
+与 wrf-python uvmet_wspd_wdir 的风速相同。
+
+用法：
+    python region_profile_stats.py
+    python region_profile_stats.py --start 2022-11-26_00 --end 2022-11-28_00 -j 8
+    python region_profile_stats.py --coord pressure --region 118,122,28.5,31.5
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+import numpy as np
+import matplotlib.pyplot as plt
+from netCDF4 import Dataset
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader, parse_wrf_time_from_filename
+from wrf_thermo import G, KAPPA, ZERO_DEGC
+from wrf_mapreduce import map_reduce_files, add_workers_argument
+from wrf_profilestats import (PROFILE_EDGES, DEFAULT_QUANTILES, region_window, LevelInterpolator,
+                              ProfileStatsAccumulator, write_profile_stats, read_profile_stats)
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+output_dir = os.path.join(current_dir, "wrf_region_profiles")
+
+# 杭州附近（与 SI_index_cartopy_plots.py 的右图相同）
+default_region = [118.0, 122.0, 28.5, 31.5]
+
+height_levels = np.arange(250.0, 15000.0 + 1.0, 250.0)     # m AGL（0 m 在最低质量层以下）
+pressure_levels = np.arange(1000.0, 100.0 - 1.0, -25.0)    # hPa
+
+hydrometeors = ["QCLOUD", "QRAIN", "QICE", "QSNOW", "QGRAUP"]
+
+field_units = {"temperature": "degC", "wspd": "m s-1"}
+field_units.update({q.lower(): "g kg-1" for q in hydrometeors})
+
+
+# =========================================================
+# 2. map：一段文件 -> 逐层统计（每个 worker 调用一次）
+# =========================================================
+def accumulate_region_profiles(file_chunk, window, mask, levels, coord):
+    j0, j1, i0, i1 = window
+    interp = LevelInterpolator(levels, coord)
+    acc = ProfileStatsAccumulator()
+
+    for wrf_file in file_chunk:
+        print(f"处理: {os.path.basename(wrf_file)}")
+        with Dataset(wrf_file) as nc:
+            def var(name, dj=0, di=0):
+                return np.asarray(nc.variables[name][:, ..., j0:j1 + dj, i0:i1 + di], dtype=np.float64)
+
+            p_pa = var("P") + var("PB")
+            tc = (var("T") + 300.0) * (p_pa / 100000.0) ** KAPPA - ZERO_DEGC
+
+            u = var("U", di=1)
+            v = var("V", dj=1)
+            wspd = np.hypot(0.5 * (u[..., 1:] + u[..., :-1]), 0.5 * (v[..., 1:, :] + v[..., :-1, :]))
+
+            fields = {"temperature": (tc, PROFILE_EDGES["temperature"]),
+                      "wspd": (wspd, PROFILE_EDGES["wspd"])}
+            for q in hydrometeors:
+                if q in nc.variables:
+                    fields[q.lower()] = (var(q) * 1e3, PROFILE_EDGES["hydrometeor"])
+
+            if coord == "height":
+                ph = (var("PH") + var("PHB")) / G
+                coord_field = 0.5 * (ph[:, :-1] + ph[:, 1:]) - var("HGT")[:, None]
+            else:
+                coord_field = p_pa / 100.0
+
+        for t in range(coord_field.shape[0]):
+            weights = interp.weights(coord_field[t])
+            for name, (arr, edges) in fields.items():
+                acc.add(name, interp.apply(arr[t], weights)[:, mask], edges)
+
+        acc.mark_file(wrf_file)
+
+    return acc
+
+
+# =========================================================
+# 3. 画图
+# =========================================================
+def plot_profile_stats(stats, attrs, out_png):
+    coord = attrs.get("coord", "height")
+    qs = list(np.round(stats["quantile"], 3))
+    names = [k[:-5] for k in stats if k.endswith("_mean")]
+    y = stats["level"] / 1000.0 if coord == "height" else stats["level"]
+
+    fig, axes = plt.subplots(1, len(names), figsize=(3.2 * len(names), 6.5), sharey=True)
+    axes = np.atleast_1d(axes)
+
+    for ax, name in zip(axes, names):
+        qv = stats[f"{name}_quantiles"]
+        if 0.1 in qs and 0.9 in qs:
+            ax.fill_betweenx(y, qv[qs.index(0.1)], qv[qs.index(0.9)], color="tab:blue", alpha=0.15, label="P10–P90")
+        if 0.25 in qs and 0.75 in qs:
+            ax.fill_betweenx(y, qv[qs.index(0.25)], qv[qs.index(0.75)], color="tab:blue", alpha=0.3, label="P25–P75")
+        if 0.5 in qs:
+            ax.plot(qv[qs.index(0.5)], y, color="tab:blue", linestyle="--", linewidth=1.2, label="median")
+        ax.plot(stats[f"{name}_mean"], y, color="k", linewidth=2.0, label="mean")
+
+        unit = field_units.get(name, "")
+        ax.set_xlabel(f"{name} ({unit})")
+        ax.grid(True, linestyle="--", alpha=0.4)
+        if name in ("qcloud", "qrain", "qice", "qsnow", "qgraup"):
+            ax.set_xlim(left=0)
+
+    if coord == "height":
+        axes[0].set_ylabel("Height AGL (km)")
+    else:
+        axes[0].set_yscale("log")
+        axes[0].set_ylim(y.max(), y.min())
+        axes[0].set_yticks([1000, 850, 700, 500, 300, 200, 100])
+        axes[0].get_yaxis().set_major_formatter(plt.ScalarFormatter())
+        axes[0].set_ylabel("Pressure (hPa)")
+    axes[0].legend(fontsize=8, loc="upper right")
+
+    fig.suptitle(f"Region {attrs.get('region', '')}   {attrs.get('period', '')}   "
+                 f"({attrs.get('n_files', '')} files)", fontsize=11)
+    plt.tight_layout()
+    plt.savefig(out_png, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    print(f"图已保存: {out_png}")
+
+
+# =========================================================
+# 4. 主流程
+# =========================================================
+def select_files(wrf_files, start, end):
+    fmt = "%Y-%m-%d_%H"
+    t0 = datetime.strptime(start, fmt) if start else None
+    t1 = datetime.strptime(end, fmt) if end else None
+    selected = []
+    for f in wrf_files:
+        t = parse_wrf_time_from_filename(f)
+        if (t0 is None or t >= t0) and (t1 is None or t <= t1):
+            selected.append(f)
+    return selected
+
+
+def main():
+    parser = argparse.ArgumentParser(description="区域平均 / 分位数垂直廓线")
+    parser.add_argument("--region", default=",".join(str(x) for x in default_region),
+                        help="lon_min,lon_max,lat_min,lat_max")
+    parser.add_argument("--start", default=None, help="起始时间 YYYY-mm-dd_HH（含）")
+    parser.add_argument("--end", default=None, help="结束时间 YYYY-mm-dd_HH（含）")
+    parser.add_argument("--coord", choices=["height", "pressure"], default="height",
+                        help="公共垂直坐标：离地高度或气压")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    region = [float(x) for x in args.region.split(",")]
+    reader = WRFDataReader(wrf_path)
+    wrf_files = select_files(reader.get_files(), args.start, args.end)
+    if len(wrf_files) == 0:
+        raise FileNotFoundError("时间范围内没有 wrfout 文件。")
+    os.makedirs(output_dir, exist_ok=True)
+
+    with Dataset(wrf_files[0]) as nc:
+        lat = np.asarray(nc.variables["XLAT"][0], dtype=np.float64)
+        lon = np.asarray(nc.variables["XLONG"][0], dtype=np.float64)
+    window, mask = region_window(lat, lon, region)
+    print(f"区域窗口: j {window[0]}:{window[1]}, i {window[2]}:{window[3]}，框内格点 {int(mask.sum())}")
+
+    levels = height_levels if args.coord == "height" else pressure_levels
+    acc = map_reduce_files(wrf_files, accumulate_region_profiles, workers=args.workers,
+                           window=window, mask=mask, levels=levels, coord=args.coord)
+
+    period = (f"{parse_wrf_time_from_filename(wrf_files[0]):%Y-%m-%d %H} ~ "
+              f"{parse_wrf_time_from_filename(wrf_files[-1]):%Y-%m-%d %H}")
+    attrs = {"region": region, "coord": args.coord, "period": period}
+    out_nc = os.path.join(output_dir, f"region_profile_stats_{args.coord}.nc")
+    write_profile_stats(acc, out_nc, levels, args.coord, DEFAULT_QUANTILES, field_units, attrs)
+
+    stats, attrs = read_profile_stats(out_nc)
+    plot_profile_stats(stats, attrs, out_nc.replace(".nc", ".png"))
+
+
+if __name__ == "__main__":
+    main()
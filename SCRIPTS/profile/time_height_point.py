@@ -0,0 +1,264 @@
+# -*- coding: utf-8 -*-
+"""
+单点时间-高度剖面（垂直 Hovmöller 图）：温度、风、水凝物
+
+temp_profile.py 只画一个时次的一个气柱。这里对选定的若干点，
+遍历整个模拟的全部 wrfout：
+
+- 点位用 wrf_gridindex 在第一个文件上定位一次
+- 每个文件只读这几个点的气柱（wrf_stations.read_columns，不读整层三维场），
+  在子进程里直接插值到固定的离地高度上，只把 (点, 时次, 高度) 的小数组传回主进程
+- 进程池按文件顺序 map，主进程拼接时后面的文件已经在读（预取）
+- 结果写成 (point, Time, height) 的 netCDF，并为每个点画一张三联图
+
+用法：
+    python time_height_point.py
+    python time_height_point.py --only 58457,58238 --ztop 12000 -j 8
+    python time_height_point.py --point 30.2,120.2
+"""
+
+import os
+import sys
+import time
+import argparse
+from functools import partial
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib.pyplot as plt
+import matplotlib.dates as mdates
+from netCDF4 import Dataset, date2num
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader
+from wrf_gridindex import grid_index_from_file
+from wrf_stations import Station, read_station_list, read_station_profiles, read_columns, column_box, file_times
+from wrf_mapreduce import add_workers_argument, resolve_workers
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+default_stations = os.path.join(current_dir, "stations.csv")
+output_dir = os.path.join(current_dir, "wrf_time_height")
+
+# 水凝物：文件里有哪个读哪个，单位换成 g/kg
+hydrometeors = ["QCLOUD", "QRAIN", "QICE", "QSNOW", "QGRAUP"]
+
+field_units = {
+    "temperature": "degC",
+    "u": "m s-1",
+    "v": "m s-1",
+    "w": "m s-1",
+    "qtotal": "g kg-1",
+}
+field_units.update({q.lower(): "g kg-1" for q in hydrometeors})
+
+time_units = "hours since 1970-01-01 00:00:00"
+
+
+# =========================================================
+# 2. 单个文件：读点位气柱并插值到固定高度（子进程执行）
+# =========================================================
+def interp_columns(z_agl, field, heights):
+    """
+    z_agl, field: (点, Time, level)，返回 (点, Time, 高度)；高度超出气柱范围为 NaN
+    """
+    out = np.full(field.shape[:2] + (len(heights),), np.nan)
+    for idx in np.ndindex(*field.shape[:2]):
+        out[idx] = np.interp(heights, z_agl[idx], field[idx], left=np.nan, right=np.nan)
+    return out
+
+
+def extract_file(wrf_file, j, i, heights):
+    with Dataset(wrf_file) as nc:
+        times = file_times(nc, wrf_file)
+        box = column_box(j, i)
+
+        prof = read_station_profiles(nc, j, i)
+        hgt = read_columns(nc.variables["HGT"], j, i, box=box)           # (Time, 点)
+        w_stag = read_columns(nc.variables["W"], j, i, box=box)          # (Time, level+1, 点)
+
+        fields = {
+            "temperature": prof["temperature"],
+            "u": prof["u"],
+            "v": prof["v"],
+            "w": np.ascontiguousarray((0.5 * (w_stag[:, :-1] + w_stag[:, 1:])).transpose(2, 0, 1)),
+        }
+
+        qtotal = 0.0
+        for q in hydrometeors:
+            if q in nc.variables:
+                arr = read_columns(nc.variables[q], j, i, box=box).transpose(2, 0, 1) * 1e3
+                fields[q.lower()] = arr
+                qtotal = qtotal + arr
+        fields["qtotal"] = np.asarray(qtotal) * np.ones_like(fields["w"])
+
+    z_agl = prof["height"] - hgt.T[:, :, None]
+    return times, {name: interp_columns(z_agl, arr, heights) for name, arr in fields.items()}
+
+
+# =========================================================
+# 3. 画图
+# =========================================================
+def plot_time_height(times, heights, fields, title, out_png):
+    tnum = mdates.date2num(times)
+    z_km = heights / 1000.0
+    fig, axes = plt.subplots(3, 1, figsize=(13, 11), sharex=True)
+
+    # (a) 温度 + 0°C 线
+    ax = axes[0]
+    cf = ax.contourf(tnum, z_km, fields["temperature"].T, levels=np.arange(-70, 41, 5), cmap="RdYlBu_r", extend="both")
+    cs = ax.contour(tnum, z_km, fields["temperature"].T, levels=[0.0], colors="k", linewidths=1.5)
+    ax.clabel(cs, fmt="0°C", fontsize=8)
+    fig.colorbar(cf, ax=ax, pad=0.01, label="T (°C)")
+    ax.set_title("Temperature")
+
+    # (b) 水平风速 + 风羽
+    ax = axes[1]
+    wspd = np.hypot(fields["u"], fields["v"])
+    cf = ax.contourf(tnum, z_km, wspd.T, levels=np.arange(0, 61, 4), cmap="viridis", extend="max")
+    fig.colorbar(cf, ax=ax, pad=0.01, label="Wind speed (m/s)")
+    st = max(1, len(times) // 40)
+    sz = max(1, len(heights) // 20)
+    ax.barbs(tnum[::st], z_km[::sz], fields["u"][::st, ::sz].T, fields["v"][::st, ::sz].T, length=5, linewidth=0.6)
+    ax.set_title("Horizontal wind")
+
+    # (c) 水凝物总量 + 垂直速度
+    ax = axes[2]
+    cf = ax.contourf(tnum, z_km, fields["qtotal"].T, levels=[0.01, 0.05, 0.1, 0.2, 0.5, 1, 2, 4],
+                     cmap="GnBu", extend="max")
+    fig.colorbar(cf, ax=ax, pad=0.01, label="Hydrometeors (g/kg)")
+    ax.contour(tnum, z_km, fields["w"].T, levels=[-1.0, -0.5], colors="tab:blue", linewidths=0.8, linestyles="--")
+    ax.contour(tnum, z_km, fields["w"].T, levels=[0.5, 1.0], colors="tab:red", linewidths=0.8)
+    ax.set_title("Total hydrometeors (shaded), w (contours, ±0.5/1 m/s)")
+
+    for ax in axes:
+        ax.set_ylabel("Height AGL (km)")
+        ax.grid(True, linestyle="--", alpha=0.3)
+    axes[-1].xaxis.set_major_formatter(mdates.DateFormatter("%m-%d %H"))
+    fig.autofmt_xdate()
+
+    fig.suptitle(title, fontsize=13)
+    plt.savefig(out_png, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    print(f"图已保存: {out_png}")
+
+
+# =========================================================
+# 4. 写 netCDF
+# =========================================================
+def write_output(out_nc, points, loc, times, heights, fields):
+    with Dataset(out_nc, "w", format="NETCDF4") as nc:
+        nc.createDimension("point", len(points))
+        nc.createDimension("Time", len(times))
+        nc.createDimension("height", len(heights))
+        nc.description = "WRF 单点时间-高度剖面（离地高度插值）"
+
+        nc.createVariable("point_id", str, ("point",))[:] = np.array([p.id for p in points], dtype=object)
+        for name, arr in (("lat", [p.lat for p in points]), ("lon", [p.lon for p in points])):
+            nc.createVariable(name, "f8", ("point",))[:] = arr
+        for name in ("j", "i"):
+            nc.createVariable(f"grid_{name}", "i4", ("point",))[:] = loc[name]
+
+        t = nc.createVariable("time", "f8", ("Time",))
+        t.units = time_units
+        t[:] = date2num(times, time_units)
+        h = nc.createVariable("height", "f4", ("height",))
+        h.units = "m"
+        h[:] = heights
+
+        for name, arr in fields.items():
+            v = nc.createVariable(name, "f4", ("point", "Time", "height"), zlib=True)
+            v.units = field_units[name]
+            v[:] = arr
+    print(f"已保存: {out_nc}")
+
+
+# =========================================================
+# 5. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="单点时间-高度剖面")
+    parser.add_argument("--stations", default=None,
+                        help="点位表 CSV（id,lat,lon）；不给且没有 --point 时用 stations.csv")
+    parser.add_argument("--only", default=None, help="只取这些点，逗号分隔")
+    parser.add_argument("--point", action="append", default=[], help="额外的点 lat,lon（可多次）")
+    parser.add_argument("--ztop", type=float, default=15000.0, help="最高离地高度（m）")
+    parser.add_argument("--dz", type=float, default=250.0, help="高度间隔（m）")
+    parser.add_argument("--no-plot", action="store_true", help="只写 netCDF，不画图")
+    add_workers_argument(parser, default=0)
+    args = parser.parse_args()
+
+    if args.stations is None and (args.only or not args.point):
+        args.stations = default_stations
+    points = read_station_list(args.stations) if args.stations else []
+    if args.only:
+        keep = {s.strip() for s in args.only.split(",")}
+        points = [p for p in points if p.id in keep]
+    for k, text in enumerate(args.point):
+        lat, lon = (float(x) for x in text.split(","))
+        points.append(Station(f"P{k + 1}", lat, lon))
+    if len(points) == 0:
+        raise ValueError("没有要提取的点。")
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+    os.makedirs(output_dir, exist_ok=True)
+
+    # 点位只定位一次
+    index = grid_index_from_file(wrf_files[0])
+    j, i, dist_km = index.nearest([p.lat for p in points], [p.lon for p in points])
+    inside = dist_km <= index.spacing_km
+    for p, ok in zip(points, inside):
+        if not ok:
+            print(f"点 {p.id} ({p.lat:.2f}, {p.lon:.2f}) 不在区域内，跳过")
+    points = [p for p, ok in zip(points, inside) if ok]
+    loc = {"j": j[inside], "i": i[inside]}
+    if len(points) == 0:
+        raise ValueError("没有点落在模式区域内。")
+
+    # 从 dz 起算：0 m 在最低质量层以下，插值全是 NaN
+    heights = np.arange(args.dz, args.ztop + 0.5 * args.dz, args.dz)
+    func = partial(extract_file, j=loc["j"], i=loc["i"], heights=heights)
+    workers = resolve_workers(args.workers)
+
+    t0 = time.perf_counter()
+    times, parts = [], []
+    if workers == 1:
+        results = map(func, wrf_files)
+    else:
+        pool = ProcessPoolExecutor(max_workers=workers)
+        # map 按文件顺序返回，子进程同时读后面的文件
+        results = pool.map(func, wrf_files, chunksize=max(1, len(wrf_files) // (workers * 8)))
+    try:
+        for file_times_k, fields_k in results:
+            times.extend(file_times_k)
+            parts.append(fields_k)
+    finally:
+        if workers > 1:
+            pool.shutdown()
+
+    fields = {name: np.concatenate([p[name] for p in parts], axis=1) for name in parts[0]}
+    print(f"读取完成: {len(wrf_files)} 个文件，{len(times)} 个时次，{len(points)} 个点，"
+          f"用时 {time.perf_counter() - t0:.1f} s")
+
+    write_output(os.path.join(output_dir, "time_height_points.nc"), points, loc, times, heights, fields)
+
+    if not args.no_plot:
+        for k, p in enumerate(points):
+            title = f"{p.id} ({p.lat:.2f}N, {p.lon:.2f}E)  {times[0]:%Y-%m-%d %H} ~ {times[-1]:%Y-%m-%d %H} UTC"
+            out_png = os.path.join(output_dir, f"time_height_{p.id}.png")
+            plot_time_height(times, heights, {name: arr[k] for name, arr in fields.items()}, title, out_png)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,83 @@
+# -*- coding: utf-8 -*-
+"""
+检查 wrfout 里的冰雪 / 降水相关变量（check_wrf_snow_vars.sh 的 Python 版本）
+
+只读文件头、线程池并发、按 mtime 缓存（见上级目录 wrf_varscan.py），
+输出 文件 × 变量 的矩阵，并按变量组合给出积雪诊断会用的回退计划（wrf_snow.resolve_snow_plan）。
+
+用法：
+    python check_wrf_snow_vars.py /path/to/wrfout_d01_*
+    python check_wrf_snow_vars.py --vars SNOWC,SNOWH,SR --threads 16 /path/to/wrfout_d01_*
+    python check_wrf_snow_vars.py --no-cache wrfout_d01_2022-11-26_18_00_00
+"""
+
+import os
+import sys
+import glob
+import time
+import argparse
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_varscan import DEFAULT_CACHE, SchemaCache, scan_files, format_matrix, group_by_variables
+from wrf_snow import resolve_snow_plan
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+snow_vars = ["SNOWC", "SNOWH", "SWE", "SNOW_DEPTH", "SNOW", "ALBEDO", "SNOWNC", "RAINNC", "RAINC", "RAINSH", "SR"]
+
+# 推荐用于雨雪分离的变量
+rain_snow_vars = ["SNOWNC", "RAINNC", "RAINC", "RAINSH", "SR"]
+
+
+# =========================================================
+# 2. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="检查 wrfout 里的冰雪相关变量（只读文件头）")
+    parser.add_argument("files", nargs="+", help="wrfout 文件（可带通配符）")
+    parser.add_argument("--vars", default=",".join(snow_vars), help="要检查的变量，逗号分隔")
+    parser.add_argument("--threads", type=int, default=8, help="读文件头的线程数（默认 %(default)s）")
+    parser.add_argument("--cache", default=DEFAULT_CACHE, help="缓存文件（默认 %(default)s）")
+    parser.add_argument("--no-cache", action="store_true", help="不读也不写缓存")
+    args = parser.parse_args()
+
+    files = []
+    for pattern in args.files:
+        matched = sorted(glob.glob(pattern))
+        files.extend(matched if matched else [pattern])
+    files = list(dict.fromkeys(files))
+    var_names = [v.strip() for v in args.vars.split(",") if v.strip()]
+
+    t0 = time.perf_counter()
+    cache = SchemaCache(None if args.no_cache else args.cache)
+    results = scan_files(files, workers=args.threads, cache=cache)
+    dt = time.perf_counter() - t0
+
+    print("========== 冰雪相关变量检查结果 ==========")
+    print(format_matrix(results, var_names))
+    print()
+
+    print("--- 推荐用于雨雪分离的变量检查 ---")
+    for key, group in group_by_variables(results, rain_snow_vars).items():
+        missing = [v for v in rain_snow_vars if v not in key]
+        print(f"{len(group)} 个文件: found {', '.join(key) or '-'}；no such variable {', '.join(missing) or '-'}")
+    print()
+
+    print("--- 积雪诊断回退计划（wrf_snow）---")
+    for key, group in group_by_variables(results, snow_vars).items():
+        print(f"{len(group)} 个文件（如 {os.path.basename(group[0])}）：")
+        for line in resolve_snow_plan(results[group[0]].variables).describe():
+            print(f"    {line}")
+    print(f"\n用时 {dt:.2f} s")
+
+
+if __name__ == "__main__":
+    main()
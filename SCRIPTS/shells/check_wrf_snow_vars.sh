@@ -1,4 +1,5 @@
 #!/usr/bin/env bash
+# 已改为 Python 实现（只读文件头、线程池、mtime 缓存），见 check_wrf_snow_vars.py
 set -euo pipefail
 
 if [ $# -lt 1 ]; then
@@ -6,37 +7,4 @@ if [ $# -lt 1 ]; then
   exit 1
 fi
 
-vars=(SNOWC SNOWH SWE SNOW_DEPTH SNOW ALBEDO SNOWNC RAINNC RAINC RAINSH SR)
-
-for f in "$@"; do
-  if [ ! -f "$f" ]; then
-    echo "文件不存在: $f"
-    continue
-  fi
-
-  echo "========================================"
-  echo "文件: $f"
-  echo "========================================"
-
-  hdr=$(ncdump -h "$f")
-
-  for var in "${vars[@]}"; do
-    if printf '%s\n' "$hdr" | grep -Eq "^[[:space:]]*(byte|char|short|int|float|double)[[:space:]]+${var}\s*\("; then
-      echo "${var}: found"
-    else
-      echo "${var}: no such variable"
-    fi
-  done
-
-  echo
-  echo "--- 推荐用于雨雪分离的变量检查 ---"
-  for var in SNOWNC RAINNC RAINC RAINSH SR; do
-    if printf '%s\n' "$hdr" | grep -Eq "^[[:space:]]*(byte|char|short|int|float|double)[[:space:]]+${var}\s*\("; then
-      echo "${var}: found"
-    else
-      echo "${var}: no such variable"
-    fi
-  done
-  echo
-
-done
+exec python3 "$(dirname "$0")/check_wrf_snow_vars.py" "$@"
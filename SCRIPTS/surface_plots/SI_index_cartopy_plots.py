@@ -15,22 +15,20 @@ Matplotlib + Cartopy 两联图
 7. 右图直接用裁剪后的 WRF 原始二维经纬网绘图，不再做 griddata
 
 注意：
-- 这版 SI 先用占位露点近似：
-      dewpoint = temperature - 2 K
-  只是为了把图稳定跑出来。
-- 如果你后面提供真实湿度变量（QVAPOR / RH / td），再把这段换成正式业务版。
+- SI 的露点由 QVAPOR 直接算（wrf_thermo.thermo_fields），不再用 dewpoint = temperature - 2 K 的占位近似。
 """
 
 import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.ticker as mticker
-import metpy.calc as mpcalc
 
 from netCDF4 import Dataset
-from metpy.units import units
 
 from wrf import getvar, latlon_coords, to_np
 from wrf_read_data import WRFDataReader
+from wrf_stability import showalter_index
+from wrf_thermo import ZERO_DEGC, thermo_fields
+from wrf_moist_adiabat import get_table
 
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
@@ -148,77 +146,26 @@ temp3d_c = getvar(ncfile, "tc", timeidx=0)           # degC
 pres3d_hpa_np = np.ma.filled(to_np(pres3d_hpa), np.nan)[:, j0:j1 + 1, i0:i1 + 1]
 temp3d_c_np = np.ma.filled(to_np(temp3d_c), np.nan)[:, j0:j1 + 1, i0:i1 + 1]
 
-# 挂单位
-p = pres3d_hpa_np * units.hPa
-t = temp3d_c_np * units.degC
-
 
 # ============================================================
 # 5. 计算右图 SI
 # ------------------------------------------------------------
-# 使用 MetPy 自带的 showalter_index
-# dewpoint 先用占位近似：比气温低 2 K
+# 与 mpcalc.showalter_index 相同的算法（p 上线性插值到 850 / 500 hPa，
+# 850 hPa 气块经 LCL 抬升到 500 hPa），改为 wrf_stability 对所有气柱一次性计算
+# 露点由 QVAPOR（混合比）直接算，无单位向量化
 # ============================================================
-nz, ny, nx = p.shape
-si = np.full((ny, nx), np.nan, dtype=float)
-
-ok_count = 0
-skip_count = 0
-err_count = 0
-
-for j in range(ny):
-    for i in range(nx):
-        p_prof = p[:, j, i]
-        t_prof = t[:, j, i]
-
-        p_vals = np.asarray(p_prof.magnitude)
-        t_vals = np.asarray(t_prof.magnitude)
-
-        # 缺测过滤
-        good = np.isfinite(p_vals) & np.isfinite(t_vals)
-        if good.sum() < 3:
-            skip_count += 1
-            continue
-
-        p1 = p_prof[good]
-        t1 = t_prof[good]
-
-        # pressure 从大到小排序：近地面 -> 高空
-        order = np.argsort(p1.magnitude)[::-1]
-        p1 = p1[order]
-        t1 = t1[order]
-
-        # Showalter Index 至少需要覆盖 850 hPa 和 500 hPa
-        if not (np.nanmax(p1.magnitude) >= 850 and np.nanmin(p1.magnitude) <= 500):
-            skip_count += 1
-            continue
-
-        try:
-            # 转 Kelvin，避免摄氏温差单位坑
-            t1k = t1.to("kelvin")
-
-            # 占位近似露点：比气温低 2 K
-            td1k = t1k - 2.0 * units.kelvin
-
-            si_val = mpcalc.showalter_index(p1, t1k, td1k)
-
-            # 转成温差单位并取标量
-            si[j, i] = np.asarray(si_val.to("delta_degC").magnitude).item()
-            ok_count += 1
+qv3d_np = np.asarray(ncfile.variables["QVAPOR"][0, :, j0:j1 + 1, i0:i1 + 1], dtype=np.float64)
+td3d_c_np = thermo_fields(pres3d_hpa_np, temp3d_c_np + ZERO_DEGC, qv3d_np, names=["td"])["td"] - ZERO_DEGC
 
-        except Exception as e:
-            err_count += 1
-            if err_count <= 5:
-                print(f"[SI error] j={j}, i={i}, err={e}")
-            continue
+# 湿绝热段查假绝热表（wrf_moist_adiabat），第一次运行时建表并缓存到磁盘
+si = showalter_index(pres3d_hpa_np, temp3d_c_np, td3d_c_np, axis=0, log_interp=False,
+                     table=get_table())
 
 print("SI valid count =", np.isfinite(si).sum())
-print("SI ok_count    =", ok_count)
-print("SI skip_count  =", skip_count)
-print("SI err_count   =", err_count)
+print("SI skip_count  =", (~np.isfinite(si)).sum())
 
 if not np.isfinite(si).any():
-    raise ValueError("右图 SI 全是 NaN，请检查气压/温度廓线或 dewpoint 近似写法")
+    raise ValueError("右图 SI 全是 NaN，请检查气压/温度/QVAPOR 廓线")
 
 
 # ============================================================
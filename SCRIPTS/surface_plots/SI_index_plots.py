@@ -10,14 +10,14 @@ SI = T500 - T850_lifted
 import numpy as np
 import xarray as xr
 import pygmt
-import metpy.calc as mpcalc
 
 from netCDF4 import Dataset
-from metpy.units import units
-from metpy.interpolate import log_interpolate_1d
 
 from wrf import getvar, interplevel, latlon_coords, to_np
 from wrf_read_data import WRFDataReader
+from wrf_stability import showalter_index
+from wrf_thermo import ZERO_DEGC, thermo_fields
+from wrf_moist_adiabat import get_table
 
 
 # ============================================================
@@ -163,57 +163,19 @@ temp3d_c = temp3d_c.isel(south_north=slice(j0, j1 + 1), west_east=slice(i0, i1 +
 # 注意：
 # - wrf-python 返回的 3D 变量通常维度是 (bottom_top, south_north, west_east)
 # - 所以这里默认 z 在第 0 维
+# - 原来逐格点循环调用 log_interpolate_1d + mpcalc.parcel_profile，
+#   现在改成 wrf_stability.showalter_index 对所有气柱一次性计算，
+#   插值方式仍是 ln p 线性插值；气块从 850 hPa 起抬升
 # ============================================================
-p = np.ma.filled(to_np(pres3d_hpa), np.nan) * units.hPa
-t = np.ma.filled(to_np(temp3d_c), np.nan) * units.degC
+p = np.ma.filled(to_np(pres3d_hpa), np.nan)
+t = np.ma.filled(to_np(temp3d_c), np.nan)
 
-nz, ny, nx = p.shape
-si = np.full((ny, nx), np.nan, dtype=float)
+# 露点由 QVAPOR 直接算（wrf_thermo，无单位），不再用 Td = T - 2°C 的占位近似
+qv = np.asarray(ncfile.variables["QVAPOR"][0, :, j0:j1 + 1, i0:i1 + 1], dtype=np.float64)
+td = thermo_fields(p, t + ZERO_DEGC, qv, names=["td"])["td"] - ZERO_DEGC
 
-for j in range(ny):
-    for i in range(nx):
-        p_prof = p[:, j, i]
-        t_prof = t[:, j, i]
-
-        # 取出无单位数值部分做缺测判断
-        p_vals = np.asarray(p_prof.magnitude)
-        t_vals = np.asarray(t_prof.magnitude)
-
-        good = np.isfinite(p_prof.magnitude) & np.isfinite(t_prof.magnitude)
-        if good.sum() < 3:
-            continue
-
-        p1 = p_prof[good]
-        t1 = t_prof[good]
-
-        # pressure 从大到小排序（近地面 -> 高空）
-        order = np.argsort(p1.magnitude)[::-1]
-        p1 = p1[order]
-        t1 = t1[order]
-
-        # 必须覆盖 850 和 500 hPa
-        if not (np.nanmax(p1.magnitude) >= 850 and np.nanmin(p1.magnitude) <= 500):
-            continue
-
-        try:
-            # 环境场 T850 / T500
-            T850 = log_interpolate_1d(850 * units.hPa, p1, t1)
-            T500 = log_interpolate_1d(500 * units.hPa, p1, t1)
-
-            # 这里只是占位近似：Td850 = T850 - 2°C
-            # 正式业务图建议换成真实 Td850
-            Td850 = T850 - 2.0 * units.degC
-
-            # 850 hPa 气块抬升廓线
-            prof = mpcalc.parcel_profile(p1, T850.to("degC"), Td850.to("degC"))
-
-            # 抬升到 500 hPa 的 parcel 温度
-            T850_lifted = log_interpolate_1d(500 * units.hPa, p1, prof)
-
-            si[j, i] = (T500 - T850_lifted).to("degC").magnitude
-
-        except Exception:
-            continue
+# 湿绝热段查假绝热表（wrf_moist_adiabat），第一次运行时建表并缓存到磁盘
+si = showalter_index(p, t, td, axis=0, log_interp=True, table=get_table())
 
 
 # ============================================================
@@ -0,0 +1,207 @@
+# -*- coding: utf-8 -*-
+"""
+逐时次对流指数图：CAPE / CIN（SB、ML、MU）、LI、K 指数、总指数 TT、LCL / LFC 高度
+
+原来只能照 SI_index_plots.py 的写法逐格点循环调用 MetPy，
+这里直接读原始变量（P/PB、T、QVAPOR、PH/PHB、HGT），
+一次读一批时次（--times-per-chunk），用 wrf_stability.convective_indices
+对 (T, Z, Y, X) 整块计算，湿绝热段查假绝热表。
+-j/--workers > 1 时用 wrf_tiling.run_tiled 把水平面切块多进程计算。
+
+输出：
+- convective_indices.nc：(Time, south_north, west_east) 的全部指数，逐批追加
+- 每个时次一张 3 x 3 指数图（--no-plot 关闭）
+
+用法：
+    python convective_indices_maps.py
+    python convective_indices_maps.py --times-per-chunk 8 --no-plot
+    python convective_indices_maps.py -j 8
+"""
+
+import os
+import sys
+import argparse
+from datetime import datetime
+
+import numpy as np
+import matplotlib.pyplot as plt
+from netCDF4 import Dataset, date2num
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader, parse_wrf_time_from_filename
+from wrf_thermo import G, KAPPA, ZERO_DEGC
+from wrf_stability import convective_indices
+from wrf_moist_adiabat import get_table
+from wrf_mapreduce import add_workers_argument
+from wrf_tiling import run_tiled
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+output_dir = os.path.join(current_dir, "wrf_convective_indices")
+
+# 写入 netCDF 的变量及单位
+index_units = {
+    "sbcape": "J kg-1", "sbcin": "J kg-1",
+    "mlcape": "J kg-1", "mlcin": "J kg-1",
+    "mucape": "J kg-1", "mucin": "J kg-1",
+    "sblcl_hgt": "m", "sblfc_hgt": "m",
+    "mllcl_hgt": "m", "mllfc_hgt": "m",
+    "mulcl_hgt": "m", "mulfc_hgt": "m",
+    "lifted_index": "degC", "k_index": "degC", "total_totals": "degC",
+}
+
+# 图上的 9 个面板：(变量, 标题, 色标, 范围)
+panels = [
+    ("sbcape", "SBCAPE (J/kg)", "YlOrRd", (0, 4000)),
+    ("mlcape", "MLCAPE (J/kg)", "YlOrRd", (0, 4000)),
+    ("mucape", "MUCAPE (J/kg)", "YlOrRd", (0, 4000)),
+    ("sbcin", "SBCIN (J/kg)", "Blues_r", (-300, 0)),
+    ("mlcin", "MLCIN (J/kg)", "Blues_r", (-300, 0)),
+    ("lifted_index", "LI (°C)", "RdBu", (-8, 8)),
+    ("k_index", "K index (°C)", "viridis", (10, 45)),
+    ("total_totals", "Total Totals (°C)", "viridis", (35, 60)),
+    ("mllcl_hgt", "MLLCL (m AGL)", "cividis", (0, 3000)),
+]
+
+time_units = "hours since 1970-01-01 00:00:00"
+
+
+# =========================================================
+# 2. 读一批时次的原始变量
+# =========================================================
+def wrf_times(nc, wrf_file):
+    """
+    文件内各时次的时间；没有 Times 变量时按文件名
+    """
+    if "Times" in nc.variables:
+        raw = nc.variables["Times"][:]
+        return [datetime.strptime(b"".join(row).decode(), "%Y-%m-%d_%H:%M:%S") for row in raw]
+    return [parse_wrf_time_from_filename(wrf_file)]
+
+
+def read_column_fields(nc, t0, t1):
+    """
+    返回 (p hPa, tc degC, qv kg/kg, z m)，形状 (T, Z, Y, X)，
+    与 wrf-python 的 pressure / tc / z 相同的算法
+    """
+    def var(name):
+        return np.asarray(nc.variables[name][t0:t1], dtype=np.float64)
+
+    p_pa = var("P") + var("PB")
+    theta = var("T") + 300.0
+    tc = theta * (p_pa / 100000.0) ** KAPPA - ZERO_DEGC
+    qv = var("QVAPOR")
+
+    ph = (var("PH") + var("PHB")) / G
+    z = 0.5 * (ph[:, :-1] + ph[:, 1:])
+
+    return p_pa / 100.0, tc, qv, z
+
+
+# =========================================================
+# 3. netCDF 逐批追加
+# =========================================================
+def open_output(out_nc, lat, lon):
+    nc = Dataset(out_nc, "w")
+    nc.createDimension("Time", None)
+    nc.createDimension("south_north", lat.shape[0])
+    nc.createDimension("west_east", lat.shape[1])
+    nc.description = "对流指数（wrf_stability.convective_indices）"
+
+    t = nc.createVariable("time", "f8", ("Time",))
+    t.units = time_units
+    for name, arr in (("XLAT", lat), ("XLONG", lon)):
+        nc.createVariable(name, "f4", ("south_north", "west_east"), zlib=True)[:] = arr
+    for name, u in index_units.items():
+        v = nc.createVariable(name, "f4", ("Time", "south_north", "west_east"), zlib=True)
+        v.units = u
+    return nc
+
+
+def append_output(nc, times, result):
+    k0 = len(nc.dimensions["Time"])
+    k1 = k0 + len(times)
+    nc.variables["time"][k0:k1] = date2num(times, time_units)
+    for name in index_units:
+        nc.variables[name][k0:k1] = result[name]
+
+
+# =========================================================
+# 4. 画图
+# =========================================================
+def plot_indices(lat, lon, result, k, t, out_png):
+    fig, axes = plt.subplots(3, 3, figsize=(13, 11))
+
+    for ax, (name, title, cmap, (vmin, vmax)) in zip(axes.ravel(), panels):
+        pm = ax.pcolormesh(lon, lat, result[name][k], shading="auto",
+                           cmap=cmap, vmin=vmin, vmax=vmax)
+        ax.set_title(title, fontsize=10)
+        fig.colorbar(pm, ax=ax, shrink=0.85)
+
+    fig.suptitle(f"WRF convective indices  {t:%Y-%m-%d %H:%M} UTC", fontsize=13)
+    plt.tight_layout()
+    plt.savefig(out_png, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    print(f"图已保存: {out_png}")
+
+
+# =========================================================
+# 5. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="逐时次对流指数")
+    parser.add_argument("--times-per-chunk", type=int, default=4,
+                        help="每次读入并计算的时次数（控制内存）")
+    parser.add_argument("--no-plot", action="store_true", help="只写 netCDF，不画图")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+    os.makedirs(output_dir, exist_ok=True)
+
+    table = get_table()
+    out = None
+
+    for wrf_file in wrf_files:
+        with Dataset(wrf_file) as nc:
+            times = wrf_times(nc, wrf_file)
+            lat = np.asarray(nc.variables["XLAT"][0], dtype=np.float64)
+            lon = np.asarray(nc.variables["XLONG"][0], dtype=np.float64)
+            hgt = np.asarray(nc.variables["HGT"][0], dtype=np.float64)
+
+            if out is None:
+                out = open_output(os.path.join(output_dir, "convective_indices.nc"), lat, lon)
+
+            for t0 in range(0, len(times), args.times_per_chunk):
+                t1 = min(t0 + args.times_per_chunk, len(times))
+                print(f"处理: {os.path.basename(wrf_file)} 时次 {t0}-{t1 - 1}")
+
+                p, tc, qv, z = read_column_fields(nc, t0, t1)
+                result = run_tiled(convective_indices,
+                                   {"p_hpa": p, "t_c": tc, "qv": qv, "z": z, "hgt": hgt},
+                                   workers=args.workers, axis=1, table=table)
+                append_output(out, times[t0:t1], result)
+
+                if not args.no_plot:
+                    for k, t in enumerate(times[t0:t1]):
+                        out_png = os.path.join(output_dir, f"convective_indices_{t:%Y%m%d_%H%M}.png")
+                        plot_indices(lat, lon, result, k, t, out_png)
+
+    if out is not None:
+        out.close()
+        print(f"已保存: {os.path.join(output_dir, 'convective_indices.nc')}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+整个模拟时段的逐格点风速 / 降水分位数图（流式直方图，不保存 (T, Y, X)）
+
+变量：
+1. ws10_np：10 m 风速（uvmet10，与 wind_dist.py 一致）
+2. ws500  ：500 hPa 风速（uvmet 插值到 500 hPa）
+3. precip ：时段降水 = 当前 (RAINC + RAINNC) - 前一个文件，负值（重启）置 0
+
+输出：
+- 90/95/99 百分位的 netCDF 文件（含每个格点的误差上界）
+- 3 x 3 分位数图
+
+用法：
+    python wind_precip_percentiles.py -j 16
+    python wind_precip_percentiles.py -j 16 --checkpoint pct.ckpt.npz
+"""
+
+import os
+import sys
+import argparse
+
+import numpy as np
+import matplotlib.pyplot as plt
+from netCDF4 import Dataset
+from wrf import getvar, interplevel, latlon_coords, to_np
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader
+from wrf_mapreduce import map_reduce_files, add_workers_argument
+from wrf_checkpoint import run_checkpointed, add_checkpoint_arguments
+from wrf_quantile import HistogramAccumulator, WIND_EDGES, PRECIP_EDGES
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+percentiles = [90, 95, 99]
+
+var_edges = {
+    "ws10_np": WIND_EDGES,
+    "ws500": WIND_EDGES,
+    "precip": PRECIP_EDGES,
+}
+
+output_dir = os.path.join(current_dir, "wrf_percentiles")
+
+
+# =========================================================
+# 2. map：逐文件更新直方图
+# =========================================================
+def read_total_rain(nc):
+    rainc = np.asarray(nc.variables["RAINC"][0], dtype=np.float64)
+    rainnc = np.asarray(nc.variables["RAINNC"][0], dtype=np.float64)
+    return rainc + rainnc
+
+
+def accumulate_histograms(file_chunk, prev_files):
+    acc = HistogramAccumulator()
+
+    for wrf_file in file_chunk:
+        print(f"处理: {os.path.basename(wrf_file)}")
+        nc = Dataset(wrf_file)
+
+        # 10 m 风速
+        uv10 = getvar(nc, "uvmet10", units="m s-1")
+        ws10_np = np.hypot(to_np(uv10[0]), to_np(uv10[1]))
+        acc.add("ws10_np", ws10_np, var_edges["ws10_np"])
+
+        # 500 hPa 风速
+        pressure = getvar(nc, "pressure")
+        uvmet = getvar(nc, "uvmet", units="m s-1")
+        u500 = to_np(interplevel(uvmet[0], pressure, 500.0))
+        v500 = to_np(interplevel(uvmet[1], pressure, 500.0))
+        acc.add("ws500", np.hypot(u500, v500), var_edges["ws500"])
+
+        # 时段降水：第一个文件没有前一时次，跳过
+        prev_file = prev_files.get(wrf_file)
+        if prev_file is not None:
+            rain_now = read_total_rain(nc)
+            with Dataset(prev_file) as nc_prev:
+                rain_prev = read_total_rain(nc_prev)
+            precip = rain_now - rain_prev
+            precip = np.where(precip < 0, 0, precip)   # 防止少数重启导致负值
+            acc.add("precip", precip, var_edges["precip"])
+
+        if "lat" not in acc.static:
+            lats, lons = latlon_coords(uv10)
+            acc.set_static("lat", to_np(lats))
+            acc.set_static("lon", to_np(lons))
+
+        acc.mark_file(wrf_file)
+        nc.close()
+
+    return acc
+
+
+# =========================================================
+# 3. 输出 netCDF
+# =========================================================
+def write_percentiles(acc, out_nc):
+    lat = acc.static["lat"]
+    lon = acc.static["lon"]
+
+    with Dataset(out_nc, "w") as nc:
+        nc.createDimension("south_north", lat.shape[0])
+        nc.createDimension("west_east", lat.shape[1])
+        nc.description = "逐格点分位数（固定分箱直方图，误差上界见 *_err）"
+        nc.n_files = len(acc)
+
+        for name, arr in (("XLAT", lat), ("XLONG", lon)):
+            v = nc.createVariable(name, "f4", ("south_north", "west_east"), zlib=True)
+            v[:] = arr
+
+        for name in acc.names():
+            for pct in percentiles:
+                q = pct / 100.0
+                v = nc.createVariable(f"{name}_p{pct}", "f4", ("south_north", "west_east"), zlib=True)
+                v[:] = acc.quantile(name, q)
+                e = nc.createVariable(f"{name}_p{pct}_err", "f4", ("south_north", "west_east"), zlib=True)
+                e[:] = acc.error_bound(name, q)
+
+    print(f"已保存: {out_nc}")
+
+
+# =========================================================
+# 4. 画图
+# =========================================================
+def plot_percentiles(acc, out_png):
+    lat = acc.static["lat"]
+    lon = acc.static["lon"]
+    names = acc.names()
+
+    fig, axes = plt.subplots(len(names), len(percentiles),
+                             figsize=(4.2 * len(percentiles), 3.6 * len(names)),
+                             squeeze=False)
+
+    units_map = {"ws10_np": "m/s", "ws500": "m/s", "precip": "mm"}
+
+    for r, name in enumerate(names):
+        maps = acc.quantiles(name, [p / 100.0 for p in percentiles])
+        vmax = np.nanmax(maps)
+        for c, pct in enumerate(percentiles):
+            ax = axes[r, c]
+            pm = ax.pcolormesh(lon, lat, maps[c], shading="auto",
+                               cmap="viridis", vmin=0.0, vmax=vmax)
+            ax.set_title(f"{name} P{pct}", fontsize=10)
+            fig.colorbar(pm, ax=ax, shrink=0.85, label=units_map.get(name, ""))
+
+    plt.tight_layout()
+    plt.savefig(out_png, dpi=200, bbox_inches="tight")
+    plt.close(fig)
+    print(f"图已保存: {out_png}")
+
+
+# =========================================================
+# 5. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="逐格点风速 / 降水分位数")
+    add_workers_argument(parser)
+    add_checkpoint_arguments(parser)
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+    prev_files = {f: p for p, f in zip(wrf_files[:-1], wrf_files[1:])}
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    if args.checkpoint:
+        acc = run_checkpointed(
+            wrf_files,
+            accumulate_histograms,
+            checkpoint_path=args.checkpoint,
+            every=args.checkpoint_every,
+            workers=args.workers,
+            config={name: edges for name, edges in var_edges.items()},
+            accumulator_cls=HistogramAccumulator,
+            prev_files=prev_files,
+        )
+    else:
+        acc = map_reduce_files(
+            wrf_files,
+            accumulate_histograms,
+            workers=args.workers,
+            prev_files=prev_files,
+        )
+
+    write_percentiles(acc, os.path.join(output_dir, "wind_precip_percentiles.nc"))
+    plot_percentiles(acc, os.path.join(output_dir, "wind_precip_percentiles.png"))
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,132 @@
+# -*- coding: utf-8 -*-
+"""
+一次遍历 wrfout，同时输出：
+1. 日变化合成：120E 剖面（温度 / 纬向风 / 位温）和地面场（T2、10 m 风速）按小时平均
+2. 24 h / 72 h 滑动平均：逐窗口写入 netCDF（边算边写，内存里只有窗口长度的场）
+3. 区域平均 T2、10 m 风速的日变化曲线图
+
+剖面计算与 vertical_wind_timeavg.py 相同。
+
+用法：
+    python diurnal_rolling_section.py
+"""
+
+import os
+import sys
+
+import numpy as np
+import matplotlib.pyplot as plt
+from netCDF4 import Dataset
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import parse_wrf_time_from_filename
+from wrf_rolling import OnePassEngine, RollingNetCDFWriter, write_diurnal
+from vertical_wind_timeavg import (
+    wrf_path, start_time, end_time, target_lon,
+    select_files, find_section_line, compute_sections
+)
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+# wrfout 输出间隔（小时）
+step_hours = 3
+
+# 滑动窗口
+windows = {"24h": 24, "72h": 72}
+
+output_dir = os.path.join(current_dir, "wrf_diurnal_rolling")
+
+
+# =========================================================
+# 2. 逐文件读取（每个文件只读一次）
+# =========================================================
+def read_fields(wrf_file, start_point, end_point):
+    with Dataset(wrf_file) as nc:
+        fields, static = compute_sections(nc, start_point, end_point)
+
+        t2 = np.asarray(nc.variables["T2"][0], dtype=np.float64) - 273.15   # degC
+        u10 = np.asarray(nc.variables["U10"][0], dtype=np.float64)
+        v10 = np.asarray(nc.variables["V10"][0], dtype=np.float64)
+
+        fields["t2"] = t2
+        fields["ws10"] = np.hypot(u10, v10)   # 风速与风向旋转无关，可直接用格点风
+
+    return fields, static
+
+
+def iter_fields(files, start_point, end_point, static_out):
+    for f in files:
+        t = parse_wrf_time_from_filename(f)
+        print(f"处理: {os.path.basename(f)}")
+        fields, static = read_fields(f, start_point, end_point)
+        if not static_out:
+            static_out.update(static)
+        yield t, fields
+
+
+# =========================================================
+# 3. 画日变化曲线
+# =========================================================
+def plot_diurnal_curves(diurnal, out_png):
+    fig, ax1 = plt.subplots(figsize=(8, 5))
+
+    hours, t2 = diurnal.mean("t2")
+    _, ws10 = diurnal.mean("ws10")
+
+    ax1.plot(hours, np.nanmean(t2, axis=(1, 2)), color="tab:red", marker="o", label="T2")
+    ax1.set_xlabel("Hour (UTC)")
+    ax1.set_ylabel("Domain-mean T2 (degC)", color="tab:red")
+    ax1.set_xticks(hours)
+
+    ax2 = ax1.twinx()
+    ax2.plot(hours, np.nanmean(ws10, axis=(1, 2)), color="tab:blue", marker="s", label="WS10")
+    ax2.set_ylabel("Domain-mean 10 m wind speed (m/s)", color="tab:blue")
+
+    ax1.grid(True, linestyle="--", alpha=0.4)
+    ax1.set_title("Diurnal cycle of domain-mean T2 and 10 m wind speed")
+
+    plt.tight_layout()
+    plt.savefig(out_png, dpi=200, bbox_inches="tight")
+    plt.close(fig)
+    print(f"图已保存: {out_png}")
+
+
+# =========================================================
+# 4. 主流程
+# =========================================================
+def main():
+    os.makedirs(output_dir, exist_ok=True)
+
+    selected_files = select_files(wrf_path, start_time, end_time)
+    start_point, end_point = find_section_line(selected_files[0], target_lon)
+
+    engine = OnePassEngine(windows, step_hours=step_hours, diurnal=True)
+
+    static = {}
+    writer = None
+    try:
+        for wname, t_end, means in engine.stream(
+                iter_fields(selected_files, start_point, end_point, static)):
+            if writer is None:
+                writer = RollingNetCDFWriter(output_dir, "wrf_120E", static=static)
+            writer.write(wname, t_end, means)
+    finally:
+        if writer is not None:
+            writer.close()
+
+    write_diurnal(engine.diurnal, os.path.join(output_dir, "wrf_120E_diurnal.nc"), static=static)
+    plot_diurnal_curves(engine.diurnal, os.path.join(output_dir, "diurnal_t2_ws10.png"))
+
+    print(f"共处理 {engine.n_steps} 个时次。")
+
+
+if __name__ == "__main__":
+    main()
@@ -17,10 +17,8 @@ import sys
 import numpy as np
 
 from netCDF4 import Dataset
-from wrf import getvar, ll_to_xy, to_np
+from wrf import getvar, to_np
 
-from metpy.units import units
-import metpy.calc as mpcalc
 from metpy.plots import SkewT
 
 import matplotlib as mpl
@@ -55,6 +53,9 @@ parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, parent_dir)
 
 from wrf_read_data import WRFDataReader
+from wrf_moist_adiabat import plot_moist_adiabats
+from wrf_gridindex import grid_index_from_file
+from wrf_thermo import ZERO_DEGC, thermo_fields
 
 
 # =========================================================
@@ -92,9 +93,9 @@ use_latlon = False
 if use_latlon:
     lat0 = 30.0
     lon0 = 114.0
-    xy = ll_to_xy(ncfile, lat0, lon0)
-    i = int(to_np(xy[0]))
-    j = int(to_np(xy[1]))
+    # KD 树最近格点（代替 wrf.ll_to_xy，同一网格只建一次索引）
+    j, i, dist_km = grid_index_from_file(target_file).nearest(lat0, lon0)
+    j, i = int(j), int(i)
 else:
     # 默认取区域中心点
     lats = getvar(ncfile, "lat")
@@ -145,50 +146,28 @@ ws_prof = np.asarray(to_np(uvmet_wspd_wdir[0, :, j ,i]), dtype=np.float64)
 # deg
 wd_prof = np.asarray(to_np(uvmet_wspd_wdir[1, :, j, i]), dtype=np.float64)
 
-# 过滤无效值
-mask = np.isfinite(p_prof) & np.isfinite(t_prof) & np.isfinite(w_prof) & np.isfinite(ws_prof) & np.isfinite(wd_prof) & np.isfinite(z_prof)
-p_prof = p_prof[mask]
-t_prof = t_prof[mask]
-w_prof = w_prof[mask]
-z_prof = z_prof[mask]
-ws_prof = ws_prof[mask]
-wd_prof = wd_prof[mask]
-
-# 去掉非正气压
-mask2 = p_prof > 0
-p_prof = p_prof[mask2]
-t_prof = t_prof[mask2]
-w_prof = w_prof[mask2]
-
-# 按气压从大到小排序（地面 -> 高空）
-sort_idx = np.argsort(p_prof)[::-1]
-p_prof = p_prof[sort_idx]
-t_prof = t_prof[sort_idx]
-w_prof = w_prof[sort_idx]
-z_prof = z_prof[sort_idx]
-ws_prof = ws_prof[sort_idx]
-wd_prof = wd_prof[sort_idx]
+# 一次过滤无效值和非正气压（所有廓线用同一个掩码，长度始终一致）；
+# WRF eta 层气压本来就随下标减小（地面 -> 高空），不需要再排序
+mask = (np.isfinite(p_prof) & np.isfinite(t_prof) & np.isfinite(w_prof) & np.isfinite(ws_prof)
+        & np.isfinite(wd_prof) & np.isfinite(z_prof) & (p_prof > 0))
+p_prof, t_prof, w_prof, z_prof, ws_prof, wd_prof = (
+    a[mask] for a in (p_prof, t_prof, w_prof, z_prof, ws_prof, wd_prof))
 
 
 # =========================================================
 # 5. 用混合比计算露点
 # =========================================================
-# QVAPOR 通常就是水汽混合比 r (kg/kg)
-# e = r * p / (epsilon + r)
-epsilon = 0.622
-e_prof = (w_prof * p_prof) / (epsilon + w_prof)   # hPa
-e_prof = np.asarray(e_prof, dtype=np.float64)
-
-# 显式转成带单位的 Quantity，避免 masked array/xarray 单位识别问题
-td_prof = mpcalc.dewpoint(units.Quantity(e_prof, "hPa")).to("degC").m
+# QVAPOR 就是水汽混合比 r (kg/kg)，e = r * p / (epsilon + r)，再由 Bolton 公式反算露点；
+# wrf_thermo 直接在 numpy 数组上算，不经过 pint 单位
+td_prof = thermo_fields(p_prof, t_prof + ZERO_DEGC, w_prof, names=["td"])["td"] - ZERO_DEGC
 
 
 # =========================================================
-# 6. 转为带单位的数组
+# 6. 廓线（hPa / degC，SkewT.plot 直接接受 numpy 数组）
 # =========================================================
-p = units.Quantity(p_prof, "hPa")
-T = units.Quantity(t_prof, "degC")
-Td = units.Quantity(td_prof, "degC")
+p = p_prof
+T = t_prof
+Td = td_prof
 
 
  # =========================================================
@@ -215,8 +194,8 @@ skew.ax.grid(True, which='major', axis='x', linestyle='--', color='lightgray', a
 # 干绝热线
 skew.plot_dry_adiabats(color='orange', alpha=0.7, linewidth=0.8)
 
-# 湿绝热线
-skew.plot_moist_adiabats(color='blue', alpha=0.7, linewidth=0.8)
+# 湿绝热线（查假绝热表，不再逐条积分 moist_lapse）
+plot_moist_adiabats(skew, color='blue', alpha=0.7, linewidth=0.8)
 
 # 等混合比线（常对应你说的等饱和比湿线）
 skew.plot_mixing_lines(color='green', alpha=0.7, linewidth=0.8)
@@ -0,0 +1,192 @@
+# -*- coding: utf-8 -*-
+"""
+批量 Skew-T 探空图（读 wrf_stations 站点库）
+
+plots_equal_lines.py 每张图都新建 SkewT，重新画干绝热线、湿绝热线、等混合比线，
+这些背景线才是画图最慢的部分。这里：
+
+- 每个进程只建一次图：坐标范围固定，背景线画完后把整张画布缓存成位图
+  （canvas.copy_from_bbox）
+- 每个探空只做：恢复背景位图 -> 更新温度 / 露点曲线的数据 -> 重画风羽和标题 ->
+  直接把 Agg 缓冲区写成 PNG（不再走 savefig 的整图重绘）
+- 按站点分给进程池，每个进程只读自己那几个站的廓线
+
+输入为 profile/extract_station_soundings.py 生成的站点库。
+
+用法：
+    python skewt_batch.py
+    python skewt_batch.py --stations 58457,58238 --every 2 -j 8
+"""
+
+import os
+import sys
+import time
+import argparse
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+import matplotlib
+matplotlib.use("Agg")
+import matplotlib.pyplot as plt
+from matplotlib.image import imsave
+from matplotlib.lines import Line2D
+from metpy.plots import SkewT
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_stations import read_station_store
+from wrf_moist_adiabat import plot_moist_adiabats
+from wrf_mapreduce import add_workers_argument, resolve_workers
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+default_store = os.path.join(parent_dir, "profile", "wrf_station_soundings", "station_soundings.nc")
+default_out_dir = os.path.join(current_dir, "skewt_batch")
+
+p_bottom, p_top = 1050.0, 100.0       # hPa
+t_left, t_right = -40.0, 50.0         # degC
+barb_stride = 2                       # 每隔几层画一个风羽
+dpi = 120
+
+
+# =========================================================
+# 2. 带缓存背景的 Skew-T
+# =========================================================
+class SkewTRenderer:
+    """
+    背景（等温线网格、干 / 湿绝热线、等混合比线、0°C 线、图例）只画一次；
+    render() 只更新温度、露点、风羽和标题
+    """
+
+    def __init__(self, figsize=(8, 8), dpi: int = dpi):
+        self.fig = plt.figure(figsize=figsize, dpi=dpi)
+        self.skew = SkewT(self.fig, rotation=45)
+        ax = self.skew.ax
+
+        ax.set_ylim(p_bottom, p_top)
+        ax.set_xlim(t_left, t_right)
+        ax.grid(True, which="major", axis="y", linestyle="--", color="gray", alpha=0.5)
+        ax.grid(True, which="major", axis="x", linestyle="--", color="lightgray", alpha=0.35)
+        ax.set_xlabel("Temperature (°C)")
+        ax.set_ylabel("Pressure (hPa)")
+
+        # MetPy 的背景线是 LineCollection，颜色要用 colors
+        self.skew.plot_dry_adiabats(colors="orange", alpha=0.7, linewidth=0.8)
+        plot_moist_adiabats(self.skew, colors="blue", alpha=0.7, linewidth=0.8)
+        self.skew.plot_mixing_lines(colors="green", alpha=0.7, linewidth=0.8)
+        ax.axvline(0, color="cyan", linestyle="--", linewidth=1.2)
+
+        ax.legend(handles=[
+            Line2D([0], [0], color="red", lw=2.2, label="Temperature"),
+            Line2D([0], [0], color="purple", lw=2.2, label="Dewpoint"),
+            Line2D([0], [0], color="orange", lw=1.2, label="Dry adiabat"),
+            Line2D([0], [0], color="blue", lw=1.2, label="Moist adiabat"),
+            Line2D([0], [0], color="green", lw=1.2, label="Mixing ratio"),
+        ], loc="upper left", fontsize=9, frameon=True)
+
+        # 动态元素：先建好、不参与背景绘制
+        self.temp_line, = ax.plot([], [], color="red", linewidth=2.2, animated=True)
+        self.dew_line, = ax.plot([], [], color="purple", linewidth=2.2, animated=True)
+        self.title = ax.set_title("", fontsize=11, animated=True)
+
+        self.fig.canvas.draw()
+        self.background = self.fig.canvas.copy_from_bbox(self.fig.bbox)
+
+    def render(self, p, t, td, u, v, title: str, out_png: str):
+        """
+        p hPa，t / td degC，u / v m/s，均为一维廓线
+        """
+        canvas = self.fig.canvas
+        ax = self.skew.ax
+        canvas.restore_region(self.background)
+
+        good = np.isfinite(p) & np.isfinite(t) & (p >= p_top)
+        self.temp_line.set_data(t[good], p[good])
+        good_d = good & np.isfinite(td)
+        self.dew_line.set_data(td[good_d], p[good_d])
+        self.title.set_text(title)
+
+        sel = good & np.isfinite(u) & np.isfinite(v)
+        sel[np.flatnonzero(sel)[1::barb_stride]] = False
+        barbs = self.skew.plot_barbs(p[sel], u[sel], v[sel], length=6)
+        barbs.set_animated(True)
+
+        for artist in (self.temp_line, self.dew_line, barbs, self.title):
+            ax.draw_artist(artist)
+        barbs.remove()
+
+        imsave(out_png, np.asarray(canvas.buffer_rgba()), dpi=self.fig.dpi)
+
+
+# =========================================================
+# 3. 进程池：每个进程一个渲染器，每个任务一个站
+# =========================================================
+_RENDERER = None
+
+
+def render_station(store_path, station_id, time_stride, out_dir):
+    global _RENDERER
+    if _RENDERER is None:
+        _RENDERER = SkewTRenderer()
+
+    data = read_station_store(store_path, [station_id])
+    lat, lon = float(data["lat"][0]), float(data["lon"][0])
+
+    n = 0
+    for k in range(0, len(data["time"]), time_stride):
+        t = data["time"][k]
+        title = f"{station_id} ({lat:.2f}N, {lon:.2f}E)   {t:%Y-%m-%d %H:%M} UTC"
+        out_png = os.path.join(out_dir, f"skewt_{station_id}_{t:%Y%m%d_%H%M}.png")
+        _RENDERER.render(data["pressure"][0, k], data["temperature"][0, k], data["dewpoint"][0, k],
+                         data["u"][0, k], data["v"][0, k], title, out_png)
+        n += 1
+
+    print(f"站点 {station_id}: {n} 张")
+    return n
+
+
+# =========================================================
+# 4. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="批量 Skew-T 探空图")
+    parser.add_argument("--store", default=default_store, help="站点库 netCDF（wrf_stations）")
+    parser.add_argument("--out-dir", default=default_out_dir, help="输出目录")
+    parser.add_argument("--stations", default=None, help="只画这些站，逗号分隔；默认全部")
+    parser.add_argument("--every", type=int, default=1, help="每隔几个时次画一张")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    os.makedirs(args.out_dir, exist_ok=True)
+    if args.stations:
+        station_ids = [s.strip() for s in args.stations.split(",") if s.strip()]
+    else:
+        station_ids = read_station_store(args.store, names=[])["station_id"]
+
+    workers = min(resolve_workers(args.workers), len(station_ids))
+    t0 = time.perf_counter()
+
+    if workers == 1:
+        counts = [render_station(args.store, sid, args.every, args.out_dir) for sid in station_ids]
+    else:
+        print(f"{len(station_ids)} 个站，{workers} 个进程")
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            futures = [pool.submit(render_station, args.store, sid, args.every, args.out_dir)
+                       for sid in station_ids]
+            counts = [f.result() for f in futures]
+
+    n = sum(counts)
+    dt = time.perf_counter() - t0
+    print(f"完成: {n} 张图，用时 {dt:.1f} s（{dt / max(n, 1) * 1000:.0f} ms/张）")
+    print(f"已保存到: {args.out_dir}")
+
+
+if __name__ == "__main__":
+    main()
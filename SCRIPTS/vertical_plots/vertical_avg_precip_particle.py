@@ -14,6 +14,7 @@
 
 import os
 import sys
+import argparse
 import numpy as np
 import matplotlib as mpl
 import matplotlib.pyplot as plt
@@ -53,21 +54,16 @@ parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, parent_dir)
 
 from wrf_read_data import WRFDataReader
+from wrf_mapreduce import MeanAccumulator, map_reduce_files, add_workers_argument
 
 # =========================================================
 # 2. 参数设置
 # =========================================================
 wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
-reader = WRFDataReader(wrf_path)
-wrf_files = reader.get_files()
-
-if len(wrf_files) == 0:
-    raise FileNotFoundError("没有找到 wrfout_d01_* 文件。")
 
 lon_section = 120.0
 
 output_dir = os.path.join(current_dir, "wrf_precip_section_all_times")
-os.makedirs(output_dir, exist_ok=True)
 
 
 # =========================================================
@@ -146,291 +142,316 @@ def section_along_fixed_lon(lons2d, lats2d, lon_target, var3d_dict, terrain2d):
 
 
 # =========================================================
-# 4. 循环所有 wrfout，提取剖面并累加
+# 4. map：对一段 wrfout 提取剖面并累加（每个 worker 进程调用一次）
 # =========================================================
-precip_list = []
-p_list = []
-v_list = []
-w_list = []
-z_list = []
-
-sec_lat_ref = None
-terrain_ref = None
-used_precip_vars_ref = None
+def accumulate_precip_sections(file_chunk, lon_section):
+    acc = MeanAccumulator()
 
-print(f"共找到 {len(wrf_files)} 个 wrfout 文件")
-print(f"剖面经度: {lon_section}E")
+    for target_file in file_chunk:
+        time_str = os.path.basename(target_file).replace("wrfout_d01_", "")
+        print(f"处理: {time_str}")
 
-for idx, target_file in enumerate(wrf_files, start=1):
-    time_str = os.path.basename(target_file).replace("wrfout_d01_", "")
-    print(f"\n[{idx}/{len(wrf_files)}] 处理: {time_str}")
+        ncfile = Dataset(target_file)
 
-    ncfile = Dataset(target_file)
+        # 基础变量
+        pressure = getvar(ncfile, "pressure")      # hPa
+        z = getvar(ncfile, "z", units="m")         # m
+        va = getvar(ncfile, "va", units="m s-1")   # m/s
+        wa = getvar(ncfile, "wa", units="m s-1")   # m/s
+        ter = getvar(ncfile, "ter")                # m
 
-    # 基础变量
-    pressure = getvar(ncfile, "pressure")      # hPa
-    z = getvar(ncfile, "z", units="m")         # m
-    va = getvar(ncfile, "va", units="m s-1")   # m/s
-    wa = getvar(ncfile, "wa", units="m s-1")   # m/s
-    ter = getvar(ncfile, "ter")                # m
+        slp = getvar(ncfile, "slp")
+        lats, lons = latlon_coords(slp)
 
-    slp = getvar(ncfile, "slp")
-    lats, lons = latlon_coords(slp)
+        lats_np = to_np(lats)
+        lons_np = to_np(lons)
 
-    lats_np = to_np(lats)
-    lons_np = to_np(lons)
+        pres_np = np.asarray(to_np(pressure), dtype=np.float64)
+        z_np = np.asarray(to_np(z), dtype=np.float64)
+        va_np = np.asarray(to_np(va), dtype=np.float64)
+        wa_np = np.asarray(to_np(wa), dtype=np.float64)
+        ter_np = np.asarray(to_np(ter), dtype=np.float64)
 
-    pres_np = np.asarray(to_np(pressure), dtype=np.float64)
-    z_np = np.asarray(to_np(z), dtype=np.float64)
-    va_np = np.asarray(to_np(va), dtype=np.float64)
-    wa_np = np.asarray(to_np(wa), dtype=np.float64)
-    ter_np = np.asarray(to_np(ter), dtype=np.float64)
+        # 三维降水粒子变量
+        precip_candidates = ["QRAIN", "QSNOW", "QGRAUP"]
+        used_precip_vars = [v for v in precip_candidates if v in ncfile.variables]
 
-    # 三维降水粒子变量
-    precip_candidates = ["QRAIN", "QSNOW", "QGRAUP"]
-    used_precip_vars = [v for v in precip_candidates if v in ncfile.variables]
+        if len(used_precip_vars) == 0:
+            ncfile.close()
+            raise RuntimeError(
+                f"{time_str}: 当前 wrfout 中没有找到 QRAIN/QSNOW/QGRAUP。"
+            )
 
-    if len(used_precip_vars) == 0:
-        ncfile.close()
-        raise RuntimeError(
-            f"{time_str}: 当前 wrfout 中没有找到 QRAIN/QSNOW/QGRAUP。"
+        acc.set_static("used_precip_vars", np.array(used_precip_vars))
+
+        precip3d = None
+        for vname in used_precip_vars:
+            arr = np.asarray(ncfile.variables[vname][0, :, :, :], dtype=np.float64)  # kg/kg
+            if precip3d is None:
+                precip3d = arr.copy()
+            else:
+                precip3d += arr
+
+        # 提取经向剖面
+        sec_lat, sec_lon, terrain_sec, vars_sec = section_along_fixed_lon(
+            lons_np,
+            lats_np,
+            lon_section,
+            var3d_dict={
+                "z": z_np,
+                "p": pres_np,
+                "v": va_np,
+                "w": wa_np,
+                "precip": precip3d,
+            },
+            terrain2d=ter_np,
         )
 
-    if used_precip_vars_ref is None:
-        used_precip_vars_ref = used_precip_vars
-
-    precip3d = None
-    for vname in used_precip_vars:
-        arr = np.asarray(ncfile.variables[vname][0, :, :, :], dtype=np.float64)  # kg/kg
-        if precip3d is None:
-            precip3d = arr.copy()
-        else:
-            precip3d += arr
-
-    # 提取经向剖面
-    sec_lat, sec_lon, terrain_sec, vars_sec = section_along_fixed_lon(
-        lons_np,
-        lats_np,
-        lon_section,
-        var3d_dict={
-            "z": z_np,
-            "p": pres_np,
-            "v": va_np,
-            "w": wa_np,
-            "precip": precip3d,
-        },
-        terrain2d=ter_np,
-    )
-
-    z_sec = vars_sec["z"] / 1000.0          # km
-    p_sec = vars_sec["p"]                   # hPa
-    v_sec = vars_sec["v"]                   # m/s
-    w_sec = vars_sec["w"]                   # m/s
-    precip_sec = vars_sec["precip"] * 1e3   # g/kg
+        precip_sec = vars_sec["precip"] * 1e3   # g/kg
 
-    if sec_lat_ref is None:
-        sec_lat_ref = sec_lat.copy()
-        terrain_ref = terrain_sec.copy()
-        ref_shape = precip_sec.shape
-    else:
-        if precip_sec.shape != ref_shape:
+        if "precip" in acc.sums and precip_sec.shape != acc.sums["precip"].shape:
             ncfile.close()
             raise ValueError(
                 f"{time_str}: 剖面形状与前一个文件不一致，"
-                f"当前 {precip_sec.shape}，参考 {ref_shape}"
+                f"当前 {precip_sec.shape}，参考 {acc.sums['precip'].shape}"
             )
 
-    precip_list.append(precip_sec)
-    p_list.append(p_sec)
-    v_list.append(v_sec)
-    w_list.append(w_sec)
-    z_list.append(z_sec)
+        acc.set_static("sec_lat", sec_lat.copy())
+        acc.set_static("terrain", terrain_sec.copy())
+
+        acc.add("precip", precip_sec)
+        acc.add("p", vars_sec["p"])                 # hPa
+        acc.add("v", vars_sec["v"])                 # m/s
+        acc.add("w", vars_sec["w"])                 # m/s
+        acc.add("z", vars_sec["z"] / 1000.0)        # km
+        acc.mark_file(target_file)
 
-    ncfile.close()
+        ncfile.close()
 
-print("\n所有 wrfout 文件剖面提取完成。")
+    return acc
 
 
 # =========================================================
-# 5. 计算时间平均
+# 6. 绘制时间平均大图
 # =========================================================
-precip_mean = np.nanmean(np.stack(precip_list, axis=0), axis=0)
-p_mean = np.nanmean(np.stack(p_list, axis=0), axis=0)
-v_mean = np.nanmean(np.stack(v_list, axis=0), axis=0)
-w_mean = np.nanmean(np.stack(w_list, axis=0), axis=0)
-z_mean = np.nanmean(np.stack(z_list, axis=0), axis=0)
+def plot_time_mean(wrf_files, sec_lat_ref, terrain_ref,
+                   precip_mean, precip_mean_masked, p_mean, v_mean, w_mean,
+                   z_mean, speed_mean, used_precip_vars_ref):
+    fig = plt.figure(figsize=(12, 8))
+    ax = fig.add_subplot(1, 1, 1)
+
+    X = np.tile(sec_lat_ref[None, :], (z_mean.shape[0], 1))
+    Y = z_mean
+
+    # 1) 背景：时间平均降水粒子混合比
+    positive_precip = precip_mean[precip_mean > 0]
+
+    if positive_precip.size > 0:
+        precip_top = np.nanpercentile(positive_precip, 98)
+        precip_top = max(0.05, nice_ceil(precip_top, 0.05))
+        precip_levels = np.linspace(0.05, precip_top, 14)
+
+        cf = ax.contourf(
+            X,
+            Y,
+            precip_mean_masked,
+            levels=precip_levels,
+            cmap="YlGnBu",
+            extend="max",
+        )
 
-# 风速等值线（保持之前逻辑）
-speed_mean = np.sqrt(v_mean**2 + w_mean**2)
+        cbar = fig.colorbar(cf, ax=ax, orientation="horizontal", pad=0.08, shrink=0.9)
+        cbar.set_label("时间平均降水粒子混合比 (g kg$^{-1}$)")
+    else:
+        ax.text(
+            0.5, 0.92, "时间平均后该剖面无降水粒子",
+            transform=ax.transAxes,
+            ha="center", va="center",
+            fontsize=12, color="gray"
+        )
 
-# 只画 > 0 的降水粒子
-precip_mean_masked = np.ma.masked_less_equal(precip_mean, 0.0)
+    # 2) 时间平均等压线
+    p_levels = [100, 200, 300, 500, 700, 850, 900, 950, 1000]
+    valid_p_levels = [lv for lv in p_levels if np.nanmin(p_mean) <= lv <= np.nanmax(p_mean)]
 
-# 统计量
-valid_precip = precip_mean[precip_mean > 0]
+    cs_p = ax.contour(
+        X,
+        Y,
+        p_mean,
+        levels=valid_p_levels,
+        colors="k",
+        linewidths=0.55,
+    )
+    ax.clabel(cs_p, fmt="%d", fontsize=8, inline=True)
 
-print("\n时间平均剖面降水粒子统计（QRAIN+QSNOW+QGRAUP）：")
-if valid_precip.size > 0:
-    print(f"最大值: {np.nanmax(valid_precip):.6f} g/kg")
-    print(f"最小值: {np.nanmin(valid_precip):.6f} g/kg")
-    print(f"平均值: {np.nanmean(valid_precip):.6f} g/kg")
-else:
-    print("时间平均后整个剖面降水粒子都为 0。")
+    # 3) 时间平均风速等值线
+    spd_top = max(5.0, nice_ceil(np.nanpercentile(speed_mean, 98), 5.0))
+    spd_levels = np.arange(5.0, spd_top + 0.1, 5.0)
 
-print("\n时间平均剖面风速统计：")
-print(f"最大值: {np.nanmax(speed_mean):.3f} m/s")
-print(f"最小值: {np.nanmin(speed_mean):.3f} m/s")
-print(f"平均值: {np.nanmean(speed_mean):.3f} m/s")
+    cs_spd = ax.contour(
+        X,
+        Y,
+        speed_mean,
+        levels=spd_levels,
+        colors="darkgreen",
+        linewidths=0.8,
+    )
+    ax.clabel(cs_spd, fmt="%.0f", fontsize=8, inline=True)
+
+    # 4) 地形
+    ax.fill_between(
+        sec_lat_ref,
+        0.0,
+        terrain_ref / 1000.0,
+        color="0.5",
+        alpha=0.6,
+        zorder=5,
+    )
 
+    # 5) 时间平均垂直面风场
+    w_display_factor = 50.0
+    skipx = max(1, int(sec_lat_ref.size / 24))
+    skipz = max(1, int(z_mean.shape[0] / 22))
+
+    q = ax.quiver(
+        X[::skipz, ::skipx],
+        Y[::skipz, ::skipx],
+        v_mean[::skipz, ::skipx],
+        w_mean[::skipz, ::skipx] * w_display_factor,
+        angles="xy",
+        scale_units="xy",
+        scale=100,
+        width=0.0022,
+        color="k",
+        zorder=6,
+    )
 
-# =========================================================
-# 6. 绘制时间平均大图
-# =========================================================
-fig = plt.figure(figsize=(12, 8))
-ax = fig.add_subplot(1, 1, 1)
+    ax.quiverkey(
+        q,
+        X=0.98,
+        Y=1.03,
+        U=10,
+        label="平均 v = 10 m/s，平均 w 显示放大 ×50",
+        labelpos="E",
+        coordinates="axes",
+        fontproperties={"size": 9},
+    )
 
-X = np.tile(sec_lat_ref[None, :], (z_mean.shape[0], 1))
-Y = z_mean
+    # 6) 坐标轴
+    y_max_km = min(18.0, max(8.0, np.nanpercentile(z_mean, 99)))
+    ax.set_ylim(0, y_max_km)
 
-# 1) 背景：时间平均降水粒子混合比
-positive_precip = precip_mean[precip_mean > 0]
+    # 左北右南
+    ax.set_xlim(np.nanmax(sec_lat_ref), np.nanmin(sec_lat_ref))
 
-if positive_precip.size > 0:
-    precip_top = np.nanpercentile(positive_precip, 98)
-    precip_top = max(0.05, nice_ceil(precip_top, 0.05))
-    precip_levels = np.linspace(0.05, precip_top, 14)
+    ax.set_xlabel("纬度 (°)")
+    ax.set_ylabel("高度 (km)")
 
-    cf = ax.contourf(
-        X,
-        Y,
-        precip_mean_masked,
-        levels=precip_levels,
-        cmap="YlGnBu",
-        extend="max",
+    secax = ax.secondary_yaxis(
+        "right",
+        functions=(height_km_to_pressure_hpa, pressure_hpa_to_height_km),
     )
+    secax.set_ylabel("近似气压 (hPa)")
+    secax.set_yticks([1000, 850, 700, 500, 300, 200, 100])
+
+    xticks = np.linspace(np.nanmax(sec_lat_ref), np.nanmin(sec_lat_ref), 6)
+    ax.set_xticks(xticks)
+    ax.set_xticklabels([f"{x:.1f}" for x in xticks])
 
-    cbar = fig.colorbar(cf, ax=ax, orientation="horizontal", pad=0.08, shrink=0.9)
-    cbar.set_label("时间平均降水粒子混合比 (g kg$^{-1}$)")
-else:
+    # 不加大标题，只写说明
     ax.text(
-        0.5, 0.92, "时间平均后该剖面无降水粒子",
+        0.02, 0.98,
+        "(c) 模拟时段平均剖面",
         transform=ax.transAxes,
-        ha="center", va="center",
-        fontsize=12, color="gray"
+        ha="left", va="top",
+        fontsize=13, fontweight="bold",
+        bbox=dict(facecolor="white", alpha=0.7, edgecolor="none", pad=2)
+    )
+
+    fig.text(
+        0.5,
+        0.01,
+        f"平均时段：{os.path.basename(wrf_files[0]).replace('wrfout_d01_', '')}  ~  "
+        f"{os.path.basename(wrf_files[-1]).replace('wrfout_d01_', '')}",
+        ha="center",
+        va="bottom",
+        fontsize=12,
     )
 
-# 2) 时间平均等压线
-p_levels = [100, 200, 300, 500, 700, 850, 900, 950, 1000]
-valid_p_levels = [lv for lv in p_levels if np.nanmin(p_mean) <= lv <= np.nanmax(p_mean)]
-
-cs_p = ax.contour(
-    X,
-    Y,
-    p_mean,
-    levels=valid_p_levels,
-    colors="k",
-    linewidths=0.55,
-)
-ax.clabel(cs_p, fmt="%d", fontsize=8, inline=True)
-
-# 3) 时间平均风速等值线
-spd_top = max(5.0, nice_ceil(np.nanpercentile(speed_mean, 98), 5.0))
-spd_levels = np.arange(5.0, spd_top + 0.1, 5.0)
-
-cs_spd = ax.contour(
-    X,
-    Y,
-    speed_mean,
-    levels=spd_levels,
-    colors="darkgreen",
-    linewidths=0.8,
-)
-ax.clabel(cs_spd, fmt="%.0f", fontsize=8, inline=True)
-
-# 4) 地形
-ax.fill_between(
-    sec_lat_ref,
-    0.0,
-    terrain_ref / 1000.0,
-    color="0.5",
-    alpha=0.6,
-    zorder=5,
-)
-
-# 5) 时间平均垂直面风场
-w_display_factor = 50.0
-skipx = max(1, int(sec_lat_ref.size / 24))
-skipz = max(1, int(z_mean.shape[0] / 22))
-
-q = ax.quiver(
-    X[::skipz, ::skipx],
-    Y[::skipz, ::skipx],
-    v_mean[::skipz, ::skipx],
-    w_mean[::skipz, ::skipx] * w_display_factor,
-    angles="xy",
-    scale_units="xy",
-    scale=100,
-    width=0.0022,
-    color="k",
-    zorder=6,
-)
-
-ax.quiverkey(
-    q,
-    X=0.98,
-    Y=1.03,
-    U=10,
-    label="平均 v = 10 m/s，平均 w 显示放大 ×50",
-    labelpos="E",
-    coordinates="axes",
-    fontproperties={"size": 9},
-)
-
-# 6) 坐标轴
-y_max_km = min(18.0, max(8.0, np.nanpercentile(z_mean, 99)))
-ax.set_ylim(0, y_max_km)
-
-# 左北右南
-ax.set_xlim(np.nanmax(sec_lat_ref), np.nanmin(sec_lat_ref))
-
-ax.set_xlabel("纬度 (°)")
-ax.set_ylabel("高度 (km)")
-
-secax = ax.secondary_yaxis(
-    "right",
-    functions=(height_km_to_pressure_hpa, pressure_hpa_to_height_km),
-)
-secax.set_ylabel("近似气压 (hPa)")
-secax.set_yticks([1000, 850, 700, 500, 300, 200, 100])
-
-xticks = np.linspace(np.nanmax(sec_lat_ref), np.nanmin(sec_lat_ref), 6)
-ax.set_xticks(xticks)
-ax.set_xticklabels([f"{x:.1f}" for x in xticks])
-
-# 不加大标题，只写说明
-ax.text(
-    0.02, 0.98,
-    "(c) 模拟时段平均剖面",
-    transform=ax.transAxes,
-    ha="left", va="top",
-    fontsize=13, fontweight="bold",
-    bbox=dict(facecolor="white", alpha=0.7, edgecolor="none", pad=2)
-)
-
-fig.text(
-    0.5,
-    0.01,
-    f"平均时段：{os.path.basename(wrf_files[0]).replace('wrfout_d01_', '')}  ~  "
-    f"{os.path.basename(wrf_files[-1]).replace('wrfout_d01_', '')}",
-    ha="center",
-    va="bottom",
-    fontsize=12,
-)
-
-out_path = os.path.join(output_dir, "time_mean_panel_c_120E_precip_section.png")
-plt.savefig(out_path, dpi=300, bbox_inches="tight")
-plt.close(fig)
-
-print(f"\n已保存时间平均大图: {out_path}")
-print(f"降水粒子变量使用: {used_precip_vars_ref}")
-print("全部完成。")
\ No newline at end of file
+    out_path = os.path.join(output_dir, "time_mean_panel_c_120E_precip_section.png")
+    plt.savefig(out_path, dpi=300, bbox_inches="tight")
+    plt.close(fig)
+
+    print(f"\n已保存时间平均大图: {out_path}")
+    print(f"降水粒子变量使用: {used_precip_vars_ref}")
+    print("全部完成。")
+
+
+# =========================================================
+# 7. 主流程：map-reduce 求时间平均
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="120E 剖面降水粒子时间平均")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+
+    if len(wrf_files) == 0:
+        raise FileNotFoundError("没有找到 wrfout_d01_* 文件。")
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    print(f"共找到 {len(wrf_files)} 个 wrfout 文件")
+    print(f"剖面经度: {lon_section}E")
+
+    acc = map_reduce_files(
+        wrf_files,
+        accumulate_precip_sections,
+        workers=args.workers,
+        lon_section=lon_section,
+    )
+
+    print("\n所有 wrfout 文件剖面提取完成。")
+
+    # -----------------------------------------------------
+    # 计算时间平均
+    # -----------------------------------------------------
+    precip_mean = acc.mean("precip")
+    p_mean = acc.mean("p")
+    v_mean = acc.mean("v")
+    w_mean = acc.mean("w")
+    z_mean = acc.mean("z")
+
+    # 风速等值线（保持之前逻辑）
+    speed_mean = np.sqrt(v_mean**2 + w_mean**2)
+
+    # 只画 > 0 的降水粒子
+    precip_mean_masked = np.ma.masked_less_equal(precip_mean, 0.0)
+
+    # 统计量
+    valid_precip = precip_mean[precip_mean > 0]
+
+    print("\n时间平均剖面降水粒子统计（QRAIN+QSNOW+QGRAUP）：")
+    if valid_precip.size > 0:
+        print(f"最大值: {np.nanmax(valid_precip):.6f} g/kg")
+        print(f"最小值: {np.nanmin(valid_precip):.6f} g/kg")
+        print(f"平均值: {np.nanmean(valid_precip):.6f} g/kg")
+    else:
+        print("时间平均后整个剖面降水粒子都为 0。")
+
+    print("\n时间平均剖面风速统计：")
+    print(f"最大值: {np.nanmax(speed_mean):.3f} m/s")
+    print(f"最小值: {np.nanmin(speed_mean):.3f} m/s")
+    print(f"平均值: {np.nanmean(speed_mean):.3f} m/s")
+
+    plot_time_mean(
+        wrf_files, acc.static["sec_lat"], acc.static["terrain"],
+        precip_mean, precip_mean_masked, p_mean, v_mean, w_mean,
+        z_mean, speed_mean, list(acc.static["used_precip_vars"]),
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,106 @@
+# -*- coding: utf-8 -*-
+"""
+120E 经向剖面的条件合成（分类时间平均）
+
+与 vertical_wind_timeavg.py 相同的剖面（温度 / 纬向风 / 位温），
+但只对满足条件的时次做平均，每个合成类单独出一张图：
+
+- heavy_precip   : 120E 剖面上时段降水最大值 >= precip_threshold
+- shear_line     : 杭州附近区域出现 500 hPa 风切变线
+- hour_00/hour_12: 指定天气时次
+- heavy_precip_12: 12 时且剖面强降水（先判时次，不满足就不读降水）
+
+用法：
+    python vertical_composite_section.py -j 8
+    python vertical_composite_section.py -j 8 --cache composite_predicates.json
+"""
+
+import os
+import sys
+import argparse
+from functools import partial
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_mapreduce import add_workers_argument
+from wrf_composite import (
+    run_composite, HourPredicate, SectionPrecipPredicate, ShearLinePredicate
+)
+from vertical_wind_timeavg import (
+    wrf_path, start_time, end_time, target_lon,
+    select_files, find_section_line, compute_sections, plot_time_mean
+)
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+# 剖面时段降水阈值（mm / 输出间隔）
+precip_threshold = 10.0
+
+# 风切变线关心区域 [west, east, south, north] 与最小占比
+shear_box = [118.0, 122.0, 28.5, 31.5]
+shear_min_fraction = 0.05
+
+output_dir = os.path.join(current_dir, "wrf_composite_sections")
+
+
+# =========================================================
+# 2. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="120E 剖面条件合成")
+    add_workers_argument(parser)
+    parser.add_argument(
+        "--cache",
+        default=os.path.join(output_dir, "composite_predicates.json"),
+        help="判据标量缓存文件（json）",
+    )
+    args = parser.parse_args()
+
+    os.makedirs(output_dir, exist_ok=True)
+
+    selected_files = select_files(wrf_path, start_time, end_time)
+    start_point, end_point = find_section_line(selected_files[0], target_lon)
+    prev_files = {f: p for p, f in zip(selected_files[:-1], selected_files[1:])}
+
+    heavy_precip = SectionPrecipPredicate(target_lon, precip_threshold, prev_files)
+
+    classes = {
+        "heavy_precip": [heavy_precip],
+        "shear_line": [ShearLinePredicate(shear_box, shear_min_fraction)],
+        "hour_00": [HourPredicate([0])],
+        "hour_12": [HourPredicate([12])],
+        "heavy_precip_12": [HourPredicate([12]), heavy_precip],
+    }
+
+    acc = run_composite(
+        selected_files,
+        classes,
+        read_fields=partial(compute_sections, start_point=start_point, end_point=end_point),
+        cache_path=args.cache,
+        workers=args.workers,
+    )
+
+    for cls in classes:
+        n = acc.n_times(cls)
+        if n == 0:
+            print(f"{cls}: 没有满足条件的时次，跳过作图。")
+            continue
+
+        cacc = acc.classes[cls]
+        plot_time_mean(
+            cacc.static["lat_vals"], cacc.static["ter_km"],
+            cacc.mean("temp"), cacc.mean("ua"), cacc.mean("theta"),
+            title_line=f"Composite: {cls} (N = {n} / {len(acc)})",
+            out_png=os.path.join(output_dir, f"composite_120E_{cls}.png"),
+        )
+
+
+if __name__ == "__main__":
+    main()
@@ -7,7 +7,6 @@
 暂时如上
 '''
 import os
-import re
 import sys
 from datetime import datetime
 
@@ -26,7 +25,7 @@ current_dir = os.path.dirname(os.path.abspath(__file__))
 parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, parent_dir)
 
-from wrf_read_data import WRFDataReader
+from wrf_read_data import WRFDataReader, parse_wrf_time_from_filename
 
 
 # =========================================================
@@ -50,30 +49,7 @@ temp_levels = np.arange(-60, 31, 2)       # 温度 degC，填色
 
 
 # =========================================================
-# 2. 时间解析函数
-# =========================================================
-def parse_wrf_time_from_filename(fname):
-    """
-    支持：
-    wrfout_d01_2022-11-30_18:00:00
-    wrfout_d01_2022-11-30_18_00_00
-    wrfout_d01_2022-11-30_180000
-    """
-    base = os.path.basename(fname)
-    tstr = base.replace("wrfout_d01_", "")
-    tstr = tstr.replace("\uf03a", ":")
-
-    m = re.search(r"(\d{4}-\d{2}-\d{2})_(\d{2})[:_](\d{2})[:_](\d{2})", tstr)
-    if not m:
-        raise ValueError(f"无法从文件名解析时间: {fname}")
-
-    date_part, hh, mm, ss = m.groups()
-    standard = f"{date_part}_{hh}:{mm}:{ss}"
-    return datetime.strptime(standard, "%Y-%m-%d_%H:%M:%S")
-
-
-# =========================================================
-# 3. 获取文件并按时间筛选
+# 2. 获取文件并按时间筛选
 # =========================================================
 reader = WRFDataReader(wrf_path)
 wrf_files = sorted(reader.get_files())
@@ -96,7 +72,7 @@ for f in selected_files:
 
 
 # =========================================================
-# 4. 用第一个文件自动确定最接近 120E 的剖面线
+# 3. 用第一个文件自动确定最接近 120E 的剖面线
 # =========================================================
 nc0 = Dataset(selected_files[0])
 
@@ -124,7 +100,7 @@ nc0.close()
 
 
 # =========================================================
-# 5. 循环做剖面并时间平均
+# 4. 循环做剖面并时间平均
 # =========================================================
 sum_temp = None
 sum_ua = None
@@ -235,7 +211,7 @@ theta_mean = np.where(valid_theta_count > 0, sum_theta / valid_theta_count, np.n
 
 
 # =========================================================
-# 6. 画图
+# 5. 画图
 # =========================================================
 x2d, y2d = np.meshgrid(lat_vals, z_km)
 
@@ -0,0 +1,127 @@
+# -*- coding: utf-8 -*-
+"""
+全时段雨雪相态分离：逐时段 SR（或 SNOWNC）分配反累计后的时段降水，
+累加全时段和逐日的 总 / 液态 / 冻结 降水
+
+与 snow_coverage.py 里“累计降水 × SR”不同，这里每个时段用该时段的 SR，
+具体见上级目录 wrf_snow.PhasePartition。每个文件整块读入、整块计算，只保留上一时次，
+整个季节的模拟也能放进内存。
+
+用法：
+    python rain_snow_partition.py
+    python rain_snow_partition.py --sr-mode mean --day-hours 24 --utc-offset 8
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import timedelta
+
+import numpy as np
+from netCDF4 import Dataset, date2num
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader, parse_wrf_time_from_filename
+from wrf_deaccum import WindowTotals, fixed_windows
+from wrf_snow import SR_MODES, partition_precip
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+output_dir = os.path.join(current_dir, "wrf_rain_snow_partition")
+
+partition_names = ["total_precip", "liquid_precip", "frozen_precip"]
+
+
+# =========================================================
+# 2. 输出
+# =========================================================
+def write_partition(part, windows, lat, lon, out_nc, attrs):
+    time_units = "hours since 1970-01-01 00:00:00"
+    names = [n for n in partition_names if n in part.totals]
+
+    with Dataset(out_nc, "w") as nc:
+        ny, nx = lat.shape
+        nc.createDimension("south_north", ny)
+        nc.createDimension("west_east", nx)
+        nc.createDimension("window", len(windows.labels))
+        nc.description = "逐时段雨雪相态分离后的全时段 / 逐窗口降水总量"
+        nc.period = f"{part.first_time:%Y-%m-%d %H} ~ {part.last_time:%Y-%m-%d %H}"
+        nc.n_intervals = part.n_intervals
+        for key, value in attrs.items():
+            setattr(nc, key, value)
+
+        dims = ("south_north", "west_east")
+        for name, arr in (("XLAT", lat), ("XLONG", lon)):
+            nc.createVariable(name, "f4", dims, zlib=True)[:] = arr
+        for key, k in (("window_start", 0), ("window_end", 1)):
+            v = nc.createVariable(key, "f8", ("window",))
+            v.units = time_units
+            v[:] = date2num([w[k] for w in windows.windows], time_units)
+        v = nc.createVariable("window_hours_covered", "f4", ("window",))
+        v[:] = [windows.covered_hours[label] for label in windows.labels]
+
+        for name in names:
+            v = nc.createVariable(name, "f4", dims, zlib=True)
+            v.units = "mm"
+            v[:] = part.totals[name]
+            v = nc.createVariable(f"{name}_window", "f4", ("window",) + dims, zlib=True,
+                                  fill_value=np.float32(np.nan))
+            v.units = "mm"
+            for k, label in enumerate(windows.labels):
+                if name in windows.totals(label):
+                    v[k] = windows.totals(label)[name]
+    print(f"已保存: {out_nc}")
+
+
+# =========================================================
+# 3. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="全时段雨雪相态分离")
+    parser.add_argument("--sr-mode", choices=SR_MODES, default="end",
+                        help="时段 SR：end 为时段末的 SR，mean 为时段首末平均")
+    parser.add_argument("--day-hours", type=float, default=24.0, help="统计窗口长度（小时）")
+    parser.add_argument("--utc-offset", type=float, default=0.0,
+                        help="窗口边界所在时区相对 UTC 的小时数（北京时 00 时为日界取 8）")
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+    os.makedirs(output_dir, exist_ok=True)
+
+    t_first = parse_wrf_time_from_filename(wrf_files[0])
+    t_last = parse_wrf_time_from_filename(wrf_files[-1])
+    anchor = t_first.replace(hour=0, minute=0, second=0) - timedelta(hours=args.utc_offset)
+    windows = WindowTotals(fixed_windows(t_first, t_last, args.day_hours, anchor=anchor))
+
+    t0 = time.perf_counter()
+    part = partition_precip(wrf_files, sr_mode=args.sr_mode, windows=windows)
+    print(f"用时 {time.perf_counter() - t0:.1f} s")
+
+    with Dataset(wrf_files[0]) as nc:
+        lat = np.asarray(nc.variables["XLAT"][0])
+        lon = np.asarray(nc.variables["XLONG"][0])
+
+    for name in partition_names:
+        if name in part.totals:
+            print(f"{name}: 区域最大 {np.nanmax(part.totals[name]):.2f} mm，区域平均 {np.nanmean(part.totals[name]):.2f} mm")
+
+    out_nc = os.path.join(output_dir, f"rain_snow_partition_{args.sr_mode}.nc")
+    write_partition(part, windows, lat, lon, out_nc,
+                    {"sr_mode": args.sr_mode, "frozen_source": str(part.plan.frozen_source),
+                     "utc_offset": args.utc_offset})
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,82 @@
+# -*- coding: utf-8 -*-
+"""
+全部时次的积雪诊断（积雪覆盖、积雪深度、液态 / 冻结降水），写一个压缩的 netCDF
+
+snow_coverage.py 的批量版本：变量回退计划按第一个文件定一次，
+每个文件只打开一次、每个变量只读一次，降水为相对上一时次的时段量（wrf_deaccum）。
+具体见上级目录 wrf_snow.py。
+
+用法：
+    python snow_batch.py
+    python snow_batch.py --start 2022-11-26_00 --end 2022-11-30_00 --out snow_batch.nc
+    python snow_batch.py --plan-only
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+from netCDF4 import Dataset
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader, parse_wrf_time_from_filename
+from wrf_snow import resolve_snow_plan, run_snow_batch
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+default_out = os.path.join(current_dir, "wrf_snow_batch", "snow_batch.nc")
+
+# 若用 SWE 推算积雪深度，雪密度取值（kg/m^3）
+rho_snow = 100.0
+
+
+# =========================================================
+# 2. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="全部时次的积雪诊断")
+    parser.add_argument("--out", default=default_out, help="输出 netCDF")
+    parser.add_argument("--start", default=None, help="起始时间 YYYY-mm-dd_HH（含）")
+    parser.add_argument("--end", default=None, help="结束时间 YYYY-mm-dd_HH（含）")
+    parser.add_argument("--rho-snow", type=float, default=rho_snow, help="雪密度（kg/m^3），由 SWE 估算深度时用")
+    parser.add_argument("--plan-only", action="store_true", help="只打印变量计划，不处理")
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+    fmt = "%Y-%m-%d_%H"
+    if args.start:
+        wrf_files = [f for f in wrf_files if parse_wrf_time_from_filename(f) >= datetime.strptime(args.start, fmt)]
+    if args.end:
+        wrf_files = [f for f in wrf_files if parse_wrf_time_from_filename(f) <= datetime.strptime(args.end, fmt)]
+    if len(wrf_files) == 0:
+        raise FileNotFoundError("时间范围内没有 wrfout 文件。")
+
+    with Dataset(wrf_files[0]) as nc:
+        plan = resolve_snow_plan(nc.variables.keys())
+    if args.plan_only:
+        print("========== 变量计划 ==========")
+        for line in plan.describe():
+            print(line)
+        return
+
+    os.makedirs(os.path.dirname(os.path.abspath(args.out)), exist_ok=True)
+    t0 = time.perf_counter()
+    run_snow_batch(wrf_files, args.out, rho_snow=args.rho_snow, plan=plan)
+    print(f"完成，用时 {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
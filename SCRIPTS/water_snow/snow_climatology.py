@@ -0,0 +1,134 @@
+# -*- coding: utf-8 -*-
+"""
+积雪季节统计图：积雪日数、覆盖频率、初雪日、终雪日、最大积雪深度、累计冻结降水
+
+输入为 snow_batch.py 生成的逐时次积雪库；按时间顺序分块读取，
+由 wrf_snow.SnowClimatology 流式归并（当天的覆盖掩码按位打包暂存，日界时计数），
+多个月的模拟也只占常数内存。
+
+用法：
+    python snow_climatology.py
+    python snow_climatology.py --store wrf_snow_batch/snow_batch.nc --day-fraction 0.5 --utc-offset 8
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime, timedelta
+
+import numpy as np
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+import matplotlib.pyplot as plt
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_snow import SnowClimatology, iter_snow_store, read_snow_store, write_snow_climatology
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+default_store = os.path.join(current_dir, "wrf_snow_batch", "snow_batch.nc")
+output_dir = os.path.join(current_dir, "wrf_snow_climatology")
+
+
+# =========================================================
+# 2. 画图
+# =========================================================
+def day_labels(days):
+    """
+    days since 1970-01-01 -> 'mm-dd' 刻度文字
+    """
+    epoch = datetime(1970, 1, 1)
+    return [(epoch + timedelta(days=float(d))).strftime("%m-%d") for d in days]
+
+
+def plot_climatology(products, lat, lon, title, out_png):
+    proj = ccrs.PlateCarree()
+    panels = [
+        ("snow_days", "Snow-cover days", "Blues"),
+        ("cover_frequency", "Snow-cover frequency", "Blues"),
+        ("first_snow_day", "First snow day", "viridis"),
+        ("last_snow_day", "Last snow day", "viridis_r"),
+        ("max_depth", "Max snow depth (cm)", "PuBu"),
+        ("frozen_total", "Frozen precipitation (mm)", "PuBu"),
+    ]
+
+    fig, axes = plt.subplots(2, 3, figsize=(18, 10), subplot_kw={"projection": proj})
+    for ax, (name, label, cmap) in zip(axes.ravel(), panels):
+        field = np.asarray(products[name], dtype=np.float64)
+        if name in ("first_snow_day", "last_snow_day"):
+            field = np.where(field >= 0, field, np.nan)
+        else:
+            if name == "max_depth":
+                field = field * 100.0
+            field = np.where(field > 0, field, np.nan)
+
+        ax.set_extent([np.nanmin(lon), np.nanmax(lon), np.nanmin(lat), np.nanmax(lat)], crs=proj)
+        ax.add_feature(cfeature.COASTLINE.with_scale("50m"), linewidth=0.7)
+        ax.add_feature(cfeature.BORDERS.with_scale("50m"), linewidth=0.6)
+        pm = ax.pcolormesh(lon, lat, field, transform=proj, shading="auto", cmap=cmap)
+        cbar = plt.colorbar(pm, ax=ax, shrink=0.8, pad=0.02)
+        cbar.set_label(label)
+        if name in ("first_snow_day", "last_snow_day") and np.isfinite(field).any():
+            ticks = np.linspace(np.nanmin(field), np.nanmax(field), 5).round()
+            cbar.set_ticks(ticks)
+            cbar.set_ticklabels(day_labels(ticks))
+
+        gl = ax.gridlines(crs=proj, draw_labels=True, linewidth=0.4, color="gray", alpha=0.5, linestyle="--")
+        gl.top_labels = False
+        gl.right_labels = False
+        ax.set_title(label, fontsize=12)
+
+    fig.suptitle(title, fontsize=14)
+    plt.savefig(out_png, dpi=150, bbox_inches="tight")
+    plt.close(fig)
+    print(f"图已保存: {out_png}")
+
+
+# =========================================================
+# 3. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="积雪季节统计图")
+    parser.add_argument("--store", default=default_store, help="snow_batch.py 生成的积雪库")
+    parser.add_argument("--day-fraction", type=float, default=0.5,
+                        help="一天中覆盖时次比例不低于该值记为积雪日")
+    parser.add_argument("--utc-offset", type=float, default=0.0,
+                        help="日界所在时区相对 UTC 的小时数（北京时取 8）")
+    parser.add_argument("--block", type=int, default=24, help="每次读入的时次数")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        raise FileNotFoundError(f"没有找到积雪库: {args.store}（先运行 snow_batch.py）")
+    os.makedirs(output_dir, exist_ok=True)
+
+    static, _, attrs = read_snow_store(args.store, names=[])
+    lat, lon = static["XLAT"], static["XLONG"]
+    clim = SnowClimatology(lat.shape, day_fraction=args.day_fraction, day_offset_hours=-args.utc_offset)
+
+    t0 = time.perf_counter()
+    for t, fields in iter_snow_store(args.store, block=args.block):
+        cover = fields.get("snow_cover")
+        clim.update(t, cover=None if cover is None else cover > 0,
+                    depth=fields.get("snow_depth"), frozen=fields.get("frozen_precip"))
+    print(f"归并完成: {clim.n_steps} 个时次，用时 {time.perf_counter() - t0:.1f} s")
+
+    out_nc = os.path.join(output_dir, "snow_climatology.nc")
+    write_snow_climatology(clim, out_nc, lat, lon,
+                           attrs={"cover_source": attrs.get("plan_cover_source", ""), "utc_offset": args.utc_offset})
+
+    products = clim.products()
+    title = f"Snow climatology  {clim.first_time:%Y-%m-%d} ~ {clim.last_time:%Y-%m-%d} ({clim.n_days} days)"
+    plot_climatology(products, lat, lon, title, out_nc.replace(".nc", ".png"))
+
+
+if __name__ == "__main__":
+    main()
@@ -61,6 +61,8 @@ parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, parent_dir)
 
 from wrf_read_data import WRFDataReader
+from wrf_deaccum import interval_between
+from wrf_snow import partition_precip
 
 
 # =========================================================
@@ -91,6 +93,10 @@ ncfile = Dataset(target_file)
 # 时间索引：如果 wrfout 里只有一个时间，一般用 0 或 -1 都可以
 timeidx = -1
 
+# 降水画时段量（相对前一个 wrfout，经 wrf_deaccum 反累计）还是累计量
+use_period_precip = True
+prev_file = wrf_files[wrf_files.index(target_file) - 1] if wrf_files.index(target_file) > 0 else None
+
 # 若用 SWE 推算积雪深度，雪密度取值（kg/m^3）
 rho_snow = 100.0
 
@@ -196,7 +202,7 @@ def choose_snow_depth(nc, timeidx=-1, rho_snow=100.0):
     return None, None, False
 
 
-def separate_rain_snow(nc, timeidx=-1):
+def separate_rain_snow(nc, timeidx=-1, prev_nc=None, prev_timeidx=-1, history_files=None):
     """
     雨雪分离：
     total_precip = RAINC + RAINNC + RAINSH
@@ -205,14 +211,41 @@ def separate_rain_snow(nc, timeidx=-1):
     liquid_precip = total_precip - frozen_precip
 
     注意：
-    这些常常是累计量。如果你想算某个时段降水，应对相邻两个时次做差分。
+    RAINC / RAINNC / RAINSH / SNOWNC 是累计量。
+    给出 prev_nc（前一时次的文件）时，先用 wrf_deaccum 反累计成两时次之间的时段量
+    （桶计数器、冷启动已处理）；不给时返回的是累计量。SR 是瞬时量，不做差分。
+
+    SR 只能分配同一时段的降水，用累计量乘 SR 是不对的。累计量 + SR 回退时，
+    给出 history_files（起报到当前时次的全部文件）则逐时段分配后再累加（wrf_snow.partition_precip）。
+    这样得到的总量从 history_files 的第一个时次算起，不含模式起报到第一个文件之间的降水；
+    history_files 不足两个时次（没有时段可分）时仍退回累计量 × SR。
     """
-    rainc = read2d_from_var(nc, "RAINC", timeidx)
-    rainnc = read2d_from_var(nc, "RAINNC", timeidx)
-    rainsh = read2d_from_var(nc, "RAINSH", timeidx)
-    snownc = read2d_from_var(nc, "SNOWNC", timeidx)
+    if prev_nc is not None:
+        period = interval_between(prev_nc, nc, prev_timeidx, timeidx).fields
+        rainc, rainnc, rainsh, snownc = (period.get(name) for name in ("RAINC", "RAINNC", "RAINSH", "SNOWNC"))
+    else:
+        rainc = read2d_from_var(nc, "RAINC", timeidx)
+        rainnc = read2d_from_var(nc, "RAINNC", timeidx)
+        rainsh = read2d_from_var(nc, "RAINSH", timeidx)
+        snownc = read2d_from_var(nc, "SNOWNC", timeidx)
     sr = read2d_from_var(nc, "SR", timeidx)
 
+    part = None
+    if prev_nc is None and snownc is None and sr is not None and history_files and len(history_files) >= 2:
+        part = partition_precip(history_files, verbose=False)
+    if part is not None and part.n_intervals > 0:
+        return {
+            "RAINC": rainc,
+            "RAINNC": rainnc,
+            "RAINSH": rainsh,
+            "SNOWNC": None,
+            "SR": sr,
+            "total_precip": part.totals["total_precip"],
+            "frozen_precip": part.totals["frozen_precip"],
+            "liquid_precip": part.totals["liquid_precip"],
+            "frozen_source": "逐时段 SR × 时段降水",
+        }
+
     total_precip = None
     parts = [x for x in (rainc, rainnc, rainsh) if x is not None]
     if len(parts) > 0:
@@ -361,7 +394,13 @@ print_var_status(ncfile)
 # =========================================================
 # 5. 雨雪分离
 # =========================================================
-sep = separate_rain_snow(ncfile, timeidx=timeidx)
+if use_period_precip and prev_file is not None:
+    print(f"时段降水: {os.path.basename(prev_file)} -> {target_basename}")
+    with Dataset(prev_file) as ncfile_prev:
+        sep = separate_rain_snow(ncfile, timeidx=timeidx, prev_nc=ncfile_prev)
+else:
+    history = wrf_files[:wrf_files.index(target_file) + 1]
+    sep = separate_rain_snow(ncfile, timeidx=timeidx, history_files=history)
 
 print("========== 雨雪分离结果 ==========")
 print(f"冻结降水来源: {sep['frozen_source']}")
@@ -6,7 +6,6 @@ import numpy as np
 import matplotlib.pyplot as plt
 import matplotlib.colors as mcolors
 from netCDF4 import Dataset
-from scipy.ndimage import gaussian_filter, binary_erosion
 
 import cartopy.crs as ccrs
 import cartopy.feature as cfeature
@@ -24,6 +23,9 @@ parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
 sys.path.insert(0, parent_dir)
 
 from wrf_read_data import WRFDataReader
+from wrf_synoptic import shear_line_mask
+from wrf_kinematics import read_grid_metrics
+from wrf_deaccum import period_totals
 
 
 # =========================================================
@@ -78,25 +80,20 @@ proj = get_cartopy(z500)
 # =========================================================
 # 3. 读取降水
 # =========================================================
-# WRF 常用累计降水 = RAINC + RAINNC
-rainc_now = getvar(ncfile, "RAINC")
-rainnc_now = getvar(ncfile, "RAINNC")
-rain_now = rainc_now + rainnc_now
-
+# WRF 常用累计降水 = RAINC + RAINNC（+ RAINSH）
+# 时段降水由 wrf_deaccum 反累计：桶计数器 I_RAINC / I_RAINNC 加回，
+# 冷启动（累计量归零）处取新一段模拟的累计量，而不是简单置 0
 if use_period_precip and len(wrf_files) >= 2:
     # 当前时次相对前一个 wrfout 的时段降水
-    prev_idx = file_idx - 1 if file_idx != 0 else 0
-    ncfile_prev = Dataset(wrf_files[prev_idx])
-
-    rainc_prev = getvar(ncfile_prev, "RAINC")
-    rainnc_prev = getvar(ncfile_prev, "RAINNC")
-    rain_prev = rainc_prev + rainnc_prev
-
-    rain_plot = to_np(rain_now - rain_prev)
-    rain_plot = np.where(rain_plot < 0, 0, rain_plot)   # 防止少数重启导致负值
+    cur_idx = file_idx % len(wrf_files)
+    if cur_idx == 0:
+        rain_plot = np.zeros_like(to_np(z500))    # 第一个文件没有前一时次
+    else:
+        _, _, totals = period_totals(wrf_files[cur_idx - 1:cur_idx + 1], names=("RAINC", "RAINNC", "RAINSH"))
+        rain_plot = totals["PRECIP"]
 else:
     # 直接画累计降水
-    rain_plot = to_np(rain_now)
+    rain_plot = to_np(getvar(ncfile, "RAINC") + getvar(ncfile, "RAINNC"))
 
 
 # =========================================================
@@ -109,33 +106,15 @@ else:
 # 2) 同时位于相对辐合区
 # 3) 对满足条件区域的边界作线
 # 这是比较实用的一种近似画法。
-
-u = gaussian_filter(to_np(u500), smooth_sigma)
-v = gaussian_filter(to_np(v500), smooth_sigma)
-
-# 简化处理：在规则网格上用 np.gradient 求梯度
-# 对天气图展示足够实用
-dudy, dudx = np.gradient(u)
-dvdy, dvdx = np.gradient(v)
-
-# 水平辐散（负值代表辐合）
-div = dudx + dvdy
-
-# 形变强度（总形变）
-deform = np.sqrt((dudx - dvdy)**2 + (dudy + dvdx)**2)
-
-# 阈值
-shear_thr = np.nanpercentile(deform, shear_percentile)
-conv_thr = np.nanpercentile(div, conv_percentile)
-
-# 剪切线候选区：形变强 + 收敛
-shear_mask = (deform >= shear_thr) & (div <= conv_thr)
-
-# 去掉零碎像元，使线更平滑
-shear_mask = gaussian_filter(shear_mask.astype(float), 1.0) > 0.35
-
-# 取边界
-shear_edge = shear_mask ^ binary_erosion(shear_mask)
+# 具体计算见上级目录 wrf_synoptic.shear_line_mask；
+# 辐散 / 形变按 DX / DY 和地图系数求（wrf_kinematics），单位 s-1
+shear_mask, shear_edge, div, deform = shear_line_mask(
+    to_np(u500), to_np(v500),
+    smooth_sigma=smooth_sigma,
+    shear_percentile=shear_percentile,
+    conv_percentile=conv_percentile,
+    metrics=read_grid_metrics(ncfile),
+)
 
 
 # =========================================================
@@ -0,0 +1,81 @@
+# -*- coding: utf-8 -*-
+"""
+全部时次的 500 hPa 天气分析：等压面 z / u / v / t、海平面气压、辐散、形变和风切变线掩码，写一个 netCDF
+
+500hPa_geopotential_analysis.py 只画一个文件；这里整个模拟一次调用，
+按块读入 (T, Y, X) 后整块平滑、求梯度、逐时次求百分位阈值（见上级目录 wrf_synoptic.py），
+插值不依赖 wrf-python。
+
+用法：
+    python synoptic_500hPa_batch.py
+    python synoptic_500hPa_batch.py --start 2022-11-26_00 --end 2022-11-30_00 -j 4
+    python synoptic_500hPa_batch.py --level 700 --out synoptic_700hPa.nc
+"""
+
+import os
+import sys
+import time
+import argparse
+from datetime import datetime
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_read_data import WRFDataReader, parse_wrf_time_from_filename
+from wrf_mapreduce import add_workers_argument
+from wrf_synoptic import run_synoptic_batch
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+wrf_path = "/Volumes/Lexar/WRF_Data/WRF_second_try/wrfout_d01_*"
+
+output_dir = os.path.join(current_dir, "wrf_synoptic_batch")
+
+# 风切变线识别参数（与 500hPa_geopotential_analysis.py 相同）
+smooth_sigma = 1.2          # 平滑程度
+shear_percentile = 88       # 形变强度阈值百分位
+conv_percentile = 35        # 辐合阈值百分位（越小越偏向收敛区）
+
+
+# =========================================================
+# 2. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="全部时次的 500 hPa 天气分析")
+    parser.add_argument("--level", type=float, default=500.0, help="等压面（hPa）")
+    parser.add_argument("--out", default=None, help="输出 netCDF（默认 wrf_synoptic_batch/synoptic_<level>hPa.nc）")
+    parser.add_argument("--start", default=None, help="起始时间 YYYY-mm-dd_HH（含）")
+    parser.add_argument("--end", default=None, help="结束时间 YYYY-mm-dd_HH（含）")
+    parser.add_argument("--block", type=int, default=24, help="每块文件数，决定内存占用")
+    add_workers_argument(parser)
+    args = parser.parse_args()
+
+    reader = WRFDataReader(wrf_path)
+    wrf_files = reader.get_files()
+    fmt = "%Y-%m-%d_%H"
+    if args.start:
+        wrf_files = [f for f in wrf_files if parse_wrf_time_from_filename(f) >= datetime.strptime(args.start, fmt)]
+    if args.end:
+        wrf_files = [f for f in wrf_files if parse_wrf_time_from_filename(f) <= datetime.strptime(args.end, fmt)]
+    if len(wrf_files) == 0:
+        raise FileNotFoundError("时间范围内没有 wrfout 文件。")
+
+    out_nc = args.out or os.path.join(output_dir, f"synoptic_{args.level:g}hPa.nc")
+    os.makedirs(os.path.dirname(os.path.abspath(out_nc)), exist_ok=True)
+
+    t0 = time.perf_counter()
+    n_steps = run_synoptic_batch(wrf_files, out_nc, level=args.level,
+                                 smooth_sigma=smooth_sigma, shear_percentile=shear_percentile,
+                                 conv_percentile=conv_percentile,
+                                 files_per_block=args.block, workers=args.workers)
+    print(f"完成：{len(wrf_files)} 个文件，{n_steps} 个时次，用时 {time.perf_counter() - t0:.1f} s")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,92 @@
+# -*- coding: utf-8 -*-
+"""
+500 hPa 位势高度低 / 高中心和海平面气压低压中心的逐时次识别与路径跟踪
+
+输入为 synoptic_500hPa_batch.py 生成的等压面库（z、slp，slp 与 getvar("slp") 同算法）。
+全部时次整块求局地极值（ndimage 极值滤波 + 突出度阈值），再用 cKDTree 把相邻时次的中心连成路径，
+具体见上级目录 wrf_tracking.py。每类中心输出一张中心点表和一张路径汇总表（CSV）。
+
+用法：
+    python track_pressure_centers.py
+    python track_pressure_centers.py --store wrf_synoptic_batch/synoptic_500hPa.nc --max-dist 600
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_synoptic import read_store_metrics, read_synoptic_store
+from wrf_tracking import detect_extrema, link_objects, sort_by_track, track_summary, write_track_table
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+default_store = os.path.join(current_dir, "wrf_synoptic_batch", "synoptic_500hPa.nc")
+output_dir = os.path.join(current_dir, "wrf_center_tracks")
+
+# (输出名, 变量, 极值类型, 突出度阈值)；z 单位 m，slp 单位 hPa
+center_types = [
+    ("z500_low", "z", "min", 20.0),
+    ("z500_high", "z", "max", 20.0),
+    ("slp_low", "slp", "min", 1.0),
+]
+
+center_columns = ["track_id", "obj_id", "step", "parent", "lat", "lon", "j", "i", "value", "prominence"]
+
+
+# =========================================================
+# 2. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="位势高度 / 海平面气压中心跟踪")
+    parser.add_argument("--store", default=default_store, help="synoptic_500hPa_batch.py 生成的等压面库")
+    parser.add_argument("--size", type=int, default=9, help="极值邻域边长（格点）")
+    parser.add_argument("--prominence-size", type=int, default=21, help="突出度窗口边长（格点）")
+    parser.add_argument("--max-dist", type=float, default=500.0, help="相邻时次中心最大移动距离（km）")
+    parser.add_argument("--max-gap", type=int, default=1, help="允许跨越的时次数（1 表示只连相邻时次）")
+    parser.add_argument("--min-steps", type=int, default=3, help="汇总时统计的最短路径时次数")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        raise FileNotFoundError(f"没有找到等压面库: {args.store}（先运行 synoptic_500hPa_batch.py）")
+    os.makedirs(output_dir, exist_ok=True)
+
+    names = sorted({var for _, var, _, _ in center_types})
+    times, fields, _ = read_synoptic_store(args.store, names=names)
+    lat, lon = fields["XLAT"], fields["XLONG"]
+    metrics = read_store_metrics(args.store)
+    if metrics is None:
+        print("等压面库中没有 DX，距离按格点计")
+        dx_km, dy_km = 1.0, 1.0
+    else:
+        dx_km, dy_km = metrics.dx / 1000.0, metrics.dy / 1000.0
+    print(f"读入 {len(times)} 个时次: {times[0]:%Y-%m-%d %H} ~ {times[-1]:%Y-%m-%d %H}")
+
+    for out_name, var, kind, min_prominence in center_types:
+        t0 = time.perf_counter()
+        centers = detect_extrema(fields[var], kind=kind, size=args.size,
+                                 prominence_size=args.prominence_size, min_prominence=min_prominence,
+                                 dx=dx_km, dy=dy_km, lat=lat, lon=lon)
+        centers["track_id"], centers["parent"] = link_objects(centers, max_dist=args.max_dist,
+                                                              max_gap=args.max_gap)
+        summary = track_summary(centers, times)
+        n_long = int((summary["n_steps"] >= args.min_steps).sum()) if len(centers["step"]) else 0
+        print(f"[{out_name}] {len(centers['step'])} 个中心，{len(summary['track_id'])} 条路径"
+              f"（持续 >= {args.min_steps} 个时次的 {n_long} 条），用时 {time.perf_counter() - t0:.2f} s")
+
+        write_track_table(os.path.join(output_dir, f"{out_name}_centers.csv"), sort_by_track(centers), times,
+                          columns=center_columns)
+        write_track_table(os.path.join(output_dir, f"{out_name}_tracks.csv"), summary)
+
+
+if __name__ == "__main__":
+    main()
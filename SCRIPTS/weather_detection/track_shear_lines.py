@@ -0,0 +1,104 @@
+# -*- coding: utf-8 -*-
+"""
+风切变线与槽区的逐时次目标标记和跨时次跟踪
+
+输入为 synoptic_500hPa_batch.py 生成的等压面库（shear_mask、z）：
+- 切变线：直接用库里的 shear_mask
+- 槽区：由 z 的拉普拉斯求（wrf_synoptic.trough_masks）
+每个时次做连通区域标记（面积、质心、取向、长短轴），相邻时次按重叠 / 质心距离一对一关联，
+具体见上级目录 wrf_tracking.py。输出每类一张目标轨迹表和一张轨迹汇总表（CSV）。
+
+用法：
+    python track_shear_lines.py
+    python track_shear_lines.py --store wrf_synoptic_batch/synoptic_500hPa.nc --max-dist 400 --max-gap 2
+"""
+
+import os
+import sys
+import time
+import argparse
+
+# =========================================================
+# 0. 导入上级目录中的模块
+# =========================================================
+current_dir = os.path.dirname(os.path.abspath(__file__))
+parent_dir = os.path.abspath(os.path.join(current_dir, ".."))
+sys.path.insert(0, parent_dir)
+
+from wrf_synoptic import read_store_metrics, read_synoptic_store, trough_masks
+from wrf_tracking import (label_objects, overlap_pairs, link_objects, sort_by_track,
+                          track_summary, write_track_table)
+
+
+# =========================================================
+# 1. 参数设置
+# =========================================================
+default_store = os.path.join(current_dir, "wrf_synoptic_batch", "synoptic_500hPa.nc")
+output_dir = os.path.join(current_dir, "wrf_feature_tracks")
+
+# 槽区识别参数（可调）
+trough_sigma = 2.0          # 位势高度平滑程度
+trough_percentile = 85      # 拉普拉斯阈值百分位
+
+object_columns = ["track_id", "obj_id", "step", "parent", "cells", "area", "lat", "lon", "j", "i",
+                  "orientation", "major", "minor"]
+
+
+# =========================================================
+# 2. 标记与跟踪
+# =========================================================
+def track_feature(masks, times, lat, lon, cell_area, dx_km, dy_km, args, name):
+    t0 = time.perf_counter()
+    labels, objs = label_objects(masks, min_cells=args.min_cells, cell_area=cell_area,
+                                 dx=dx_km, dy=dy_km, lat=lat, lon=lon)
+    pairs = overlap_pairs(labels, objs)
+    objs["track_id"], objs["parent"] = link_objects(objs, max_dist=args.max_dist, pairs=pairs,
+                                                    min_overlap=args.min_overlap, max_gap=args.max_gap)
+    summary = track_summary(objs, times)
+    long_tracks = int((summary["n_steps"] >= args.min_steps).sum()) if len(objs["step"]) else 0
+    print(f"[{name}] {len(objs['step'])} 个目标，{len(summary['track_id'])} 条轨迹"
+          f"（持续 >= {args.min_steps} 个时次的 {long_tracks} 条），用时 {time.perf_counter() - t0:.2f} s")
+
+    write_track_table(os.path.join(output_dir, f"{name}_objects.csv"), sort_by_track(objs), times,
+                      columns=[c for c in object_columns if c in objs])
+    write_track_table(os.path.join(output_dir, f"{name}_tracks.csv"), summary)
+
+
+# =========================================================
+# 3. 主流程
+# =========================================================
+def main():
+    parser = argparse.ArgumentParser(description="风切变线与槽区目标跟踪")
+    parser.add_argument("--store", default=default_store, help="synoptic_500hPa_batch.py 生成的等压面库")
+    parser.add_argument("--min-cells", type=int, default=6, help="目标最少格点数")
+    parser.add_argument("--max-dist", type=float, default=500.0, help="相邻时次质心最大移动距离（km）")
+    parser.add_argument("--min-overlap", type=float, default=0.1, help="按重叠关联的最小重叠比例")
+    parser.add_argument("--max-gap", type=int, default=1, help="允许跨越的时次数（1 表示只连相邻时次）")
+    parser.add_argument("--min-steps", type=int, default=3, help="汇总时统计的最短轨迹时次数")
+    args = parser.parse_args()
+
+    if not os.path.exists(args.store):
+        raise FileNotFoundError(f"没有找到等压面库: {args.store}（先运行 synoptic_500hPa_batch.py）")
+    os.makedirs(output_dir, exist_ok=True)
+
+    times, fields, _ = read_synoptic_store(args.store, names=["shear_mask", "z"])
+    lat, lon = fields["XLAT"], fields["XLONG"]
+    metrics = read_store_metrics(args.store)
+    if metrics is None:
+        # 旧文件没有网格度量：面积按格点数，距离按格点
+        print("等压面库中没有 DX / MAPFAC_M，面积和距离按格点计")
+        cell_area, dx_km, dy_km = None, 1.0, 1.0
+    else:
+        cell_area = metrics.dx * metrics.dy / metrics.msfm ** 2 / 1.0e6
+        dx_km, dy_km = metrics.dx / 1000.0, metrics.dy / 1000.0
+    print(f"读入 {len(times)} 个时次: {times[0]:%Y-%m-%d %H} ~ {times[-1]:%Y-%m-%d %H}")
+
+    track_feature(fields["shear_mask"], times, lat, lon, cell_area, dx_km, dy_km, args, "shear_line")
+
+    trough, _ = trough_masks(fields["z"], smooth_sigma=trough_sigma,
+                             trough_percentile=trough_percentile, metrics=metrics)
+    track_feature(trough, times, lat, lon, cell_area, dx_km, dy_km, args, "trough")
+
+
+if __name__ == "__main__":
+    main()
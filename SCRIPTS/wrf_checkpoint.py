@@ -0,0 +1,196 @@
+# -*- coding: utf-8 -*-
+"""
+长时段时间平均的断点续算
+
+一个季节的 wrfout 动辄上千个文件，累加器只在内存里的话，
+第 900 个文件崩溃 / 坏文件就会前功尽弃。这里做三件事：
+
+1. 每处理完一批文件，把累加器状态 + 已处理文件列表写到磁盘
+   （同一个 .npz 里，先写临时文件再 os.replace，不会出现写一半的检查点）
+2. 重启时读回检查点，只处理还没处理过的文件，结果与一次跑完完全一致
+3. 之后又追加了新的 wrfout，再跑一次就只累加新文件，旧文件不重算
+   （检查点里已累加、但这次不在文件列表里的文件无法从和里减掉，直接拒绝续算）
+
+坏文件：整批失败时退回逐文件处理，出错的文件记到 failed 里跳过，
+不计入“已处理”，下次运行会重新尝试（修好文件后直接重跑即可）。
+
+用法：
+    from wrf_checkpoint import run_checkpointed
+
+    acc = run_checkpointed(
+        files, accumulate_sections,
+        checkpoint_path="timeavg_120E.ckpt.npz",
+        every=50, workers=8,
+        config={"target_lon": 120.0},
+        start_point=..., end_point=...,
+    )
+"""
+
+import os
+import json
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+from wrf_mapreduce import MeanAccumulator, map_reduce_files
+
+
+# =========================================================
+# 1. 检查点读写
+# =========================================================
+class CheckpointStore:
+    """
+    单文件检查点：
+    - 累加器的 sum / count / static 数组
+    - 已处理文件列表（在累加器的 files 里）
+    - failed：{文件: 错误信息}
+    - config：本次计算的关键参数，参数变了就拒绝续算
+    """
+
+    def __init__(self, path: str, config: Optional[dict] = None,
+                 accumulator_cls=MeanAccumulator):
+        self.path = os.fspath(path)
+        self.config = config or {}
+        self.accumulator_cls = accumulator_cls
+
+    def exists(self) -> bool:
+        return os.path.exists(self.path)
+
+    def load(self) -> Tuple[Optional[object], Dict[str, str]]:
+        if not self.exists():
+            return None, {}
+
+        with np.load(self.path, allow_pickle=False) as npz:
+            state = {k: npz[k] for k in npz.files}
+
+        meta = json.loads(str(state.pop("__meta__")))
+        saved_config = meta.get("config", {})
+        if saved_config != _jsonable(self.config):
+            raise ValueError(
+                f"[CheckpointStore] 检查点参数与当前参数不一致，不能续算：\n"
+                f"  检查点: {saved_config}\n  当前:   {_jsonable(self.config)}\n"
+                f"如确认要重新计算，请删除 {self.path}"
+            )
+
+        acc = self.accumulator_cls.from_state(state)
+        print(f"[CheckpointStore] 读回检查点: {self.path}，已处理 {len(acc)} 个文件")
+        return acc, meta.get("failed", {})
+
+    def save(self, acc, failed: Dict[str, str]):
+        meta = {
+            "config": _jsonable(self.config),
+            "failed": failed,
+            "saved_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+        }
+        state = acc.to_state()
+        state["__meta__"] = np.array(json.dumps(meta, ensure_ascii=False))
+
+        # 先写临时文件再原子替换，崩溃时旧检查点仍然完整
+        # 注意 np.savez 会给没有 .npz 后缀的文件名自动补后缀，所以临时文件也用 .npz 结尾
+        tmp_path = self.path + ".tmp.npz"
+        np.savez(tmp_path, **state)
+        os.replace(tmp_path, self.path)
+
+
+def _jsonable(obj):
+    """
+    把 numpy 标量 / 数组等转成 json 可比较的形式
+    """
+    return json.loads(json.dumps(obj, default=lambda o: np.asarray(o).tolist()))
+
+
+# =========================================================
+# 2. 带检查点的 map-reduce
+# =========================================================
+def run_checkpointed(files: Sequence[str],
+                     map_func: Callable[..., MeanAccumulator],
+                     checkpoint_path: str,
+                     every: int = 50,
+                     workers: int = 1,
+                     config: Optional[dict] = None,
+                     accumulator_cls=MeanAccumulator,
+                     **map_kwargs):
+    """
+    files          : 全部 wrfout 文件（可以比上次多，新增的会被增量累加；
+                     不能少，检查点里的文件必须都在其中）
+    map_func       : 与 map_reduce_files 相同的 map 函数
+    checkpoint_path: 检查点文件路径（.npz）
+    every          : 每处理多少个文件写一次检查点
+    workers        : 每批内部的并行进程数
+    config         : 决定结果的关键参数（剖面经度、垂直层等），用于校验续算
+    accumulator_cls: map 函数返回的累加器类型，需要 merge / to_state / from_state
+    """
+    store = CheckpointStore(checkpoint_path, config=config,
+                            accumulator_cls=accumulator_cls)
+    acc, failed = store.load()
+    if acc is None:
+        acc = accumulator_cls()
+
+    done = set(acc.files)
+    stale = sorted(done - set(files))
+    if stale:
+        raise ValueError(
+            f"[run_checkpointed] 检查点里有 {len(stale)} 个文件不在本次文件列表中"
+            f"（如 {os.path.basename(stale[0])}），时间范围变了不能续算，"
+            f"请换一个检查点文件或删除 {checkpoint_path}"
+        )
+    pending = [f for f in files if f not in done]
+
+    print(f"[run_checkpointed] 共 {len(files)} 个文件，已完成 {len(done)}，待处理 {len(pending)}")
+    if failed:
+        print(f"[run_checkpointed] 上次失败的 {len(failed)} 个文件将重新尝试")
+    failed = {}
+
+    every = max(1, int(every))
+    for b0 in range(0, len(pending), every):
+        batch = pending[b0:b0 + every]
+
+        try:
+            part = map_reduce_files(batch, map_func, workers=workers,
+                                    verbose=False, **map_kwargs)
+        except Exception as e:
+            # 整批失败：逐个文件重做，找出坏文件
+            print(f"[run_checkpointed] 批次出错（{e}），改为逐文件处理")
+            part = _process_one_by_one(batch, map_func, failed, map_kwargs,
+                                       accumulator_cls)
+
+        acc.merge(part)
+        store.save(acc, failed)
+        print(f"[run_checkpointed] 检查点已保存：{len(acc)}/{len(files)} 个文件")
+
+    if failed:
+        print(f"[run_checkpointed] 有 {len(failed)} 个文件处理失败，已跳过：")
+        for f, err in failed.items():
+            print(f"  {os.path.basename(f)}: {err}")
+
+    return acc
+
+
+def _process_one_by_one(batch: List[str], map_func, failed: Dict[str, str],
+                        map_kwargs: dict, accumulator_cls=MeanAccumulator):
+    part = accumulator_cls()
+    for f in batch:
+        try:
+            part.merge(map_func([f], **map_kwargs))
+        except Exception as e:
+            failed[f] = f"{type(e).__name__}: {e}"
+    return part
+
+
+def add_checkpoint_arguments(parser):
+    """
+    给 argparse 解析器统一加检查点参数
+    """
+    parser.add_argument(
+        "--checkpoint",
+        default=None,
+        help="检查点文件路径（.npz）；给出后支持断点续算和增量追加",
+    )
+    parser.add_argument(
+        "--checkpoint-every",
+        type=int,
+        default=50,
+        help="每处理多少个文件保存一次检查点（默认 %(default)s）",
+    )
+    return parser
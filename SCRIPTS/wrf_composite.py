@@ -0,0 +1,341 @@
+# -*- coding: utf-8 -*-
+"""
+条件合成 / 分类平均
+
+只对满足条件的时次做平均，例如：
+- 120E 剖面上时段降水超过阈值
+- 指定区域内出现 500 hPa 风切变线（wrf_synoptic.shear_line_mask）
+- 指定的天气时次（00 / 06 / 12 / 18 UTC）
+
+流程（每个文件）：
+1. 先算判据：只读很小的变量（文件名里的时间、剖面上几列降水），
+   或直接用缓存里的标量（风切变线这种贵的判据只算一次）
+2. 判据全部满足的合成类才去读完整三维场，并累加到该类自己的累加器
+3. 一个时次可以同时属于多个类，完整场只读一次
+
+判据缓存：
+判据标量按 “判据参数 + 文件路径 + 修改时间” 存进 json（时段降水还带上前一个文件），
+下次换阈值 / 换类别重跑时直接复用，不用再打开文件。
+
+用法：
+    classes = {
+        "heavy_precip": [SectionPrecipPredicate(120.0, 10.0, prev_files)],
+        "hour_12": [HourPredicate([12])],
+    }
+    acc = run_composite(files, classes, read_fields, cache_path="pred.json", workers=8)
+    acc.mean("heavy_precip", "temp")
+"""
+
+import os
+import json
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+from netCDF4 import Dataset
+
+from wrf_read_data import parse_wrf_time_from_filename
+from wrf_mapreduce import MeanAccumulator, map_reduce_files
+
+
+# =========================================================
+# 1. 判据
+# ---------------------------------------------------------
+# 每个判据有：
+#   key       : 决定标量值的参数（不含阈值），用作缓存键
+#   cost      : 相对开销，先算便宜的，前面不满足后面就不算了
+#   cacheable : 标量是否写入缓存
+#   scalar(f) : 由文件算出一个标量
+#   test(x)   : 标量是否满足条件
+#   inputs(f) : （可选）标量依赖的文件，默认只有 f；缓存键里带上每个文件的修改时间，
+#               没有的文件记为 none
+# =========================================================
+class HourPredicate:
+    """
+    指定的时次（按文件名时间的小时）
+    """
+    cost = 0
+    cacheable = False
+
+    def __init__(self, hours: Sequence[int]):
+        self.hours = {int(h) for h in hours}
+        self.key = "hour"
+
+    def scalar(self, path):
+        return parse_wrf_time_from_filename(path).hour
+
+    def test(self, value):
+        return value in self.hours
+
+
+class SectionPrecipPredicate:
+    """
+    固定经度剖面上的最大时段降水（mm）>= 阈值
+
+    只读 XLONG 和剖面所在那几列的 RAINC / RAINNC，
+    时段降水 = 当前文件 - 前一个文件，负值（重启）置 0
+    """
+    cost = 1
+    cacheable = True
+
+    def __init__(self, lon_section: float, threshold: float, prev_files: Dict[str, str]):
+        self.lon_section = float(lon_section)
+        self.threshold = float(threshold)
+        self.prev_files = prev_files
+        self.key = f"section_precip_max|{self.lon_section:.3f}"
+
+    def _section_rain(self, path):
+        with Dataset(path) as nc:
+            lons = np.asarray(nc.variables["XLONG"][0], dtype=np.float64)
+            jj = np.arange(lons.shape[0])
+            i_sec = np.argmin(np.abs(lons - self.lon_section), axis=1)
+
+            # 只读剖面经过的列带
+            i0, i1 = int(i_sec.min()), int(i_sec.max()) + 1
+            rain = np.zeros(lons.shape[0], dtype=np.float64)
+            for name in ("RAINC", "RAINNC"):
+                band = np.asarray(nc.variables[name][0, :, i0:i1], dtype=np.float64)
+                rain += band[jj, i_sec - i0]
+        return rain
+
+    def inputs(self, path):
+        return [path, self.prev_files.get(path)]
+
+    def scalar(self, path):
+        prev = self.prev_files.get(path)
+        if prev is None:
+            return float("nan")
+        period = self._section_rain(path) - self._section_rain(prev)
+        period = np.where(period < 0, 0, period)   # 防止少数重启导致负值
+        return float(np.nanmax(period))
+
+    def test(self, value):
+        return bool(np.isfinite(value) and value >= self.threshold)
+
+
+class ShearLinePredicate:
+    """
+    区域内出现风切变线：区域内 shear_mask 格点占比 >= min_fraction
+
+    shear_mask 本身按百分位取阈值，几乎每个时次都会有候选区，
+    所以这里用“落在关心区域内的比例”来判断是否存在。
+    需要插值到 500 hPa，开销较大，标量会写入缓存。
+    """
+    cost = 10
+    cacheable = True
+
+    def __init__(self, box: Sequence[float], min_fraction: float = 0.05,
+                 smooth_sigma=1.2, shear_percentile=88, conv_percentile=35):
+        self.box = [float(x) for x in box]   # [west, east, south, north]
+        self.min_fraction = float(min_fraction)
+        self.params = dict(smooth_sigma=smooth_sigma,
+                           shear_percentile=shear_percentile,
+                           conv_percentile=conv_percentile)
+        self.key = f"shear_fraction|mapfac|{self.box}|{sorted(self.params.items())}"
+
+    def scalar(self, path):
+        # 只有用到这个判据时才需要 wrf-python
+        from wrf import getvar, interplevel, to_np
+        from wrf_synoptic import shear_line_mask
+        from wrf_kinematics import read_grid_metrics
+
+        with Dataset(path) as nc:
+            pressure = getvar(nc, "pressure")
+            ua = getvar(nc, "ua", units="m s-1")
+            va = getvar(nc, "va", units="m s-1")
+            u500 = to_np(interplevel(ua, pressure, 500))
+            v500 = to_np(interplevel(va, pressure, 500))
+            lats = np.asarray(nc.variables["XLAT"][0], dtype=np.float64)
+            lons = np.asarray(nc.variables["XLONG"][0], dtype=np.float64)
+            metrics = read_grid_metrics(nc)
+
+        shear_mask, _, _, _ = shear_line_mask(u500, v500, metrics=metrics, **self.params)
+
+        west, east, south, north = self.box
+        in_box = (lons >= west) & (lons <= east) & (lats >= south) & (lats <= north)
+        if not in_box.any():
+            return float("nan")
+        return float(shear_mask[in_box].mean())
+
+    def test(self, value):
+        return bool(np.isfinite(value) and value >= self.min_fraction)
+
+
+# =========================================================
+# 2. 判据缓存
+# =========================================================
+def _file_tag(path):
+    st = os.stat(path)
+    return f"{os.path.abspath(path)}|{st.st_mtime_ns}|{st.st_size}"
+
+
+class PredicateCache:
+
+    def __init__(self, path: Optional[str] = None):
+        self.path = path
+        self.values: Dict[str, float] = {}
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                self.values = json.load(f)
+            print(f"[PredicateCache] 读入 {len(self.values)} 条判据缓存: {path}")
+
+    def update(self, values: Dict[str, float]):
+        self.values.update(values)
+
+    def save(self):
+        if not self.path:
+            return
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.values, f)
+        os.replace(tmp, self.path)
+
+
+# =========================================================
+# 3. 分类累加器
+# =========================================================
+class CompositeAccumulator:
+    """
+    每个合成类一个 MeanAccumulator；scalars 记录本次新算出的判据标量
+    """
+
+    def __init__(self, class_names: Sequence[str] = ()):
+        self.classes: Dict[str, MeanAccumulator] = {c: MeanAccumulator() for c in class_names}
+        self.scalars: Dict[str, float] = {}
+        self.files: List[str] = []
+
+    def add(self, cls: str, name: str, arr):
+        self.classes.setdefault(cls, MeanAccumulator()).add(name, arr)
+
+    def mark_file(self, path: str):
+        self.files.append(path)
+
+    def merge(self, other: "CompositeAccumulator") -> "CompositeAccumulator":
+        for c, acc in other.classes.items():
+            self.classes.setdefault(c, MeanAccumulator()).merge(acc)
+        self.scalars.update(other.scalars)
+        self.files.extend(other.files)
+        return self
+
+    def mean(self, cls: str, name: str) -> np.ndarray:
+        return self.classes[cls].mean(name)
+
+    def n_times(self, cls: str) -> int:
+        return len(self.classes[cls])
+
+    def __len__(self):
+        return len(self.files)
+
+    def to_state(self) -> Dict[str, np.ndarray]:
+        state = {"files": np.array(self.files, dtype=str)}
+        for c, acc in self.classes.items():
+            for k, v in acc.to_state().items():
+                state[f"class:{c}:{k}"] = v
+        return state
+
+    @classmethod
+    def from_state(cls, state) -> "CompositeAccumulator":
+        grouped: Dict[str, dict] = {}
+        for key in state:
+            if key.startswith("class:"):
+                _, c, sub = key.split(":", 2)
+                grouped.setdefault(c, {})[sub] = state[key]
+        acc = cls(list(grouped))
+        for c, sub in grouped.items():
+            acc.classes[c] = MeanAccumulator.from_state(sub)
+        if "files" in state:
+            acc.files = [str(f) for f in state["files"]]
+        return acc
+
+
+# =========================================================
+# 4. map 函数与驱动
+# =========================================================
+def _evaluate(pred, path, cached, new_values, memo):
+    """
+    先查本文件已算过的 -> 缓存 -> 现算
+    """
+    if pred.key in memo:
+        return pred.test(memo[pred.key])
+
+    value = None
+    tag = None
+    if pred.cacheable:
+        inputs = pred.inputs(path) if hasattr(pred, "inputs") else [path]
+        tag = "|".join([pred.key] + [_file_tag(p) if p else "none" for p in inputs])
+        value = cached.get(tag) if cached else None
+
+    if value is None:
+        value = pred.scalar(path)
+        if pred.cacheable:
+            new_values[tag] = value
+
+    memo[pred.key] = value
+    return pred.test(value)
+
+
+def composite_chunk(file_chunk, classes, read_fields, cached=None):
+    """
+    classes    : {类名: [判据, ...]}，同一类内的判据是“且”的关系
+    read_fields: read_fields(nc) -> (fields, static)，只对命中的时次调用
+    cached     : 已有的判据缓存 {tag: 标量}
+    """
+    acc = CompositeAccumulator(list(classes))
+    ordered = {c: sorted(preds, key=lambda p: p.cost) for c, preds in classes.items()}
+
+    for f in file_chunk:
+        memo = {}
+        matched = [
+            c for c, preds in ordered.items()
+            if all(_evaluate(p, f, cached, acc.scalars, memo) for p in preds)
+        ]
+
+        if matched:
+            print(f"处理: {os.path.basename(f)} -> {matched}")
+            with Dataset(f) as nc:
+                fields, static = read_fields(nc)
+
+            for c in matched:
+                cacc = acc.classes[c]
+                for name, arr in static.items():
+                    cacc.set_static(name, arr)
+                for name, arr in fields.items():
+                    cacc.add(name, arr)
+                cacc.mark_file(f)
+
+        acc.mark_file(f)
+
+    return acc
+
+
+def run_composite(files: Sequence[str],
+                  classes: Dict[str, Sequence[object]],
+                  read_fields: Callable,
+                  cache_path: Optional[str] = None,
+                  workers: int = 1) -> CompositeAccumulator:
+    """
+    files      : wrfout 文件列表
+    classes    : {类名: [判据, ...]}
+    read_fields: 模块顶层函数（或其 partial），read_fields(nc) -> (fields, static)
+    cache_path : 判据缓存 json，None 表示不缓存
+    """
+    cache = PredicateCache(cache_path)
+
+    acc = map_reduce_files(
+        files,
+        composite_chunk,
+        workers=workers,
+        classes=classes,
+        read_fields=read_fields,
+        cached=cache.values,
+    )
+
+    if acc.scalars:
+        cache.update(acc.scalars)
+        cache.save()
+
+    print("========== 合成样本数 ==========")
+    for c in classes:
+        print(f"{c}: {acc.n_times(c)} / {len(acc)}")
+    print("================================")
+
+    return acc
@@ -0,0 +1,328 @@
+# -*- coding: utf-8 -*-
+"""
+累计降水量的流式反累计（de-accumulation）
+
+RAINC / RAINNC / RAINSH / SNOWNC / GRAUPELNC 都是从模式起报开始的累计量。
+以前的写法是打开当前文件和前一个文件相减、负值置 0，这样：
+- 冷启动（新的一段模拟）处累计量归零，差值为负，被置 0 后这一时段的降水全丢了
+- 打开 bucket_mm 时 RAINC / RAINNC 每满一个桶就回绕，真实累计量要加上 I_RAINC / I_RAINNC × bucket_mm
+- 想要日降水、过程降水时又要再读一遍文件
+
+这里按时间顺序把所有文件走一遍，内存里只留上一个时次：
+
+    deacc = Deaccumulator(bucket_mm=bucket_size(nc))
+    for frame in iter_frames(wrf_files):
+        iv = deacc.update(frame)          # 第一个时次返回 None
+        iv.fields["PRECIP"]               # (t_start, t_end] 的时段降水
+
+- 桶计数器：读入时直接把 I_RAINC / I_RAINNC × bucket_mm 加回去；
+  文件里没有计数器但开了桶时，负差值按整桶补回
+- 冷启动：全局属性 SIMULATION_START_DATE 变化时，整场取当前累计量（新一段模拟开始以来的降水）；
+  个别格点出现负差值同样按该点重新起算处理
+- WindowTotals：任意时间窗（日降水、过程降水等）的总量在同一遍里累加，
+  时段跨窗口边界时按时间比例分配
+
+用法：
+    from wrf_deaccum import deaccumulate, fixed_windows
+    windows = WindowTotals(fixed_windows(t0, t1, 24))
+    deaccumulate(wrf_files, windows, on_interval=lambda iv: ...)
+"""
+
+import math
+from datetime import datetime, timedelta
+from typing import Callable, Dict, Iterator, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from netCDF4 import Dataset
+
+
+# 累计量，以及带桶计数器的那几个
+ACCUM_VARS = ("RAINC", "RAINNC", "RAINSH", "SNOWNC", "GRAUPELNC")
+BUCKET_COUNTERS = {"RAINC": "I_RAINC", "RAINNC": "I_RAINNC"}
+
+# 总降水 = 积云 + 格点 + 浅对流
+TOTAL_PARTS = ("RAINC", "RAINNC", "RAINSH")
+TOTAL_NAME = "PRECIP"
+
+
+# =========================================================
+# 1. 读累计量
+# =========================================================
+class AccumFrame(NamedTuple):
+    """
+    time     : 时次
+    fields   : {变量名: 真实累计量（桶计数器已加回）}
+    run_start: SIMULATION_START_DATE，用于判断冷启动
+    wrapped  : 开了桶但没有计数器的变量（负差值按整桶补回）
+    """
+    time: datetime
+    fields: Dict[str, np.ndarray]
+    run_start: Optional[str]
+    wrapped: Tuple[str, ...]
+
+
+def bucket_size(nc: Dataset) -> float:
+    """
+    namelist 的 bucket_mm（全局属性 BUCKET_MM），未开桶时为 0
+    """
+    value = float(getattr(nc, "BUCKET_MM", 0.0))
+    return value if value > 0 else 0.0
+
+
+def accum_frames(raw: Dict[str, np.ndarray], times: Sequence[datetime], run_start: Optional[str],
+                 bucket_mm: float = 0.0, names: Sequence[str] = ACCUM_VARS) -> List[AccumFrame]:
+    """
+    已读入的 (Time, ...) 数组 -> 逐时次的 AccumFrame；raw 里有 I_RAINC / I_RAINNC 时加回整桶
+    （其他模块已经读了这些变量时用，不必再读一遍）
+    """
+    fields, wrapped = {}, []
+    for name in names:
+        if name not in raw:
+            continue
+        arr = np.asarray(np.ma.filled(raw[name], np.nan), dtype=np.float64)
+        counter = BUCKET_COUNTERS.get(name)
+        if bucket_mm > 0 and counter is not None:
+            if counter in raw:
+                arr = arr + bucket_mm * np.asarray(raw[counter], dtype=np.float64)
+            else:
+                wrapped.append(name)
+        fields[name] = arr
+
+    return [AccumFrame(t, {name: arr[k] for name, arr in fields.items()}, run_start, tuple(wrapped))
+            for k, t in enumerate(times)]
+
+
+def read_accum_frames(nc: Dataset, wrf_file: str, names: Sequence[str] = ACCUM_VARS,
+                      window: Optional[Tuple[int, int, int, int]] = None,
+                      bucket_mm: Optional[float] = None) -> List[AccumFrame]:
+    """
+    读一个文件里所有时次的累计量；window = (j0, j1, i0, i1) 时只读该窗口
+    """
+    from wrf_stations import file_times
+
+    bucket = bucket_size(nc) if bucket_mm is None else float(bucket_mm)
+    index = (slice(None),) if window is None else \
+        (slice(None), slice(window[0], window[1]), slice(window[2], window[3]))
+
+    raw = {}
+    for name in names:
+        for var_name in (name, BUCKET_COUNTERS.get(name)):
+            if var_name is not None and var_name in nc.variables:
+                raw[var_name] = nc.variables[var_name][index]
+
+    run_start = getattr(nc, "SIMULATION_START_DATE", None)
+    return accum_frames(raw, file_times(nc, wrf_file), run_start, bucket, names)
+
+
+def iter_frames(wrf_files: Sequence[str], names: Sequence[str] = ACCUM_VARS,
+                window: Optional[Tuple[int, int, int, int]] = None,
+                bucket_mm: Optional[float] = None) -> Iterator[AccumFrame]:
+    """
+    按文件顺序逐个时次产出；同一时刻只打开一个文件
+    """
+    for wrf_file in wrf_files:
+        with Dataset(wrf_file) as nc:
+            frames = read_accum_frames(nc, wrf_file, names, window, bucket_mm)
+        for frame in frames:
+            yield frame
+
+
+# =========================================================
+# 2. 反累计
+# =========================================================
+class Interval(NamedTuple):
+    """
+    (t_start, t_end] 内的降水量；fields 含各累计量和总降水 PRECIP
+    """
+    t_start: datetime
+    t_end: datetime
+    fields: Dict[str, np.ndarray]
+    reset: bool
+
+    @property
+    def hours(self) -> float:
+        return (self.t_end - self.t_start).total_seconds() / 3600.0
+
+
+class Deaccumulator:
+    """
+    只保存上一个时次的累计量；update() 每来一个时次返回一个时段量
+
+    tol       : 小于 tol（mm）的负差值视为舍入误差，置 0
+    bucket_mm : 开桶但文件里没有计数器时用于补整桶
+    """
+
+    def __init__(self, bucket_mm: float = 0.0, tol: float = 0.01, verbose: bool = True):
+        self.bucket_mm = float(bucket_mm)
+        self.tol = float(tol)
+        self.verbose = verbose
+        self.prev: Optional[AccumFrame] = None
+        self.run_resets: List[datetime] = []
+        self.point_resets = 0
+
+    def _difference(self, name: str, cur: np.ndarray, prev: np.ndarray, wrapped: bool) -> np.ndarray:
+        d = cur - prev
+        neg = d < -self.tol
+        if neg.any():
+            if wrapped and self.bucket_mm > 0:
+                d[neg] += self.bucket_mm * np.ceil(-d[neg] / self.bucket_mm)
+            else:
+                # 该点累计量重新起算
+                d[neg] = cur[neg]
+                self.point_resets += int(neg.sum())
+        return np.maximum(d, 0.0)
+
+    def update(self, frame: AccumFrame) -> Optional[Interval]:
+        prev, self.prev = self.prev, frame
+        if prev is None:
+            return None
+        if frame.time <= prev.time:
+            raise ValueError(f"[Deaccumulator] 时间必须严格递增：{prev.time} -> {frame.time}")
+
+        run_reset = (frame.run_start is not None and prev.run_start is not None
+                     and frame.run_start != prev.run_start)
+        if run_reset:
+            self.run_resets.append(frame.time)
+            if self.verbose:
+                print(f"[Deaccumulator] {frame.time}: 新的一段模拟（{prev.run_start} -> {frame.run_start}），累计量重新起算")
+
+        fields = {}
+        for name, cur in frame.fields.items():
+            if name not in prev.fields:
+                continue
+            if run_reset:
+                fields[name] = np.maximum(cur, 0.0)
+            else:
+                fields[name] = self._difference(name, cur, prev.fields[name], name in frame.wrapped)
+
+        parts = [fields[name] for name in TOTAL_PARTS if name in fields]
+        if parts:
+            fields[TOTAL_NAME] = np.sum(parts, axis=0)
+        return Interval(prev.time, frame.time, fields, run_reset)
+
+
+# =========================================================
+# 3. 任意时间窗总量
+# =========================================================
+def fixed_windows(t0: datetime, t1: datetime, hours: float,
+                  anchor: Optional[datetime] = None) -> List[Tuple[datetime, datetime]]:
+    """
+    [t0, t1] 范围内首尾相接的固定长度窗口，窗口边界对齐 anchor（默认 t0 当天 00 时）
+    例如 hours=24 为逐日（00–00 UTC）降水
+    """
+    step = timedelta(hours=hours)
+    anchor = anchor or t0.replace(hour=0, minute=0, second=0, microsecond=0)
+    start = anchor + step * math.floor((t0 - anchor) / step)
+    windows = []
+    while start < t1:
+        windows.append((start, start + step))
+        start += step
+    return windows
+
+
+class WindowTotals:
+    """
+    windows: [(start, end), ...]，窗口为 (start, end]，可以重叠、不必等长
+    add(interval) 把时段量按重叠时间比例加到各窗口；covered_hours 记录实际覆盖的时长
+    """
+
+    def __init__(self, windows: Sequence[Tuple[datetime, datetime]], labels: Optional[Sequence[str]] = None):
+        self.windows = [(s, e) for s, e in windows]
+        self.labels = list(labels) if labels is not None else \
+            [f"{s:%Y%m%d%H}-{e:%Y%m%d%H}" for s, e in self.windows]
+        self.sums: Dict[str, Dict[str, np.ndarray]] = {label: {} for label in self.labels}
+        self.covered_hours = {label: 0.0 for label in self.labels}
+
+    def add(self, interval: Interval):
+        for label, (ws, we) in zip(self.labels, self.windows):
+            lo, hi = max(ws, interval.t_start), min(we, interval.t_end)
+            if hi <= lo:
+                continue
+            frac = (hi - lo) / (interval.t_end - interval.t_start)
+            sums = self.sums[label]
+            for name, arr in interval.fields.items():
+                if name in sums:
+                    sums[name] += frac * arr
+                else:
+                    sums[name] = frac * arr
+            self.covered_hours[label] += (hi - lo).total_seconds() / 3600.0
+
+    def complete(self, label: str) -> bool:
+        ws, we = self.windows[self.labels.index(label)]
+        return self.covered_hours[label] >= (we - ws).total_seconds() / 3600.0 - 1e-6
+
+    def totals(self, label: str) -> Dict[str, np.ndarray]:
+        return self.sums[label]
+
+
+# =========================================================
+# 4. 一遍完成
+# =========================================================
+def deaccumulate(wrf_files: Sequence[str], windows: Optional[WindowTotals] = None,
+                 on_interval: Optional[Callable[[Interval], None]] = None,
+                 names: Sequence[str] = ACCUM_VARS,
+                 window: Optional[Tuple[int, int, int, int]] = None,
+                 bucket_mm: Optional[float] = None, verbose: bool = True) -> Deaccumulator:
+    """
+    按时间顺序走一遍 wrf_files：
+    - 每个时段调用 on_interval(interval)（写文件、做统计等）
+    - 同时累加到 windows 的各时间窗
+    返回 Deaccumulator（含冷启动时刻、按点重新起算的格点数）
+    """
+    if bucket_mm is None:
+        with Dataset(wrf_files[0]) as nc:
+            bucket_mm = bucket_size(nc)
+
+    deacc = Deaccumulator(bucket_mm=bucket_mm, verbose=verbose)
+    n = 0
+    for frame in iter_frames(wrf_files, names, window, bucket_mm):
+        interval = deacc.update(frame)
+        if interval is None:
+            continue
+        if windows is not None:
+            windows.add(interval)
+        if on_interval is not None:
+            on_interval(interval)
+        n += 1
+
+    if verbose:
+        print(f"[deaccumulate] {len(wrf_files)} 个文件，{n} 个时段，"
+              f"冷启动 {len(deacc.run_resets)} 次，按点重新起算 {deacc.point_resets} 个格点")
+    return deacc
+
+
+def period_totals(wrf_files: Sequence[str], names: Sequence[str] = ACCUM_VARS,
+                  window: Optional[Tuple[int, int, int, int]] = None,
+                  verbose: bool = False) -> Tuple[datetime, datetime, Dict[str, np.ndarray]]:
+    """
+    wrf_files 第一个时次到最后一个时次之间的总量（中间的文件用于识别冷启动和桶回绕）
+    返回 (t_start, t_end, {变量: 总量})
+    """
+    totals: Dict[str, np.ndarray] = {}
+    span: Dict[str, datetime] = {}
+
+    def add(iv: Interval):
+        for name, arr in iv.fields.items():
+            if name in totals:
+                totals[name] += arr
+            else:
+                totals[name] = arr.copy()
+        span.setdefault("start", iv.t_start)
+        span["end"] = iv.t_end
+
+    deaccumulate(wrf_files, on_interval=add, names=names, window=window, verbose=verbose)
+    if len(span) == 0:
+        raise ValueError("[period_totals] 至少需要两个时次")
+    return span["start"], span["end"], totals
+
+
+def interval_between(nc_prev: Dataset, nc_cur: Dataset, prev_timeidx: int = -1, timeidx: int = -1,
+                     names: Sequence[str] = ACCUM_VARS) -> Interval:
+    """
+    两个已打开的文件（或同一文件的两个时次）之间的时段量，单张图用
+    """
+    prev = read_accum_frames(nc_prev, nc_prev.filepath(), names)[prev_timeidx]
+    cur = read_accum_frames(nc_cur, nc_cur.filepath(), names)[timeidx]
+    deacc = Deaccumulator(bucket_mm=bucket_size(nc_cur), verbose=False)
+    deacc.update(prev)
+    return deacc.update(cur)
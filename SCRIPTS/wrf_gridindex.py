@@ -0,0 +1,203 @@
+# -*- coding: utf-8 -*-
+"""
+模式网格的经纬度空间索引
+
+ll_to_xy、np.argmin(np.abs(lons - target)) 这类写法每查一个点都要扫一遍全网格。
+这里在 XLAT/XLONG 上建一次 KD 树（三维单位向量，球面上的最近点就是弦长最近点，
+不受经度跨越和高纬度变形影响），之后成千上万个点一次向量化查询：
+
+- nearest(lat, lon)     : 最近格点 (j, i) 和球面距离（km）
+- bilinear(lat, lon)    : 所在网格单元的左下角 (j0, i0) 和四个角点权重，
+                          在点所在的局地切平面上反解双线性映射，适用于兰伯特 / 墨卡托等曲线网格
+- interp(field, w)      : 用 bilinear 的权重把 (..., ny, nx) 的场插值到这些点
+
+同一张网格（按经纬度内容哈希）在进程内只建一次树，站点提取、单点检验共用。
+
+用法：
+    from wrf_gridindex import get_grid_index, grid_index_from_file
+    index = grid_index_from_file(wrf_files[0])
+    j, i, dist_km = index.nearest(lats, lons)
+    w = index.bilinear(lats, lons)
+    t2_pts = index.interp(t2, w)
+"""
+
+import hashlib
+from collections import OrderedDict
+from typing import NamedTuple, Tuple
+
+import numpy as np
+from scipy.spatial import cKDTree
+
+
+EARTH_RADIUS_KM = 6371.0
+
+
+def unit_vectors(lat, lon) -> np.ndarray:
+    """
+    经纬度（度）-> 地心单位向量，最后一维为 (x, y, z)
+    """
+    lat = np.deg2rad(np.asarray(lat, dtype=np.float64))
+    lon = np.deg2rad(np.asarray(lon, dtype=np.float64))
+    return np.stack([np.cos(lat) * np.cos(lon), np.cos(lat) * np.sin(lon), np.sin(lat)], axis=-1)
+
+
+def chord_to_km(chord):
+    return 2.0 * EARTH_RADIUS_KM * np.arcsin(np.clip(np.asarray(chord) / 2.0, 0.0, 1.0))
+
+
+class BilinearWeights(NamedTuple):
+    """
+    j0, i0 : 所在单元左下角下标
+    weights: (..., 4)，依次对应 (j0, i0), (j0, i0+1), (j0+1, i0), (j0+1, i0+1)
+    valid  : 点落在区域内
+    """
+    j0: np.ndarray
+    i0: np.ndarray
+    weights: np.ndarray
+    valid: np.ndarray
+
+
+# =========================================================
+# 1. 网格索引
+# =========================================================
+class GridIndex:
+
+    def __init__(self, lat2d, lon2d, leafsize: int = 32):
+        self.lat = np.asarray(lat2d, dtype=np.float64)
+        self.lon = np.asarray(lon2d, dtype=np.float64)
+        if self.lat.ndim != 2 or self.lat.shape != self.lon.shape:
+            raise ValueError(f"[GridIndex] XLAT/XLONG 须为相同形状的二维数组: {self.lat.shape}, {self.lon.shape}")
+
+        self.shape = self.lat.shape
+        self.xyz = unit_vectors(self.lat, self.lon)
+        self.tree = cKDTree(self.xyz.reshape(-1, 3), leafsize=leafsize)
+
+        # 区域中心的格距，判断点是否落在区域外用
+        ny, nx = self.shape
+        jc, ic = ny // 2, min(nx // 2, nx - 2)
+        self.spacing_km = float(chord_to_km(np.linalg.norm(self.xyz[jc, ic + 1] - self.xyz[jc, ic])))
+
+    # -----------------------------------------------------
+    # 最近格点
+    # -----------------------------------------------------
+    def nearest(self, lat, lon) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+        """
+        返回 (j, i, dist_km)，形状与 lat / lon 广播后相同
+        """
+        pts = unit_vectors(lat, lon)
+        chord, flat = self.tree.query(pts.reshape(-1, 3))
+        j, i = np.divmod(flat, self.shape[1])
+        shape = pts.shape[:-1]
+        return j.reshape(shape), i.reshape(shape), chord_to_km(chord).reshape(shape)
+
+    # -----------------------------------------------------
+    # 双线性
+    # -----------------------------------------------------
+    def bilinear(self, lat, lon, n_iter: int = 8) -> BilinearWeights:
+        """
+        最近格点周围 4 个单元里找包含该点的那个，
+        在点的局地切平面上用牛顿迭代反解 (s, t)（s 沿 west_east，t 沿 south_north）
+        """
+        ny, nx = self.shape
+        lat, lon = np.broadcast_arrays(np.asarray(lat, dtype=np.float64), np.asarray(lon, dtype=np.float64))
+        shape = lat.shape
+        pts = unit_vectors(lat.ravel(), lon.ravel())
+        j, i, _ = self.nearest(lat.ravel(), lon.ravel())
+
+        # 局地切平面：东向、北向单位向量
+        east = np.stack([-pts[:, 1], pts[:, 0], np.zeros(len(pts))], axis=-1)
+        east /= np.maximum(np.linalg.norm(east, axis=-1, keepdims=True), 1e-15)
+        north = np.cross(pts, east)
+
+        # 候选单元 (n, 4)
+        cj = np.clip(j[:, None] - np.array([1, 1, 0, 0]), 0, ny - 2)
+        ci = np.clip(i[:, None] - np.array([1, 0, 1, 0]), 0, nx - 2)
+
+        def plane(jj, ii):
+            v = self.xyz[jj, ii] - pts[:, None, :]
+            return np.einsum("nkc,nc->nk", v, east), np.einsum("nkc,nc->nk", v, north)
+
+        x00, y00 = plane(cj, ci)
+        x01, y01 = plane(cj, ci + 1)
+        x10, y10 = plane(cj + 1, ci)
+        x11, y11 = plane(cj + 1, ci + 1)
+
+        s = np.full(cj.shape, 0.5)
+        t = np.full(cj.shape, 0.5)
+        with np.errstate(divide="ignore", invalid="ignore"):
+            for _ in range(n_iter):
+                fx = (1 - s) * (1 - t) * x00 + s * (1 - t) * x01 + (1 - s) * t * x10 + s * t * x11
+                fy = (1 - s) * (1 - t) * y00 + s * (1 - t) * y01 + (1 - s) * t * y10 + s * t * y11
+                dxs = (1 - t) * (x01 - x00) + t * (x11 - x10)
+                dys = (1 - t) * (y01 - y00) + t * (y11 - y10)
+                dxt = (1 - s) * (x10 - x00) + s * (x11 - x01)
+                dyt = (1 - s) * (y10 - y00) + s * (y11 - y01)
+                det = dxs * dyt - dxt * dys
+                s = s - (fx * dyt - fy * dxt) / det
+                t = t - (fy * dxs - fx * dys) / det
+
+        eps = 1e-6
+        inside = (s >= -eps) & (s <= 1 + eps) & (t >= -eps) & (t <= 1 + eps)
+        k = np.argmax(inside, axis=1)
+        rows = np.arange(len(pts))
+        valid = inside[rows, k]
+
+        s = np.clip(s[rows, k], 0.0, 1.0)
+        t = np.clip(t[rows, k], 0.0, 1.0)
+        weights = np.stack([(1 - s) * (1 - t), s * (1 - t), (1 - s) * t, s * t], axis=-1)
+        weights[~valid] = np.nan
+
+        return BilinearWeights(cj[rows, k].reshape(shape), ci[rows, k].reshape(shape),
+                               weights.reshape(shape + (4,)), valid.reshape(shape))
+
+    @staticmethod
+    def interp(field, w: BilinearWeights) -> np.ndarray:
+        """
+        field[..., ny, nx] -> (..., 点的形状)；区域外的点为 NaN
+        """
+        field = np.asarray(field)
+        j0, i0 = w.j0, w.i0
+        wt = np.moveaxis(w.weights, -1, 0)
+        return (field[..., j0, i0] * wt[0] + field[..., j0, i0 + 1] * wt[1]
+                + field[..., j0 + 1, i0] * wt[2] + field[..., j0 + 1, i0 + 1] * wt[3])
+
+
+# =========================================================
+# 2. 进程内缓存
+# =========================================================
+_CACHE: "OrderedDict[Tuple, GridIndex]" = OrderedDict()
+_CACHE_SIZE = 4
+
+
+def get_grid_index(lat2d, lon2d) -> GridIndex:
+    """
+    按经纬度内容哈希取缓存的索引；同一网格只建一次 KD 树
+    """
+    lat2d = np.ascontiguousarray(lat2d, dtype=np.float64)
+    lon2d = np.ascontiguousarray(lon2d, dtype=np.float64)
+    digest = hashlib.sha1(lat2d.tobytes())
+    digest.update(lon2d.tobytes())
+    key = (lat2d.shape, digest.hexdigest())
+
+    if key in _CACHE:
+        _CACHE.move_to_end(key)
+        return _CACHE[key]
+
+    index = GridIndex(lat2d, lon2d)
+    _CACHE[key] = index
+    while len(_CACHE) > _CACHE_SIZE:
+        _CACHE.popitem(last=False)
+    return index
+
+
+def grid_index_from_file(wrf_file: str, timeidx: int = 0) -> GridIndex:
+    """
+    直接从 wrfout / geo_em 读 XLAT、XLONG 建（或取缓存的）索引
+    """
+    from netCDF4 import Dataset
+
+    with Dataset(wrf_file) as nc:
+        names = ("XLAT", "XLONG") if "XLAT" in nc.variables else ("XLAT_M", "XLONG_M")
+        lat = np.asarray(nc.variables[names[0]][timeidx], dtype=np.float64)
+        lon = np.asarray(nc.variables[names[1]][timeidx], dtype=np.float64)
+    return get_grid_index(lat, lon)
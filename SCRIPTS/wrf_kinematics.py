@@ -0,0 +1,319 @@
+# -*- coding: utf-8 -*-
+"""
+水平运动学量：辐散、相对 / 绝对涡度、伸缩 / 切变形变、总形变、锋生函数
+
+WRF 的网格在兰伯特等保角投影上，网格距 DX / DY 是投影平面上的距离，
+真实距离为 DX / m（m 为地图放大系数 MAPFAC_M / MAPFAC_U / MAPFAC_V）。
+直接对网格下标 np.gradient 得到的量单位是“每格点”，阈值会随区域和分辨率变；
+这里按保角正交曲线坐标（两个方向的尺度因子都是 1/m）计算：
+
+    散度      δ  = m² [∂x(u/m) + ∂y(v/m)]
+    相对涡度  ζ  = m² [∂x(v/m) − ∂y(u/m)]
+    伸缩形变  D1 = ∂x(m u) − ∂y(m v)
+    切变形变  D2 = ∂x(m v) + ∂y(m u)
+
+x / y 为投影平面坐标（m），u / v 为网格风（不是转成南北向的地球风）。
+风既可以是质量点上的 ua / va（用 MAPFAC_M），也可以是 C 网格跳点上的 U / V
+（最后两维比质量点多一格，用 MAPFAC_U / MAPFAC_V，沿跳点方向直接差分）。
+
+所有函数只在最后两维 (Y, X) 上求导，前面的维度（T、Z……）任意，整块向量化；
+float32 输入全程按 float32 计算（地图系数也转成同样的精度），其余按 float64。
+
+用法：
+    from wrf_kinematics import read_grid_metrics, kinematic_fields
+    metrics = read_grid_metrics(nc)
+    out = kinematic_fields(U, V, metrics, names=("div", "vort", "deform"))
+"""
+
+from typing import Dict, NamedTuple, Optional, Sequence
+
+import numpy as np
+from netCDF4 import Dataset
+
+
+KINEMATIC_NAMES = ("div", "vort", "avort", "stretch", "shear", "deform", "frontogenesis")
+
+# 锋生函数常用单位：K / (100 km) / (3 h)
+FRONTOGENESIS_SCALE = 1.0e5 * 3.0 * 3600.0
+
+
+class GridMetrics(NamedTuple):
+    """
+    dx / dy: 投影平面网格距（m）
+    msfm   : 质量点地图系数 (Y, X)
+    msfu   : U 跳点地图系数 (Y, X+1)，没有时为 None
+    msfv   : V 跳点地图系数 (Y+1, X)，没有时为 None
+    f      : 科氏参数 (Y, X)（s-1），没有时为 None
+    """
+    dx: float
+    dy: float
+    msfm: np.ndarray
+    msfu: Optional[np.ndarray] = None
+    msfv: Optional[np.ndarray] = None
+    f: Optional[np.ndarray] = None
+
+    def astype(self, dtype) -> "GridMetrics":
+        cast = lambda a: None if a is None else np.asarray(a, dtype=dtype)
+        return GridMetrics(self.dx, self.dy, cast(self.msfm), cast(self.msfu), cast(self.msfv), cast(self.f))
+
+
+# =========================================================
+# 1. 网格度量
+# =========================================================
+def read_grid_metrics(nc: Dataset, timeidx: int = 0) -> GridMetrics:
+    """
+    从 wrfout 读 DX / DY 和地图系数（不随时间变，取 timeidx 时次）
+    较新的 WRF 把 MAPFAC_M 拆成 MAPFAC_MX / MAPFAC_MY，保角投影下两者相同，取 MAPFAC_MX
+    """
+    var = nc.variables
+
+    def get(*names):
+        for name in names:
+            if name in var:
+                return np.asarray(var[name][timeidx], dtype=np.float64)
+        return None
+
+    msfm = get("MAPFAC_M", "MAPFAC_MX")
+    if msfm is None:
+        raise KeyError("[read_grid_metrics] 文件中没有 MAPFAC_M / MAPFAC_MX")
+    return GridMetrics(
+        dx=float(nc.getncattr("DX")),
+        dy=float(nc.getncattr("DY")),
+        msfm=msfm,
+        msfu=get("MAPFAC_U", "MAPFAC_UX"),
+        msfv=get("MAPFAC_V", "MAPFAC_VY"),
+        f=get("F"),
+    )
+
+
+def uniform_metrics(shape, dx: float, dy: Optional[float] = None, f=None) -> GridMetrics:
+    """
+    地图系数全为 1 的度量（理想试验、已经是等距网格的数据）
+    """
+    ny, nx = shape
+    return GridMetrics(float(dx), float(dx if dy is None else dy), np.ones((ny, nx)),
+                       np.ones((ny, nx + 1)), np.ones((ny + 1, nx)), f)
+
+
+# =========================================================
+# 2. 差分
+# =========================================================
+def _work_dtype(*arrays):
+    return np.float32 if all(np.asarray(a).dtype == np.float32 for a in arrays) else np.float64
+
+
+def _stagger(arr, metrics: GridMetrics) -> Optional[int]:
+    """
+    判断最后两维是否为跳点：返回跳点所在轴（-1 为 x，-2 为 y），质量点返回 None
+    """
+    ny, nx = metrics.msfm.shape
+    shape = np.shape(arr)[-2:]
+    if shape == (ny, nx):
+        return None
+    if shape == (ny, nx + 1):
+        return -1
+    if shape == (ny + 1, nx):
+        return -2
+    raise ValueError(f"[wrf_kinematics] 水平形状 {shape} 与地图系数 {(ny, nx)} 不匹配")
+
+
+def _destagger(arr, axis: int):
+    n = arr.shape[axis]
+    lo = np.take(arr, np.arange(n - 1), axis=axis)
+    hi = np.take(arr, np.arange(1, n), axis=axis)
+    return 0.5 * (lo + hi)
+
+
+def _deriv(q, spacing: float, axis: int, stag: Optional[int]):
+    """
+    ∂q/∂(投影坐标)，结果在质量点上：
+    q 沿求导方向跳点 -> 相邻差分（C 网格的精确中心差）；
+    q 沿另一方向跳点 -> 先平均到质量点再中心差；质量点 -> np.gradient（边界单侧差）
+    """
+    if stag == axis:
+        return np.diff(q, axis=axis) / q.dtype.type(spacing)
+    if stag is not None:
+        q = _destagger(q, stag)
+    return np.gradient(q, q.dtype.type(spacing), axis=axis)
+
+
+def _map_factor(metrics: GridMetrics, stag: Optional[int]):
+    if stag == -1:
+        if metrics.msfu is None:
+            raise KeyError("[wrf_kinematics] U 跳点风需要 MAPFAC_U")
+        return metrics.msfu
+    if stag == -2:
+        if metrics.msfv is None:
+            raise KeyError("[wrf_kinematics] V 跳点风需要 MAPFAC_V")
+        return metrics.msfv
+    return metrics.msfm
+
+
+def scalar_gradient(field, metrics: GridMetrics):
+    """
+    质量点标量的真实水平梯度 (∂/∂X, ∂/∂Y)，单位 [field] / m
+    """
+    dtype = _work_dtype(field)
+    field = np.asarray(field, dtype=dtype)
+    m = metrics.astype(dtype).msfm
+    return (m * _deriv(field, metrics.dx, -1, None),
+            m * _deriv(field, metrics.dy, -2, None))
+
+
+def laplacian(field, metrics: GridMetrics):
+    """
+    质量点标量的水平拉普拉斯 m²(∂xx + ∂yy)，单位 [field] / m²
+    （保角投影下 ∇·∇ 的地图系数项正好合并成 m²）
+    """
+    dtype = _work_dtype(field)
+    field = np.asarray(field, dtype=dtype)
+    m = metrics.astype(dtype).msfm
+    dxx = _deriv(_deriv(field, metrics.dx, -1, None), metrics.dx, -1, None)
+    dyy = _deriv(_deriv(field, metrics.dy, -2, None), metrics.dy, -2, None)
+    return m ** 2 * (dxx + dyy)
+
+
+class _WindTerms:
+    """
+    u / v 各自的跳点位置、地图系数和缓存的导数项，几个量共用
+    """
+
+    def __init__(self, u, v, metrics: GridMetrics):
+        self.dtype = _work_dtype(u, v)
+        self.metrics = metrics.astype(self.dtype)
+        self.u = np.asarray(u, dtype=self.dtype)
+        self.v = np.asarray(v, dtype=self.dtype)
+        self.su = _stagger(self.u, metrics)
+        self.sv = _stagger(self.v, metrics)
+        self.mu = _map_factor(self.metrics, self.su)
+        self.mv = _map_factor(self.metrics, self.sv)
+        self.m2 = self.metrics.msfm ** 2
+        self._cache = {}
+
+    def d(self, key):
+        """
+        key = (风分量, 对 m 是乘还是除, 求导方向)
+        """
+        if key not in self._cache:
+            comp, op, axis = key
+            q, m, stag = (self.u, self.mu, self.su) if comp == "u" else (self.v, self.mv, self.sv)
+            q = q / m if op == "/" else q * m
+            spacing = self.metrics.dx if axis == -1 else self.metrics.dy
+            self._cache[key] = _deriv(q, spacing, axis, stag)
+        return self._cache[key]
+
+
+# =========================================================
+# 3. 运动学量
+# =========================================================
+def _divergence(w: _WindTerms):
+    return w.m2 * (w.d(("u", "/", -1)) + w.d(("v", "/", -2)))
+
+
+def _vorticity(w: _WindTerms):
+    return w.m2 * (w.d(("v", "/", -1)) - w.d(("u", "/", -2)))
+
+
+def _stretching(w: _WindTerms):
+    return w.d(("u", "*", -1)) - w.d(("v", "*", -2))
+
+
+def _shearing(w: _WindTerms):
+    return w.d(("v", "*", -1)) + w.d(("u", "*", -2))
+
+
+def divergence(u, v, metrics: GridMetrics) -> np.ndarray:
+    """
+    水平散度（s-1），负值为辐合
+    """
+    return _divergence(_WindTerms(u, v, metrics))
+
+
+def vorticity(u, v, metrics: GridMetrics) -> np.ndarray:
+    """
+    相对涡度（s-1）
+    """
+    return _vorticity(_WindTerms(u, v, metrics))
+
+
+def absolute_vorticity(u, v, metrics: GridMetrics) -> np.ndarray:
+    """
+    绝对涡度 ζ + f（s-1），需要 metrics.f
+    """
+    if metrics.f is None:
+        raise KeyError("[absolute_vorticity] metrics 中没有科氏参数 F")
+    w = _WindTerms(u, v, metrics)
+    return _vorticity(w) + w.metrics.f
+
+
+def stretching_deformation(u, v, metrics: GridMetrics) -> np.ndarray:
+    return _stretching(_WindTerms(u, v, metrics))
+
+
+def shearing_deformation(u, v, metrics: GridMetrics) -> np.ndarray:
+    return _shearing(_WindTerms(u, v, metrics))
+
+
+def total_deformation(u, v, metrics: GridMetrics) -> np.ndarray:
+    w = _WindTerms(u, v, metrics)
+    return np.hypot(_stretching(w), _shearing(w))
+
+
+def _frontogenesis(theta, w: _WindTerms):
+    # Petterssen 二维运动学锋生函数：F = ½|∇θ| (D cos2β − δ)
+    # β 为等 θ 线与膨胀轴的夹角（与 metpy.calc.frontogenesis 相同的写法）
+    dtdx, dtdy = scalar_gradient(np.asarray(theta, dtype=w.dtype), w.metrics)
+    mag = np.hypot(dtdx, dtdy)
+    stretch, shear = _stretching(w), _shearing(w)
+    tdef = np.hypot(stretch, shear)
+    psi = 0.5 * np.arctan2(shear, stretch)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        beta = np.arcsin(np.clip((-dtdx * np.cos(psi) - dtdy * np.sin(psi)) / mag, -1.0, 1.0))
+    out = 0.5 * mag * (tdef * np.cos(2.0 * beta) - _divergence(w))
+    return np.where(mag > 0, out, 0.0).astype(w.dtype, copy=False)
+
+
+def frontogenesis(theta, u, v, metrics: GridMetrics) -> np.ndarray:
+    """
+    二维运动学锋生函数（K m-1 s-1）；乘 FRONTOGENESIS_SCALE 得 K / 100 km / 3 h
+    theta 在质量点上；u / v 可以是质量点风也可以是跳点风
+    """
+    return _frontogenesis(theta, _WindTerms(u, v, metrics))
+
+
+def kinematic_fields(u, v, metrics: GridMetrics, names: Optional[Sequence[str]] = None,
+                     theta=None) -> Dict[str, np.ndarray]:
+    """
+    一次求多个量，共用导数项：names 取自 KINEMATIC_NAMES，默认除锋生外全部
+    （要 frontogenesis 需同时给 theta；要 avort 需 metrics.f）
+    """
+    if names is None:
+        names = [n for n in KINEMATIC_NAMES if n != "frontogenesis"]
+        if metrics.f is None:
+            names.remove("avort")
+    unknown = set(names) - set(KINEMATIC_NAMES)
+    if unknown:
+        raise ValueError(f"[kinematic_fields] 未知的量: {sorted(unknown)}")
+
+    w = _WindTerms(u, v, metrics)
+    out = {}
+    for name in names:
+        if name == "div":
+            out[name] = _divergence(w)
+        elif name == "vort":
+            out[name] = _vorticity(w)
+        elif name == "avort":
+            if w.metrics.f is None:
+                raise KeyError("[kinematic_fields] avort 需要科氏参数 F")
+            out[name] = out["vort"] + w.metrics.f if "vort" in out else _vorticity(w) + w.metrics.f
+        elif name == "stretch":
+            out[name] = _stretching(w)
+        elif name == "shear":
+            out[name] = _shearing(w)
+        elif name == "deform":
+            out[name] = np.hypot(_stretching(w), _shearing(w))
+        elif name == "frontogenesis":
+            if theta is None:
+                raise ValueError("[kinematic_fields] frontogenesis 需要 theta")
+            out[name] = _frontogenesis(theta, w)
+    return out
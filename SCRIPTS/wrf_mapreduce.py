@@ -0,0 +1,228 @@
+# -*- coding: utf-8 -*-
+"""
+wrfout 多文件时间平均的 map-reduce 驱动
+
+思路：
+1. map：每个 worker 进程负责一段连续的 wrfout 文件，
+   逐文件计算剖面 / 二维场，累加到自己的 MeanAccumulator 里
+2. reduce：主进程按文件顺序把各 worker 返回的累加器 merge 起来
+3. 最后 sum / count 得到时间平均
+
+累加器里只有 sum 和 count，合并是简单的加法，
+所以无论切成几段、几个进程，结果都和串行逐文件累加一致。
+
+用法（在脚本里）：
+    from wrf_mapreduce import MeanAccumulator, map_reduce_files, add_workers_argument
+
+    def accumulate_chunk(file_chunk, **kwargs):
+        acc = MeanAccumulator()
+        for f in file_chunk:
+            ...
+            acc.add("temp", temp2d)
+        return acc
+
+    acc = map_reduce_files(files, accumulate_chunk, workers=args.workers)
+    temp_mean = acc.mean("temp")
+
+注意：
+- map 函数必须定义在模块顶层（进程池需要 pickle 它）
+- macOS 默认用 spawn 启动子进程，会重新 import 主脚本，
+  所以调用脚本的执行部分必须放在 if __name__ == "__main__": 里
+"""
+
+import os
+import time
+from concurrent.futures import ProcessPoolExecutor
+from functools import partial
+from typing import Callable, Dict, List, Optional, Sequence
+
+import numpy as np
+
+
+# =========================================================
+# 1. 可合并的时间平均累加器
+# =========================================================
+class MeanAccumulator:
+    """
+    逐格点的 “有效值求和 + 有效值计数” 累加器
+
+    - add(name, arr)：累加一个时次的场，NaN / inf 不计入
+    - set_static(name, arr)：只需取一次的量（地形、剖面纬度等）
+    - merge(other)：合并另一个累加器（reduce 步骤）
+    - mean(name)：sum / count，count 为 0 的格点为 NaN
+    """
+
+    def __init__(self):
+        self.sums: Dict[str, np.ndarray] = {}
+        self.counts: Dict[str, np.ndarray] = {}
+        self.static: Dict[str, np.ndarray] = {}
+        self.files: List[str] = []
+
+    def add(self, name: str, arr):
+        arr = np.asarray(np.ma.filled(arr, np.nan), dtype=np.float64)
+        valid = np.isfinite(arr)
+
+        if name not in self.sums:
+            self.sums[name] = np.zeros(arr.shape, dtype=np.float64)
+            self.counts[name] = np.zeros(arr.shape, dtype=np.int64)
+        elif self.sums[name].shape != arr.shape:
+            raise ValueError(
+                f"[MeanAccumulator] {name} 形状不一致：当前 {arr.shape}，"
+                f"参考 {self.sums[name].shape}"
+            )
+
+        self.sums[name] += np.where(valid, arr, 0.0)
+        self.counts[name] += valid
+
+    def set_static(self, name: str, arr):
+        if name not in self.static:
+            self.static[name] = np.asarray(arr)
+
+    def mark_file(self, path: str):
+        self.files.append(path)
+
+    def merge(self, other: "MeanAccumulator") -> "MeanAccumulator":
+        for name, s in other.sums.items():
+            if name not in self.sums:
+                self.sums[name] = s.copy()
+                self.counts[name] = other.counts[name].copy()
+            else:
+                if self.sums[name].shape != s.shape:
+                    raise ValueError(
+                        f"[MeanAccumulator] 合并时 {name} 形状不一致："
+                        f"{s.shape} vs {self.sums[name].shape}"
+                    )
+                self.sums[name] += s
+                self.counts[name] += other.counts[name]
+
+        for name, arr in other.static.items():
+            self.set_static(name, arr)
+
+        self.files.extend(other.files)
+        return self
+
+    def names(self) -> List[str]:
+        return list(self.sums)
+
+    def count(self, name: str) -> np.ndarray:
+        return self.counts[name]
+
+    def mean(self, name: str) -> np.ndarray:
+        if name not in self.sums:
+            raise KeyError(f"累加器中没有变量: {name}")
+        cnt = self.counts[name]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(cnt > 0, self.sums[name] / np.maximum(cnt, 1), np.nan)
+
+    def __len__(self):
+        return len(self.files)
+
+    # -----------------------------------------------------
+    # 序列化：供断点续算（wrf_checkpoint.py）保存 / 恢复
+    # -----------------------------------------------------
+    def to_state(self) -> Dict[str, np.ndarray]:
+        """
+        展平成 {键: ndarray}，可以直接 np.savez
+        """
+        state = {}
+        for name in self.sums:
+            state[f"sum/{name}"] = self.sums[name]
+            state[f"count/{name}"] = self.counts[name]
+        for name, arr in self.static.items():
+            state[f"static/{name}"] = np.asarray(arr)
+        state["files"] = np.array(self.files, dtype=str)
+        return state
+
+    @classmethod
+    def from_state(cls, state) -> "MeanAccumulator":
+        acc = cls()
+        for key in state:
+            kind, _, name = key.partition("/")
+            if kind == "sum":
+                acc.sums[name] = np.array(state[key], dtype=np.float64)
+                acc.counts[name] = np.array(state[f"count/{name}"], dtype=np.int64)
+            elif kind == "static":
+                acc.static[name] = np.array(state[key])
+        if "files" in state:
+            acc.files = [str(f) for f in state["files"]]
+        return acc
+
+
+# =========================================================
+# 2. 文件切分
+# =========================================================
+def split_files(files: Sequence[str], n_chunks: int) -> List[List[str]]:
+    """
+    把文件列表切成 n_chunks 段连续子列表（保持时间顺序，尽量等长）
+    """
+    files = list(files)
+    n_chunks = max(1, min(int(n_chunks), len(files)))
+    bounds = np.linspace(0, len(files), n_chunks + 1).round().astype(int)
+    return [files[a:b] for a, b in zip(bounds[:-1], bounds[1:]) if b > a]
+
+
+def resolve_workers(workers: Optional[int]) -> int:
+    """
+    workers <= 0 或 None 表示用满本机 CPU
+    """
+    if workers is None or workers <= 0:
+        return os.cpu_count() or 1
+    return int(workers)
+
+
+# =========================================================
+# 3. map-reduce 驱动
+# =========================================================
+def map_reduce_files(files: Sequence[str],
+                     map_func: Callable[..., MeanAccumulator],
+                     workers: int = 1,
+                     chunks_per_worker: int = 4,
+                     verbose: bool = True,
+                     **map_kwargs) -> MeanAccumulator:
+    """
+    files            : 按时间排好序的 wrfout 文件列表
+    map_func         : map_func(file_chunk, **map_kwargs) -> MeanAccumulator
+                       （也可以返回其它带 merge() 的累加器，如 wrf_quantile.HistogramAccumulator）
+    workers          : 进程数；1 表示在当前进程串行
+    chunks_per_worker: 每个进程分到的块数，块多一些可以平衡慢文件 / 慢磁盘
+
+    返回合并后的累加器
+    """
+    files = list(files)
+    if len(files) == 0:
+        raise FileNotFoundError("[map_reduce_files] 文件列表为空。")
+
+    workers = resolve_workers(workers)
+    func = partial(map_func, **map_kwargs)
+    t0 = time.perf_counter()
+
+    if workers == 1:
+        result = func(files)
+    else:
+        chunks = split_files(files, workers * max(1, chunks_per_worker))
+        if verbose:
+            print(f"[map_reduce_files] {len(files)} 个文件，{workers} 个进程，{len(chunks)} 个块")
+
+        result = None
+        with ProcessPoolExecutor(max_workers=workers) as pool:
+            # map 保持块顺序，reduce 时文件顺序不变
+            for part in pool.map(func, chunks):
+                result = part if result is None else result.merge(part)
+
+    if verbose:
+        print(f"[map_reduce_files] 完成，用时 {time.perf_counter() - t0:.2f} s")
+
+    return result
+
+
+def add_workers_argument(parser, default: int = 1):
+    """
+    给 argparse 解析器统一加 --workers 参数
+    """
+    parser.add_argument(
+        "-j", "--workers",
+        type=int,
+        default=default,
+        help="并行进程数，1 为串行，0 表示使用全部 CPU 核（默认 %(default)s）",
+    )
+    return parser
@@ -0,0 +1,279 @@
+# -*- coding: utf-8 -*-
+"""
+假绝热（湿绝热）查算表
+
+气块在 LCL 以上沿假绝热线上升，每条假绝热线由湿球位温 θw
+（该线在 1000 hPa 处的温度）唯一确定。所以只要事先把
+    T(θw, p)      正表：给定 θw，任意气压上的温度
+    θw(T, p)      反表：给定某气压上的温度，属于哪条假绝热线
+在规则网格上算好，气块抬升就变成两次双线性插值：
+
+    θw    = 反表(T_lcl, p_lcl)
+    T_end = 正表(θw, p_end)
+
+不再对每个气柱积分常微分方程。表只建一次（wrf_thermo.moist_lapse，
+逐层 RK4），存成 .npz 缓存到磁盘，以后直接读。
+
+网格：
+- θw：213.15 ~ 333.15 K，步长 0.25 K
+- p ：1100 ~ 50 hPa，ln p 等间隔 600 层
+- 反表 T：150 ~ 350 K，步长 0.25 K
+超出网格的点返回 NaN。与 RK4 / MetPy moist_lapse 的差约 1e-3 K。
+
+用法：
+    from wrf_moist_adiabat import get_table
+    table = get_table()
+    t500 = table.lift(p_lcl, t_lcl, 500.0)     # hPa, K
+"""
+
+import os
+import json
+from typing import Optional
+
+import numpy as np
+
+from wrf_thermo import ZERO_DEGC, moist_lapse
+
+
+TABLE_VERSION = 1
+
+DEFAULT_GRID = {
+    "theta_w_min": 213.15,
+    "theta_w_max": 333.15,
+    "theta_w_step": 0.25,
+    "p_max": 1100.0,
+    "p_min": 50.0,
+    "n_p": 600,
+    "t_min": 150.0,
+    "t_max": 350.0,
+    "t_step": 0.25,
+}
+
+DEFAULT_CACHE = os.environ.get(
+    "WRF_MOIST_ADIABAT_CACHE",
+    os.path.join(os.path.expanduser("~"), ".cache", "wrf_scripts", "moist_adiabat.npz"),
+)
+
+
+# =========================================================
+# 1. 规则网格上的双线性插值
+# =========================================================
+def _axis_weights(x, x0, dx, n):
+    """
+    规则轴 x0 + k*dx (k=0..n-1) 上的下标与权重；越界的点 valid=False
+    """
+    fx = (x - x0) / dx
+    valid = (fx >= 0) & (fx <= n - 1)
+    k = np.clip(np.floor(np.where(valid, fx, 0)).astype(np.int64), 0, n - 2)
+    w = fx - k
+    return k, w, valid
+
+
+def _bilinear(table, ax0, ax1, x, y):
+    """
+    table[i, j] 定义在两条规则轴上，ax = (起点, 步长, 点数)
+    """
+    i, wx, vx = _axis_weights(x, *ax0)
+    j, wy, vy = _axis_weights(y, *ax1)
+
+    with np.errstate(invalid="ignore"):
+        out = ((1 - wx) * (1 - wy) * table[i, j]
+               + wx * (1 - wy) * table[i + 1, j]
+               + (1 - wx) * wy * table[i, j + 1]
+               + wx * wy * table[i + 1, j + 1])
+
+    return np.where(vx & vy, out, np.nan)
+
+
+# =========================================================
+# 2. 查算表
+# =========================================================
+class MoistAdiabatTable:
+    """
+    t_of_thw[i, k] : 第 i 条假绝热线（θw_i）在第 k 个气压层上的温度（K）
+    thw_of_t[m, k] : 第 k 个气压层上温度为 T_m 时的 θw（K）
+    """
+
+    def __init__(self, grid: dict, t_of_thw: np.ndarray, thw_of_t: np.ndarray):
+        self.grid = dict(grid)
+        self.t_of_thw = t_of_thw
+        self.thw_of_t = thw_of_t
+
+        g = self.grid
+        n_thw = int(round((g["theta_w_max"] - g["theta_w_min"]) / g["theta_w_step"])) + 1
+        n_t = int(round((g["t_max"] - g["t_min"]) / g["t_step"])) + 1
+        lnp0 = np.log(g["p_max"])
+        dlnp = (np.log(g["p_min"]) - lnp0) / (g["n_p"] - 1)
+
+        self._ax_thw = (g["theta_w_min"], g["theta_w_step"], n_thw)
+        self._ax_t = (g["t_min"], g["t_step"], n_t)
+        self._ax_lnp = (lnp0, dlnp, g["n_p"])
+
+    # -----------------------------------------------------
+    # 建表 / 存取
+    # -----------------------------------------------------
+    @staticmethod
+    def axes(grid: dict):
+        theta_w = np.arange(grid["theta_w_min"], grid["theta_w_max"] + 0.5 * grid["theta_w_step"],
+                            grid["theta_w_step"])
+        pres = np.exp(np.linspace(np.log(grid["p_max"]), np.log(grid["p_min"]), grid["n_p"]))
+        temps = np.arange(grid["t_min"], grid["t_max"] + 0.5 * grid["t_step"], grid["t_step"])
+        return theta_w, pres, temps
+
+    @classmethod
+    def build(cls, grid: Optional[dict] = None, substeps: int = 4) -> "MoistAdiabatTable":
+        """
+        从 1000 hPa 出发，逐层向上、向下积分所有 θw（每层之间 substeps 步 RK4）
+        """
+        grid = dict(DEFAULT_GRID, **(grid or {}))
+        theta_w, pres, temps = cls.axes(grid)
+        n_p = len(pres)
+
+        t_of_thw = np.full((len(theta_w), n_p), np.nan)
+
+        # 1000 hPa 上方第一层
+        k_up = int(np.argmax(pres <= 1000.0))
+        t = moist_lapse(pres[k_up], theta_w, 1000.0, n_steps=substeps)
+        t_of_thw[:, k_up] = t
+        for k in range(k_up + 1, n_p):
+            t = moist_lapse(pres[k], t, pres[k - 1], n_steps=substeps)
+            t_of_thw[:, k] = t
+
+        # 1000 hPa 下方
+        if k_up > 0:
+            t = moist_lapse(pres[k_up - 1], theta_w, 1000.0, n_steps=substeps)
+            t_of_thw[:, k_up - 1] = t
+            for k in range(k_up - 2, -1, -1):
+                t = moist_lapse(pres[k], t, pres[k + 1], n_steps=substeps)
+                t_of_thw[:, k] = t
+
+        # 反表：每层上 T 随 θw 单调增加，直接一维反插值
+        thw_of_t = np.full((len(temps), n_p), np.nan)
+        for k in range(n_p):
+            col = t_of_thw[:, k]
+            good = np.isfinite(col)
+            thw_of_t[:, k] = np.interp(temps, col[good], theta_w[good], left=np.nan, right=np.nan)
+
+        print(f"[MoistAdiabatTable] 建表完成: {len(theta_w)} 条假绝热线 x {n_p} 个气压层")
+        return cls(grid, t_of_thw, thw_of_t)
+
+    def save(self, path: str):
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        meta = {"version": TABLE_VERSION, "grid": self.grid}
+
+        # 与检查点相同：先写临时文件再原子替换
+        tmp_path = path + ".tmp.npz"
+        np.savez(tmp_path, t_of_thw=self.t_of_thw, thw_of_t=self.thw_of_t,
+                 __meta__=np.array(json.dumps(meta)))
+        os.replace(tmp_path, path)
+        print(f"[MoistAdiabatTable] 已缓存: {path}")
+
+    @classmethod
+    def load(cls, path: str, grid: Optional[dict] = None) -> Optional["MoistAdiabatTable"]:
+        """
+        读缓存；文件不存在、版本或网格参数不一致时返回 None
+        """
+        if not os.path.exists(path):
+            return None
+        grid = dict(DEFAULT_GRID, **(grid or {}))
+        with np.load(path, allow_pickle=False) as npz:
+            meta = json.loads(str(npz["__meta__"]))
+            if meta.get("version") != TABLE_VERSION or meta.get("grid") != grid:
+                print(f"[MoistAdiabatTable] 缓存参数不一致，重新建表: {path}")
+                return None
+            return cls(grid, npz["t_of_thw"], npz["thw_of_t"])
+
+    @classmethod
+    def load_or_build(cls, path: Optional[str] = DEFAULT_CACHE,
+                      grid: Optional[dict] = None) -> "MoistAdiabatTable":
+        table = cls.load(path, grid) if path else None
+        if table is None:
+            table = cls.build(grid)
+            if path:
+                try:
+                    table.save(path)
+                except OSError as e:
+                    print(f"[MoistAdiabatTable] 缓存写入失败（不影响计算）: {e}")
+        return table
+
+    # -----------------------------------------------------
+    # 查表
+    # -----------------------------------------------------
+    def temperature(self, theta_w, p_hpa):
+        """
+        θw（K）那条假绝热线在 p 上的温度（K）
+        """
+        theta_w = np.asarray(theta_w, dtype=np.float64)
+        lnp = np.log(np.asarray(p_hpa, dtype=np.float64))
+        return _bilinear(self.t_of_thw, self._ax_thw, self._ax_lnp, theta_w, lnp)
+
+    def theta_w(self, t_k, p_hpa):
+        """
+        过 (p, T) 的假绝热线的湿球位温（K）
+        """
+        t_k = np.asarray(t_k, dtype=np.float64)
+        lnp = np.log(np.asarray(p_hpa, dtype=np.float64))
+        return _bilinear(self.thw_of_t, self._ax_t, self._ax_lnp, t_k, lnp)
+
+    def lift(self, p_start_hpa, t_start_k, p_end_hpa):
+        """
+        饱和气块从 (p_start, t_start) 沿假绝热到 p_end 的温度，
+        可直接替代 wrf_thermo.moist_lapse(p_end, t_start, p_start)
+        """
+        return self.temperature(self.theta_w(t_start_k, p_start_hpa), p_end_hpa)
+
+
+# =========================================================
+# 3. 进程内共用一张表
+# =========================================================
+_TABLE: Optional[MoistAdiabatTable] = None
+
+
+def get_table(path: Optional[str] = DEFAULT_CACHE) -> MoistAdiabatTable:
+    """
+    第一次调用时读缓存（没有就建表并写缓存），之后直接返回同一张表
+    """
+    global _TABLE
+    if _TABLE is None:
+        _TABLE = MoistAdiabatTable.load_or_build(path)
+    return _TABLE
+
+
+# =========================================================
+# 4. Skew-T 湿绝热线
+# =========================================================
+def plot_moist_adiabats(skew, t0=None, pressure=None, table=None, **kwargs):
+    """
+    代替 metpy SkewT.plot_moist_adiabats：默认起点温度、气压范围、线型都与 MetPy 相同，
+    只是温度由查算表插值得到，整组线一次性放进一个 LineCollection
+
+    skew    : metpy.plots.SkewT
+    t0      : 1000 hPa 处起点温度（degC），即各线的 θw
+    pressure: 画线用的气压（hPa）
+    """
+    from matplotlib.collections import LineCollection
+    from matplotlib.lines import Line2D
+
+    table = table or get_table()
+
+    if t0 is None:
+        xmin, xmax = skew.ax.get_xlim()
+        t0 = np.concatenate((np.arange(xmin, 0, 10), np.arange(0, xmax + 1, 5)))
+    if pressure is None:
+        pressure = np.linspace(*skew.ax.get_ylim())
+
+    t0 = np.asarray(t0, dtype=np.float64)
+    pressure = np.asarray(pressure, dtype=np.float64)
+
+    t_c = table.temperature(t0[:, None] + ZERO_DEGC, pressure[None, :]) - ZERO_DEGC
+    linedata = [np.column_stack((ti, pressure)) for ti in t_c]
+
+    kwargs.setdefault("colors", "b")
+    kwargs.setdefault("linestyles", "dashed")
+    kwargs.setdefault("alpha", 0.5)
+    kwargs.setdefault("zorder", Line2D.zorder - 0.001)
+
+    if getattr(skew, "moist_adiabats", None):
+        skew.moist_adiabats.remove()
+    skew.moist_adiabats = skew.ax.add_collection(LineCollection(linedata, **kwargs))
+    return skew.moist_adiabats
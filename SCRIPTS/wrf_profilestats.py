@@ -0,0 +1,275 @@
+# -*- coding: utf-8 -*-
+"""
+区域 × 时段的垂直廓线统计：逐层均值、标准差、分位数
+
+单点廓线图之外，还需要某个区域（如杭州附近）在一段时间内的平均廓线和分位数廓线。
+所有气柱、所有时次的样本不可能都放进内存，这里流式处理：
+
+1. region_window：在第一个文件上把经纬度框换成 (j0:j1, i0:i1) 读窗口 + 框内掩码，
+   之后每个文件只读这个窗口
+2. LevelInterpolator：把模式层插值到公共高度（离地）或公共气压层；
+   每个时次的插值下标和权重只算一次，温度、风速、各水凝物共用
+3. ProfileStatsAccumulator：逐层累加 样本数 / 和 / 平方和，分位数用
+   wrf_quantile.SampleHistogram 的固定分箱直方图；接口与 MeanAccumulator 一致，
+   可直接用于 wrf_mapreduce.map_reduce_files 并行和 wrf_checkpoint 检查点
+
+结果是 (level,) / (quantile, level) 的小数据集，直接画廓线。
+
+用法：
+    from wrf_profilestats import region_window, LevelInterpolator, ProfileStatsAccumulator
+"""
+
+import json
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from netCDF4 import Dataset
+
+from wrf_quantile import SampleHistogram, WIND_EDGES
+
+
+# =========================================================
+# 0. 各量的分箱（分位数误差不超过箱宽）
+# =========================================================
+PROFILE_EDGES = {
+    "temperature": np.arange(-100.0, 50.0 + 0.1, 0.1),                        # degC
+    "wspd": WIND_EDGES,                                                      # m/s
+    "hydrometeor": np.concatenate([[0.0], np.geomspace(1e-4, 30.0, 221)]),   # g/kg，相对误差约 6%
+}
+
+DEFAULT_QUANTILES = (0.05, 0.1, 0.25, 0.5, 0.75, 0.9, 0.95)
+
+
+# =========================================================
+# 1. 区域读窗口
+# =========================================================
+def region_window(lat2d, lon2d, region: Sequence[float]):
+    """
+    region = [lon_min, lon_max, lat_min, lat_max]
+
+    返回 (j0, j1, i0, i1) 和窗口内的掩码（曲线网格上窗口是外接矩形，掩码给出真正在框内的格点）
+    """
+    lat2d = np.asarray(lat2d, dtype=np.float64)
+    lon2d = np.asarray(lon2d, dtype=np.float64)
+    inside = ((lon2d >= region[0]) & (lon2d <= region[1]) &
+              (lat2d >= region[2]) & (lat2d <= region[3]))
+    if not inside.any():
+        raise ValueError(f"[region_window] 区域 {list(region)} 内没有格点")
+
+    jj, ii = np.nonzero(inside)
+    j0, j1, i0, i1 = int(jj.min()), int(jj.max()) + 1, int(ii.min()), int(ii.max()) + 1
+    return (j0, j1, i0, i1), inside[j0:j1, i0:i1]
+
+
+# =========================================================
+# 2. 公共垂直层插值
+# =========================================================
+class LevelInterpolator:
+    """
+    coord="height"  : levels 为离地高度（m），坐标场随下标增大
+    coord="pressure": levels 为气压（hPa），坐标场随下标减小，在 ln p 上线性插值
+
+    weights(coord_field) 返回 (k, w, valid)，形状 (L, ...)；
+    同一个时次的所有变量共用一份权重（由调用方保存）
+    """
+
+    def __init__(self, levels: Sequence[float], coord: str = "height"):
+        if coord not in ("height", "pressure"):
+            raise ValueError(f"[LevelInterpolator] coord 只能是 height / pressure: {coord}")
+        self.levels = np.asarray(levels, dtype=np.float64)
+        self.coord = coord
+
+    def _transform(self, x):
+        # 统一成随下标增大的坐标
+        if self.coord == "pressure":
+            return -np.log(x)
+        return x
+
+    def weights(self, coord_field):
+        x = self._transform(np.asarray(coord_field, dtype=np.float64))                                # (Z, ...)
+        target = self._transform(self.levels).reshape((-1,) + (1,) * (x.ndim - 1))
+        nz = x.shape[0]
+
+        # 每个目标层下方的模式层数
+        n_below = (x[None] <= target[:, None]).sum(axis=1)               # (L, ...)
+        valid = (n_below >= 1) & (n_below <= nz - 1)
+        k = np.clip(n_below - 1, 0, nz - 2)
+
+        x_lo = np.take_along_axis(x, k, axis=0)
+        x_hi = np.take_along_axis(x, k + 1, axis=0)
+        with np.errstate(invalid="ignore", divide="ignore"):
+            w = (target - x_lo) / (x_hi - x_lo)
+        valid &= np.isfinite(w)
+
+        return k, np.where(valid, w, 0.0), valid
+
+    @staticmethod
+    def apply(field, weights) -> np.ndarray:
+        """
+        field (Z, ...) -> (L, ...)；超出气柱范围为 NaN
+        """
+        k, w, valid = weights
+        field = np.asarray(field, dtype=np.float64)
+        lo = np.take_along_axis(field, k, axis=0)
+        hi = np.take_along_axis(field, k + 1, axis=0)
+        return np.where(valid, lo + w * (hi - lo), np.nan)
+
+
+# =========================================================
+# 3. 逐层统计累加器
+# =========================================================
+class ProfileStatsAccumulator:
+    """
+    每个变量：逐层样本数 / 和 / 平方和 + 逐层直方图（分位数）
+    """
+
+    def __init__(self):
+        self.count: Dict[str, np.ndarray] = {}
+        self.sums: Dict[str, np.ndarray] = {}
+        self.sumsq: Dict[str, np.ndarray] = {}
+        self.hists: Dict[str, SampleHistogram] = {}
+        self.static: Dict[str, np.ndarray] = {}
+        self.files: List[str] = []
+
+    def add(self, name: str, samples, edges: Optional[Sequence[float]] = None):
+        """
+        samples: (L, 样本数)，NaN 不计入
+        """
+        samples = np.asarray(samples, dtype=np.float64)
+        valid = np.isfinite(samples)
+        filled = np.where(valid, samples, 0.0)
+
+        if name not in self.count:
+            if edges is None:
+                raise ValueError(f"[ProfileStatsAccumulator] 第一次添加 {name} 时需要给出 edges")
+            n_level = samples.shape[0]
+            self.count[name] = np.zeros(n_level, dtype=np.int64)
+            self.sums[name] = np.zeros(n_level)
+            self.sumsq[name] = np.zeros(n_level)
+            self.hists[name] = SampleHistogram(edges, shape=(n_level,))
+
+        self.count[name] += valid.sum(axis=1)
+        self.sums[name] += filled.sum(axis=1)
+        self.sumsq[name] += (filled * filled).sum(axis=1)
+        self.hists[name].update(samples)
+
+    def set_static(self, name: str, arr):
+        if name not in self.static:
+            self.static[name] = np.asarray(arr)
+
+    def mark_file(self, path: str):
+        self.files.append(path)
+
+    def merge(self, other: "ProfileStatsAccumulator") -> "ProfileStatsAccumulator":
+        for name in other.count:
+            if name not in self.count:
+                self.count[name] = other.count[name].copy()
+                self.sums[name] = other.sums[name].copy()
+                self.sumsq[name] = other.sumsq[name].copy()
+                self.hists[name] = SampleHistogram(other.hists[name].edges)
+                self.hists[name].merge(other.hists[name])
+            else:
+                self.count[name] += other.count[name]
+                self.sums[name] += other.sums[name]
+                self.sumsq[name] += other.sumsq[name]
+                self.hists[name].merge(other.hists[name])
+        for name, arr in other.static.items():
+            self.set_static(name, arr)
+        self.files.extend(other.files)
+        return self
+
+    def names(self) -> List[str]:
+        return list(self.count)
+
+    def mean(self, name: str) -> np.ndarray:
+        with np.errstate(invalid="ignore", divide="ignore"):
+            return np.where(self.count[name] > 0, self.sums[name] / self.count[name], np.nan)
+
+    def std(self, name: str) -> np.ndarray:
+        n = self.count[name]
+        with np.errstate(invalid="ignore", divide="ignore"):
+            var = (self.sumsq[name] - self.sums[name] ** 2 / n) / (n - 1)
+        return np.where(n > 1, np.sqrt(np.maximum(var, 0.0)), np.nan)
+
+    def quantiles(self, name: str, qs: Sequence[float] = DEFAULT_QUANTILES) -> np.ndarray:
+        return np.stack([self.hists[name].quantile(q) for q in qs], axis=0)
+
+    def __len__(self):
+        return len(self.files)
+
+    def to_state(self) -> Dict[str, np.ndarray]:
+        state = {}
+        for name in self.count:
+            state[f"count/{name}"] = self.count[name]
+            state[f"sums/{name}"] = self.sums[name]
+            state[f"sumsq/{name}"] = self.sumsq[name]
+            state[f"edges/{name}"] = self.hists[name].edges
+            state[f"hist/{name}"] = self.hists[name].counts
+        for name, arr in self.static.items():
+            state[f"static/{name}"] = np.asarray(arr)
+        state["files"] = np.array(self.files, dtype=str)
+        return state
+
+    @classmethod
+    def from_state(cls, state) -> "ProfileStatsAccumulator":
+        acc = cls()
+        for key in state:
+            kind, _, name = key.partition("/")
+            if kind == "count":
+                acc.count[name] = np.array(state[key])
+                acc.sums[name] = np.array(state[f"sums/{name}"])
+                acc.sumsq[name] = np.array(state[f"sumsq/{name}"])
+                counts = np.array(state[f"hist/{name}"])
+                h = SampleHistogram(state[f"edges/{name}"], dtype=counts.dtype)
+                h.counts = counts
+                acc.hists[name] = h
+            elif kind == "static":
+                acc.static[name] = np.array(state[key])
+        if "files" in state:
+            acc.files = [str(f) for f in state["files"]]
+        return acc
+
+
+# =========================================================
+# 4. 输出小数据集
+# =========================================================
+def write_profile_stats(acc: ProfileStatsAccumulator, out_nc: str, levels, coord: str,
+                        qs: Sequence[float] = DEFAULT_QUANTILES, units: Optional[Dict[str, str]] = None,
+                        attrs: Optional[dict] = None):
+    """
+    每个变量写 {name}_mean / _std / _count (level) 和 {name}_quantiles (quantile, level)
+    """
+    units = units or {}
+    with Dataset(out_nc, "w") as nc:
+        nc.createDimension("level", len(levels))
+        nc.createDimension("quantile", len(qs))
+        for key, value in (attrs or {}).items():
+            setattr(nc, key, value if isinstance(value, (str, int, float)) else json.dumps(value))
+
+        lv = nc.createVariable("level", "f8", ("level",))
+        lv.units = "m" if coord == "height" else "hPa"
+        lv.long_name = "height above ground" if coord == "height" else "pressure"
+        lv[:] = levels
+        nc.createVariable("quantile", "f8", ("quantile",))[:] = qs
+        nc.n_files = len(acc)
+
+        for name in acc.names():
+            for suffix, arr in (("mean", acc.mean(name)), ("std", acc.std(name))):
+                v = nc.createVariable(f"{name}_{suffix}", "f4", ("level",))
+                v.units = units.get(name, "")
+                v[:] = arr
+            nc.createVariable(f"{name}_count", "i8", ("level",))[:] = acc.count[name]
+            v = nc.createVariable(f"{name}_quantiles", "f4", ("quantile", "level"))
+            v.units = units.get(name, "")
+            v[:] = acc.quantiles(name, qs)
+    print(f"已保存: {out_nc}")
+
+
+def read_profile_stats(path: str) -> Tuple[Dict[str, np.ndarray], dict]:
+    """
+    返回 ({变量名: 数组}, 全局属性)
+    """
+    with Dataset(path) as nc:
+        data = {name: np.asarray(v[:]) for name, v in nc.variables.items()}
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+    return data, attrs
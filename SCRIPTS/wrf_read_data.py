@@ -1,9 +1,11 @@
 import glob
 import os
+import re
 import xarray as xr
 from netCDF4 import Dataset
 from pathlib import Path
 from typing import List, Union, Optional
+from datetime import datetime
 
 
 '''
@@ -174,4 +176,22 @@ class WRFDataReader:
         vars_out = self.list_data_vars() if data_vars_only else self.list_vars()
         with open(outfile, "w", encoding="utf-8") as f:
             for name in vars_out:
-                f.write(name + "\n")
\ No newline at end of file
+                f.write(name + "\n")
+
+
+def parse_wrf_time_from_filename(fname) -> datetime:
+    """
+    从 wrfout 文件名解析时间，支持：
+    wrfout_d01_2022-11-30_18:00:00
+    wrfout_d01_2022-11-30_18_00_00
+    wrfout_d01_2022-11-30_180000
+    """
+    base = os.path.basename(os.fspath(fname))
+    tstr = base.replace("\uf03a", ":")
+
+    m = re.search(r"(\d{4}-\d{2}-\d{2})_(\d{2})[:_]?(\d{2})[:_]?(\d{2})", tstr)
+    if not m:
+        raise ValueError(f"无法从文件名解析时间: {fname}")
+
+    date_part, hh, mm, ss = m.groups()
+    return datetime.strptime(f"{date_part}_{hh}:{mm}:{ss}", "%Y-%m-%d_%H:%M:%S")
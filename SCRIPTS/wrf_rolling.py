@@ -0,0 +1,281 @@
+# -*- coding: utf-8 -*-
+"""
+一次遍历同时得到：日变化合成 + 滑动平均
+
+3 小时一个 wrfout 时，想要
+- 日变化：按 “一天中的小时” 分类平均（00, 03, ..., 21 时）
+- 滑动平均：24 h、72 h 等窗口的滚动平均
+如果每种产品各读一遍文件，I/O 就要翻好几倍。这里每个文件只读一次：
+
+    engine = OnePassEngine(windows={"24h": 24, "72h": 72}, step_hours=3)
+    for t, fields in ...:                      # 按时间顺序
+        for out in engine.update(t, fields):   # 窗口凑满就吐出一个滑动平均
+            writer.write(out)
+    diurnal = engine.diurnal                   # 日变化累加器
+
+内存：
+- 日变化：每个小时一份 sum / count
+- 滑动窗口：环形缓冲区，只存窗口长度（如 72 h / 3 h = 24 个时次）的场
+  以及窗口内的 sum / count，不存整段时间序列
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, Iterator, List, Optional, Tuple
+
+import numpy as np
+from netCDF4 import Dataset, date2num
+
+from wrf_mapreduce import MeanAccumulator
+
+
+# =========================================================
+# 1. 日变化（按小时分类）累加器
+# =========================================================
+class DiurnalAccumulator:
+    """
+    hours[h] 是第 h 时的 MeanAccumulator
+    """
+
+    def __init__(self):
+        self.hours: Dict[int, MeanAccumulator] = {}
+
+    def add(self, hour: int, name: str, arr):
+        self.hours.setdefault(int(hour), MeanAccumulator()).add(name, arr)
+
+    def merge(self, other: "DiurnalAccumulator") -> "DiurnalAccumulator":
+        for h, acc in other.hours.items():
+            self.hours.setdefault(h, MeanAccumulator()).merge(acc)
+        return self
+
+    def hour_list(self) -> List[int]:
+        return sorted(self.hours)
+
+    def mean(self, name: str) -> Tuple[List[int], np.ndarray]:
+        """
+        返回 (小时列表, 形状 (n_hours, ...) 的平均场)
+        """
+        hours = self.hour_list()
+        return hours, np.stack([self.hours[h].mean(name) for h in hours], axis=0)
+
+    def n_samples(self, hour: int) -> int:
+        acc = self.hours[hour]
+        name = acc.names()[0]
+        return int(acc.count(name).max())
+
+
+# =========================================================
+# 2. 环形缓冲区滑动平均
+# =========================================================
+class RollingWindow:
+    """
+    固定时间步长的滑动窗口：
+    - 槽位 = (t - t0) / step  mod  n_slots
+    - 写入新时次时先把该槽位上旧的场从 sum / count 中减掉
+    - 窗口内槽位全部落在 (t - window, t] 且满足覆盖率时输出平均
+
+    时次有缺失时，缺失的槽位不计入，覆盖率不足的窗口不输出。
+    """
+
+    def __init__(self, window_hours: float, step_hours: float, min_coverage: float = 1.0):
+        self.window = timedelta(hours=window_hours)
+        self.step = timedelta(hours=step_hours)
+        self.n_slots = int(round(window_hours / step_hours))
+        if self.n_slots < 1:
+            raise ValueError("[RollingWindow] 窗口长度必须不小于时间步长")
+        self.min_coverage = float(min_coverage)
+
+        self.t0: Optional[datetime] = None
+        self.slot_time: List[Optional[datetime]] = [None] * self.n_slots
+        self.buf: Dict[str, np.ndarray] = {}
+        self.sums: Dict[str, np.ndarray] = {}
+        self.counts: Dict[str, np.ndarray] = {}
+
+    def _slot(self, t: datetime) -> int:
+        k = (t - self.t0) / self.step
+        if abs(k - round(k)) > 1e-6:
+            raise ValueError(f"[RollingWindow] 时间 {t} 不在 {self.step} 步长网格上")
+        return int(round(k)) % self.n_slots
+
+    def _evict(self, slot: int):
+        if self.slot_time[slot] is None:
+            return
+        for name, buf in self.buf.items():
+            old = buf[slot]
+            valid = np.isfinite(old)
+            self.sums[name] -= np.where(valid, old, 0.0)
+            self.counts[name] -= valid
+            buf[slot] = np.nan
+        self.slot_time[slot] = None
+
+    def update(self, t: datetime, fields: Dict[str, np.ndarray]):
+        """
+        加入一个时次；窗口满足覆盖率时返回 (窗口结束时间, {变量: 平均场})，否则返回 None
+        """
+        if self.t0 is None:
+            self.t0 = t
+
+        # 先清掉已经滑出窗口的槽位（跳时次时可能不止一个）
+        for s, ts in enumerate(self.slot_time):
+            if ts is not None and ts <= t - self.window:
+                self._evict(s)
+
+        slot = self._slot(t)
+        self._evict(slot)
+
+        for name, arr in fields.items():
+            arr = np.asarray(np.ma.filled(arr, np.nan), dtype=np.float64)
+            if name not in self.buf:
+                self.buf[name] = np.full((self.n_slots,) + arr.shape, np.nan)
+                self.sums[name] = np.zeros(arr.shape)
+                self.counts[name] = np.zeros(arr.shape, dtype=np.int64)
+            valid = np.isfinite(arr)
+            self.buf[name][slot] = arr
+            self.sums[name] += np.where(valid, arr, 0.0)
+            self.counts[name] += valid
+        self.slot_time[slot] = t
+
+        n_filled = sum(ts is not None for ts in self.slot_time)
+        if n_filled < self.min_coverage * self.n_slots:
+            return None
+
+        means = {}
+        for name in self.sums:
+            cnt = self.counts[name]
+            with np.errstate(invalid="ignore", divide="ignore"):
+                means[name] = np.where(cnt > 0, self.sums[name] / np.maximum(cnt, 1), np.nan)
+        return t, means
+
+
+# =========================================================
+# 3. 一次遍历引擎
+# =========================================================
+class OnePassEngine:
+    """
+    windows   : {"24h": 24, "72h": 72} 窗口名 -> 小时数
+    step_hours: wrfout 输出间隔（小时）
+    diurnal   : 是否同时做日变化合成
+    """
+
+    def __init__(self, windows: Dict[str, float], step_hours: float = 3.0,
+                 diurnal: bool = True, min_coverage: float = 1.0):
+        self.windows = {
+            name: RollingWindow(hours, step_hours, min_coverage)
+            for name, hours in windows.items()
+        }
+        self.diurnal = DiurnalAccumulator() if diurnal else None
+        self.n_steps = 0
+
+    def update(self, t: datetime, fields: Dict[str, np.ndarray]) -> List[Tuple[str, datetime, Dict[str, np.ndarray]]]:
+        """
+        返回本时次新产生的滑动平均：[(窗口名, 窗口结束时间, {变量: 平均场}), ...]
+        """
+        if self.diurnal is not None:
+            for name, arr in fields.items():
+                self.diurnal.add(t.hour, name, arr)
+
+        outputs = []
+        for wname, win in self.windows.items():
+            out = win.update(t, fields)
+            if out is not None:
+                outputs.append((wname, out[0], out[1]))
+
+        self.n_steps += 1
+        return outputs
+
+    def stream(self, items: Iterable[Tuple[datetime, Dict[str, np.ndarray]]]) -> Iterator[Tuple[str, datetime, Dict[str, np.ndarray]]]:
+        """
+        items 为按时间排好序的 (时间, 场字典)，逐个产出滑动平均
+        """
+        last_t = None
+        for t, fields in items:
+            if last_t is not None and t <= last_t:
+                raise ValueError(f"[OnePassEngine] 时间必须严格递增：{last_t} -> {t}")
+            last_t = t
+            for out in self.update(t, fields):
+                yield out
+
+
+# =========================================================
+# 4. 滑动平均结果逐条写 netCDF
+# =========================================================
+class RollingNetCDFWriter:
+    """
+    每个窗口一个 netCDF 文件，Time 为无限维，来一条写一条；
+    不需要等全部算完，也不需要在内存里攒结果
+    """
+
+    time_units = "hours since 1970-01-01 00:00:00"
+
+    def __init__(self, out_dir: str, prefix: str, static: Optional[Dict[str, np.ndarray]] = None):
+        self.out_dir = out_dir
+        self.prefix = prefix
+        self.static = static or {}
+        self.files: Dict[str, Dataset] = {}
+        os.makedirs(out_dir, exist_ok=True)
+
+    def _open(self, wname: str, fields: Dict[str, np.ndarray]) -> Dataset:
+        path = os.path.join(self.out_dir, f"{self.prefix}_rolling_{wname}.nc")
+        nc = Dataset(path, "w")
+        nc.createDimension("Time", None)
+        nc.window = wname
+        t = nc.createVariable("time", "f8", ("Time",))
+        t.units = self.time_units
+        t.long_name = "window end time"
+
+        for name, arr in list(fields.items()) + list(self.static.items()):
+            for k, n in enumerate(np.shape(arr)):
+                dim = f"{name}_d{k}"
+                if dim not in nc.dimensions:
+                    nc.createDimension(dim, n)
+
+        for name, arr in fields.items():
+            dims = ("Time",) + tuple(f"{name}_d{k}" for k in range(np.ndim(arr)))
+            nc.createVariable(name, "f4", dims, zlib=True)
+        for name, arr in self.static.items():
+            dims = tuple(f"{name}_d{k}" for k in range(np.ndim(arr)))
+            nc.createVariable(name, "f4", dims, zlib=True)[:] = arr
+
+        print(f"[RollingNetCDFWriter] 新建: {path}")
+        self.files[wname] = nc
+        return nc
+
+    def write(self, wname: str, t_end: datetime, means: Dict[str, np.ndarray]):
+        nc = self.files.get(wname) or self._open(wname, means)
+        k = len(nc.dimensions["Time"])
+        nc.variables["time"][k] = date2num(t_end, self.time_units)
+        for name, arr in means.items():
+            nc.variables[name][k] = arr
+
+    def close(self):
+        for nc in self.files.values():
+            nc.close()
+        self.files = {}
+
+
+def write_diurnal(diurnal: DiurnalAccumulator, out_nc: str,
+                  static: Optional[Dict[str, np.ndarray]] = None):
+    """
+    日变化合成写成 (hour, ...) 的 netCDF
+    """
+    hours = diurnal.hour_list()
+    names = diurnal.hours[hours[0]].names()
+
+    with Dataset(out_nc, "w") as nc:
+        nc.createDimension("hour", len(hours))
+        nc.createVariable("hour", "i4", ("hour",))[:] = hours
+
+        for name in names:
+            _, mean = diurnal.mean(name)
+            dims = ("hour",) + tuple(f"{name}_d{k}" for k in range(mean.ndim - 1))
+            for d, n in zip(dims[1:], mean.shape[1:]):
+                nc.createDimension(d, n)
+            nc.createVariable(name, "f4", dims, zlib=True)[:] = mean
+
+        for name, arr in (static or {}).items():
+            dims = tuple(f"{name}_d{k}" for k in range(np.ndim(arr)))
+            for d, n in zip(dims, np.shape(arr)):
+                nc.createDimension(d, n)
+            nc.createVariable(name, "f4", dims, zlib=True)[:] = arr
+
+    print(f"已保存日变化合成: {out_nc}")
@@ -0,0 +1,603 @@
+# -*- coding: utf-8 -*-
+"""
+批量积雪诊断：积雪覆盖、积雪深度、液态 / 冻结降水（全部时次）
+
+snow_coverage.py 只处理一个写死的文件，而且每个函数各自 `name in nc.variables` 判断、
+各自读一遍二维场（SNOWH 在覆盖判定和深度里各读一次）。这里：
+
+1. resolve_snow_plan：按第一个文件的变量表把回退链一次定下来（SnowPlan），
+   整个批次共用；优先级与 snow_coverage.py 相同
+   - 覆盖：SNOWC > SNOWH > SNOW_DEPTH > SWE / SNOW > 累计冻结降水
+   - 深度：SNOWH > SNOW_DEPTH > SWE / SNOW ÷ 雪密度（估算）
+   - 冻结降水：SNOWNC > SR × 时段降水
+2. 每个文件只打开一次、计划里的每个变量只读一次（所有时次一起读）
+3. 降水用 wrf_deaccum 反累计成逐时段量（桶计数器、冷启动已处理），
+   SR 回退时用该时段的 SR 分配该时段的降水（PhasePartition，按文件整块计算）
+4. 逐时次追加到一个压缩的 netCDF（SnowStore）：覆盖为 int8，其余 float32 + zlib
+5. partition_precip：只做逐时段雨雪相态分离，流式累加全时段 / 任意时间窗的液态、冻结降水总量
+6. SnowClimatology：由逐时次覆盖掩码等流式得到季节统计（积雪日数、初 / 终雪日、最大深度等）
+
+用法：
+    from wrf_snow import resolve_snow_plan, run_snow_batch, partition_precip, SnowClimatology
+"""
+
+import os
+from datetime import datetime, timedelta
+from typing import Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+import numpy as np
+from netCDF4 import Dataset, date2num, num2date
+
+from wrf_deaccum import BUCKET_COUNTERS, TOTAL_PARTS, Deaccumulator, accum_frames, bucket_size
+
+
+# 覆盖判定阈值（与 snow_coverage.get_snow_cover_mask 相同）
+COVER_THRESHOLDS = {
+    "SNOWC": 0.5,
+    "SNOWH": 1.0e-4,
+    "SNOW_DEPTH": 1.0e-4,
+    "SWE": 0.1,
+    "SNOW": 0.1,
+    "frozen": 0.1,
+}
+
+SNOW_UNITS = {
+    "snow_cover": "1",
+    "snow_depth": "m",
+    "total_precip": "mm",
+    "liquid_precip": "mm",
+    "frozen_precip": "mm",
+}
+
+
+# =========================================================
+# 1. 变量回退计划（每次运行只定一次）
+# =========================================================
+class SnowPlan(NamedTuple):
+    """
+    cover_source : 覆盖判定用的变量（"frozen" 表示用累计冻结降水），None 表示无法判定
+    depth_source : 深度变量；depth_estimated 为 True 时是 SWE / SNOW ÷ 雪密度
+    frozen_source: "SNOWNC" / "SR" / None
+    precip_parts : 文件里有的 RAINC / RAINNC / RAINSH
+    reads        : 每个时次需要读的全部变量（含桶计数器）
+    """
+    cover_source: Optional[str]
+    depth_source: Optional[str]
+    depth_estimated: bool
+    frozen_source: Optional[str]
+    precip_parts: Tuple[str, ...]
+    reads: Tuple[str, ...]
+
+    def describe(self) -> List[str]:
+        depth = self.depth_source
+        if depth is not None and self.depth_estimated:
+            depth = f"{depth} ÷ 雪密度（估算）"
+        return [
+            f"积雪覆盖来源: {self.cover_source}",
+            f"积雪深度来源: {depth}",
+            f"冻结降水来源: {self.frozen_source}",
+            f"总降水组成: {' + '.join(self.precip_parts) or None}",
+            f"每个时次读取: {', '.join(self.reads)}",
+        ]
+
+
+def resolve_snow_plan(variables: Iterable[str]) -> SnowPlan:
+    """
+    variables: 文件里的变量名（如 nc.variables.keys()）
+    """
+    names = set(variables)
+    first = lambda candidates: next((n for n in candidates if n in names), None)
+
+    swe_name = first(("SWE", "SNOW"))
+    precip_parts = tuple(n for n in TOTAL_PARTS if n in names)
+
+    if "SNOWNC" in names:
+        frozen_source = "SNOWNC"
+    elif "SR" in names and precip_parts:
+        frozen_source = "SR"
+    else:
+        frozen_source = None
+
+    depth_source = first(("SNOWH", "SNOW_DEPTH")) or swe_name
+    depth_estimated = depth_source is not None and depth_source == swe_name
+
+    cover_source = first(("SNOWC", "SNOWH", "SNOW_DEPTH")) or swe_name
+    if cover_source is None and frozen_source is not None:
+        cover_source = "frozen"
+
+    reads = set(precip_parts)
+    for name in (cover_source, depth_source):
+        if name is not None and name != "frozen":
+            reads.add(name)
+    if frozen_source == "SNOWNC":
+        reads.add("SNOWNC")
+    elif frozen_source == "SR":
+        reads.add("SR")
+    reads.update(c for n, c in BUCKET_COUNTERS.items() if n in reads and c in names)
+
+    return SnowPlan(cover_source, depth_source, depth_estimated, frozen_source,
+                    precip_parts, tuple(sorted(reads)))
+
+
+# =========================================================
+# 2. 由读入的场计算诊断量
+# =========================================================
+def snow_state_fields(plan: SnowPlan, raw: Dict[str, np.ndarray], rho_snow: float = 100.0,
+                      frozen_accum: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    积雪覆盖 / 深度（瞬时量）；raw 为一个或多个时次的 {变量: 数组}
+    覆盖退到“累计冻结降水”时：SNOWNC 直接用；SR 回退须由调用方给出逐时段分配后累加的 frozen_accum
+    （SR 乘累计总降水在物理上不对，见 PhasePartition）
+    """
+    out = {}
+    if plan.cover_source is not None:
+        if plan.cover_source != "frozen":
+            field = raw[plan.cover_source]
+        elif plan.frozen_source == "SNOWNC":
+            field = raw["SNOWNC"]
+        else:
+            field = frozen_accum
+        if field is not None:
+            out["snow_cover"] = (field > COVER_THRESHOLDS[plan.cover_source]).astype(np.int8)
+
+    if plan.depth_source is not None:
+        depth = raw[plan.depth_source]
+        out["snow_depth"] = depth / rho_snow if plan.depth_estimated else depth
+    return out
+
+
+def precip_interval_fields(plan: SnowPlan, interval_fields: Dict[str, np.ndarray],
+                           sr: Optional[np.ndarray] = None) -> Dict[str, np.ndarray]:
+    """
+    反累计后的时段量 -> 总 / 液态 / 冻结降水
+    """
+    out = {}
+    parts = [interval_fields[n] for n in plan.precip_parts if n in interval_fields]
+    if not parts:
+        return out
+    total = np.sum(parts, axis=0)
+    out["total_precip"] = total
+
+    frozen = None
+    if plan.frozen_source == "SNOWNC" and "SNOWNC" in interval_fields:
+        frozen = interval_fields["SNOWNC"]
+    elif plan.frozen_source == "SR" and sr is not None:
+        frozen = np.clip(total * sr, 0.0, None)
+
+    if frozen is not None:
+        out["frozen_precip"] = frozen
+        out["liquid_precip"] = np.clip(total - frozen, 0.0, None)
+    else:
+        out["liquid_precip"] = total
+    return out
+
+
+# =========================================================
+# 3. 逐时段雨雪相态分离
+# =========================================================
+SR_MODES = ("end", "mean")
+
+
+class PhasePartition:
+    """
+    SR 是某一时刻的冻结降水比例，只能用来分配同一时段的降水：
+        frozen_k = P_k × SR_k,  liquid_k = P_k − frozen_k
+    P_k 为 wrf_deaccum 反累计得到的第 k 个时段的降水。有 SNOWNC 时直接用 SNOWNC 的时段量。
+
+    update_block 一次处理一段连续时次（通常是一个文件的全部时次），
+    在 (Time, ny, nx) 上整块计算，然后把 总 / 液态 / 冻结 累加进 totals；
+    只保留上一时次的累计量和 SR，内存与模拟长度无关。
+
+    sr_mode: "end"  用时段末的 SR（wrfout 里的 SR 即输出时刻的值）
+             "mean" 用时段首末 SR 的平均
+    windows: 可选的 wrf_deaccum.WindowTotals，逐时段的 总 / 液态 / 冻结 同时累加到各时间窗
+    """
+
+    def __init__(self, plan: SnowPlan, bucket_mm: float = 0.0, sr_mode: str = "end",
+                 windows=None, verbose: bool = True):
+        if sr_mode not in SR_MODES:
+            raise ValueError(f"[PhasePartition] sr_mode 只能是 {SR_MODES}: {sr_mode}")
+        self.plan = plan
+        self.sr_mode = sr_mode
+        self.windows = windows
+        self.accum_names = plan.precip_parts + (("SNOWNC",) if plan.frozen_source == "SNOWNC" else ())
+        self.deacc = Deaccumulator(bucket_mm=bucket_mm, verbose=verbose)
+        self.totals: Dict[str, np.ndarray] = {}
+        self.frozen_accum: Optional[np.ndarray] = None
+        self.n_intervals = 0
+        self.first_time = None
+        self.last_time = None
+        self._prev_sr: Optional[np.ndarray] = None
+
+    def _interval_sr(self, sr: np.ndarray) -> np.ndarray:
+        if self.sr_mode == "end":
+            return sr
+        prev = sr[:1] if self._prev_sr is None else self._prev_sr[None]
+        return 0.5 * (sr + np.concatenate([prev, sr[:-1]], axis=0))
+
+    def update_block(self, raw: Dict[str, np.ndarray], times: Sequence[datetime],
+                     run_start: Optional[str] = None) -> Dict[str, np.ndarray]:
+        """
+        raw: {变量: (Time, ny, nx)}，含 plan 里的降水分量、SNOWNC / SR 和桶计数器
+        返回 {total_precip / liquid_precip / frozen_precip / frozen_accum: (Time, ny, nx)}，
+        没有上一时次的时次（整个序列的第一个）为 NaN
+        """
+        frames = accum_frames(raw, times, run_start, self.deacc.bucket_mm, self.accum_names)
+        intervals = [self.deacc.update(frame) for frame in frames]
+        valid = [k for k, iv in enumerate(intervals) if iv is not None]
+
+        sr = None
+        if self.plan.frozen_source == "SR":
+            sr_raw = np.asarray(raw["SR"], dtype=np.float64)
+            sr = self._interval_sr(sr_raw)
+            self._prev_sr = sr_raw[-1]
+
+        grid = frames[0].fields[self.accum_names[0]].shape if self.accum_names else np.shape(raw["SR"])[1:]
+        out: Dict[str, np.ndarray] = {}
+        if valid:
+            stacked = {name: np.stack([intervals[k].fields[name] for k in valid])
+                       for name in intervals[valid[0]].fields}
+            part = precip_interval_fields(self.plan, stacked, None if sr is None else sr[valid])
+            for name, arr in part.items():
+                full = np.full((len(times),) + grid, np.nan)
+                full[valid] = arr
+                out[name] = full
+                self.totals[name] = self.totals[name] + arr.sum(axis=0) if name in self.totals else arr.sum(axis=0)
+
+            if self.windows is not None:
+                for m, k in enumerate(valid):
+                    iv = intervals[k]
+                    self.windows.add(iv._replace(fields={name: arr[m] for name, arr in part.items()}))
+
+            self.n_intervals += len(valid)
+            self.first_time = self.first_time or intervals[valid[0]].t_start
+            self.last_time = intervals[valid[-1]].t_end
+
+        # 逐时段分配后累加的冻结降水（覆盖判定回退用）
+        frozen = out.get("frozen_precip")
+        if frozen is not None:
+            base = np.zeros(grid) if self.frozen_accum is None else self.frozen_accum
+            accum = base + np.cumsum(np.nan_to_num(frozen), axis=0)
+            self.frozen_accum = accum[-1]
+            out["frozen_accum"] = accum
+        return out
+
+
+def partition_reads(plan: SnowPlan) -> Tuple[str, ...]:
+    """
+    相态分离只需要的变量（降水分量、SNOWNC 或 SR、桶计数器）
+    """
+    names = set(plan.precip_parts)
+    if plan.frozen_source is not None:
+        names.add(plan.frozen_source)
+    return tuple(sorted(n for n in plan.reads if n in names or n in BUCKET_COUNTERS.values()))
+
+
+def partition_precip(wrf_files: Sequence[str], plan: Optional[SnowPlan] = None, sr_mode: str = "end",
+                     windows=None, window: Optional[Tuple[int, int, int, int]] = None,
+                     verbose: bool = True) -> PhasePartition:
+    """
+    按时间顺序走一遍 wrf_files，每个文件整块读入、整块分配；返回 PhasePartition（totals 为全时段总量）
+    window = (j0, j1, i0, i1) 时只读该窗口
+    """
+    from wrf_stations import file_times
+
+    with Dataset(wrf_files[0]) as nc:
+        plan = plan or resolve_snow_plan(nc.variables.keys())
+        bucket = bucket_size(nc)
+    if not plan.precip_parts:
+        raise KeyError("[partition_precip] 文件里没有 RAINC / RAINNC / RAINSH")
+
+    reads = partition_reads(plan)
+    index = (slice(None),) if window is None else \
+        (slice(None), slice(window[0], window[1]), slice(window[2], window[3]))
+    part = PhasePartition(plan, bucket, sr_mode, windows, verbose)
+
+    for wrf_file in wrf_files:
+        with Dataset(wrf_file) as nc:
+            raw = {name: np.asarray(np.ma.filled(nc.variables[name][index], np.nan), dtype=np.float64)
+                   for name in reads}
+            times = file_times(nc, wrf_file)
+            run_start = getattr(nc, "SIMULATION_START_DATE", None)
+        part.update_block(raw, times, run_start)
+
+    if verbose:
+        print(f"[partition_precip] {len(wrf_files)} 个文件，{part.n_intervals} 个时段，冻结降水来源 {plan.frozen_source}")
+    return part
+
+
+# =========================================================
+# 4. 输出库（Time 无限维，逐时次追加）
+# =========================================================
+class SnowStore:
+
+    time_units = "hours since 1970-01-01 00:00:00"
+
+    def __init__(self, out_nc: str, plan: SnowPlan, lat2d, lon2d, rho_snow: float):
+        self.path = out_nc
+        self.nc = Dataset(out_nc, "w", format="NETCDF4")
+        nc = self.nc
+        ny, nx = np.shape(lat2d)
+        nc.createDimension("Time", None)
+        nc.createDimension("south_north", ny)
+        nc.createDimension("west_east", nx)
+        nc.description = "WRF 批量积雪诊断；降水为相对上一时次的时段量（第一个时次为缺测）"
+        nc.rho_snow = rho_snow
+        for key, value in plan._asdict().items():
+            setattr(nc, f"plan_{key}", str(value))
+
+        for name, arr in (("XLAT", lat2d), ("XLONG", lon2d)):
+            nc.createVariable(name, "f4", ("south_north", "west_east"), zlib=True)[:] = arr
+        t = nc.createVariable("time", "f8", ("Time",))
+        t.units = self.time_units
+
+        dims = ("Time", "south_north", "west_east")
+        chunks = (1, ny, nx)
+        self.names = []
+        if plan.cover_source is not None:
+            v = nc.createVariable("snow_cover", "i1", dims, zlib=True, chunksizes=chunks, fill_value=-1)
+            v.source = plan.cover_source
+            self.names.append("snow_cover")
+        if plan.depth_source is not None:
+            self.names.append("snow_depth")
+        if plan.precip_parts:
+            self.names.extend(["total_precip", "liquid_precip"])
+            if plan.frozen_source is not None:
+                self.names.append("frozen_precip")
+        for name in self.names:
+            if name == "snow_cover":
+                continue
+            v = nc.createVariable(name, "f4", dims, zlib=True, chunksizes=chunks, fill_value=np.float32(np.nan))
+            v.units = SNOW_UNITS[name]
+        if plan.depth_source is not None:
+            nc.variables["snow_depth"].source = plan.depth_source
+
+    def append(self, t, fields: Dict[str, np.ndarray]):
+        k = len(self.nc.dimensions["Time"])
+        self.nc.variables["time"][k] = date2num(t, self.time_units)
+        for name in self.names:
+            if name in fields:
+                self.nc.variables[name][k] = fields[name]
+
+    def close(self):
+        self.nc.close()
+
+
+# =========================================================
+# 5. 批处理
+# =========================================================
+def run_snow_batch(wrf_files: Sequence[str], out_nc: str, rho_snow: float = 100.0,
+                   plan: Optional[SnowPlan] = None, verbose: bool = True) -> SnowPlan:
+    """
+    按时间顺序处理全部文件，每个文件打开一次、每个变量读一次
+    """
+    from wrf_stations import file_times
+
+    with Dataset(wrf_files[0]) as nc:
+        plan = plan or resolve_snow_plan(nc.variables.keys())
+        bucket = bucket_size(nc)
+        lat = np.asarray(nc.variables["XLAT"][0])
+        lon = np.asarray(nc.variables["XLONG"][0])
+    if verbose:
+        print("[run_snow_batch] 变量计划：")
+        for line in plan.describe():
+            print(f"    {line}")
+
+    part = PhasePartition(plan, bucket, verbose=verbose) if plan.precip_parts else None
+    store = SnowStore(out_nc, plan, lat, lon, rho_snow)
+    n = 0
+    try:
+        for wrf_file in wrf_files:
+            with Dataset(wrf_file) as nc:
+                missing = [name for name in plan.reads if name not in nc.variables]
+                if missing:
+                    raise KeyError(f"[run_snow_batch] {os.path.basename(wrf_file)} 缺少变量 {missing}，"
+                                   f"与第一个文件的变量表不一致")
+                raw = {name: np.asarray(np.ma.filled(nc.variables[name][:], np.nan), dtype=np.float64)
+                       for name in plan.reads}
+                times = file_times(nc, wrf_file)
+                run_start = getattr(nc, "SIMULATION_START_DATE", None)
+
+            # 降水按时段整块分配，积雪状态整块判定
+            precip = part.update_block(raw, times, run_start) if part is not None else {}
+            state = snow_state_fields(plan, raw, rho_snow, precip.get("frozen_accum"))
+            for k, t in enumerate(times):
+                fields = {name: arr[k] for name, arr in state.items()}
+                fields.update({name: arr[k] for name, arr in precip.items()})
+                store.append(t, fields)
+                n += 1
+            if verbose:
+                print(f"处理: {os.path.basename(wrf_file)}")
+    finally:
+        store.close()
+
+    if verbose:
+        print(f"[run_snow_batch] {len(wrf_files)} 个文件，{n} 个时次 -> {out_nc}")
+    return plan
+
+
+def read_snow_store(path: str, names: Optional[Sequence[str]] = None):
+    """
+    返回 ({变量: 数组}, 时间列表, 全局属性)
+    names 为 None 时读全部积雪量，[] 时只读经纬度和时间
+    """
+    with Dataset(path) as nc:
+        if names is None:
+            names = [n for n in SNOW_UNITS if n in nc.variables]
+        data = {name: np.ma.filled(nc.variables[name][:], np.nan if name != "snow_cover" else -1)
+                for name in names}
+        data["XLAT"] = np.asarray(nc.variables["XLAT"][:])
+        data["XLONG"] = np.asarray(nc.variables["XLONG"][:])
+        tv = nc.variables["time"]
+        times = list(num2date(tv[:], tv.units, only_use_cftime_datetimes=False, only_use_python_datetimes=True))
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+    return data, times, attrs
+
+
+def iter_snow_store(path: str, names: Optional[Sequence[str]] = None, block: int = 24):
+    """
+    逐时次产出 (时间, {变量: 二维场})；每次只读 block 个时次，内存与时次总数无关
+    """
+    with Dataset(path) as nc:
+        if names is None:
+            names = [n for n in SNOW_UNITS if n in nc.variables]
+        tv = nc.variables["time"]
+        n_time = len(tv)
+        for k0 in range(0, n_time, block):
+            k1 = min(k0 + block, n_time)
+            times = num2date(tv[k0:k1], tv.units, only_use_cftime_datetimes=False, only_use_python_datetimes=True)
+            data = {name: np.ma.filled(nc.variables[name][k0:k1], np.nan if name != "snow_cover" else -1)
+                    for name in names}
+            for k, t in enumerate(times):
+                yield t, {name: arr[k] for name, arr in data.items()}
+
+
+# =========================================================
+# 6. 季节统计（积雪日数、初 / 终雪日、最大深度、累计冻结降水）
+# =========================================================
+class SnowClimatology:
+    """
+    逐时次喂入覆盖掩码 / 深度 / 时段冻结降水，按“日”归并：
+
+    - 当天各时次的覆盖掩码 np.packbits 后暂存（每个时次 ny*nx/8 字节），
+      日界时解包求和，覆盖时次比例 >= day_fraction 记为积雪日
+    - 积雪日数、覆盖时次数、最长连续积雪日数、初 / 终雪日（日序号）用整型计数器向量化更新
+    - 最大深度及其出现时间：深度超过当前最大值的格点整体替换
+    - 冻结降水：float64 累加
+
+    内存只有若干 (ny, nx) 数组和一天的位图，与季节长度无关。
+    day_offset_hours：日界相对 00 UTC 的偏移，如北京时 00 时为日界取 -8
+    """
+
+    time_units = "days since 1970-01-01"
+
+    def __init__(self, shape: Tuple[int, int], day_fraction: float = 0.5, day_offset_hours: float = 0.0):
+        self.shape = tuple(shape)
+        self.n_cells = int(np.prod(self.shape))
+        self.day_fraction = float(day_fraction)
+        self.day_offset = timedelta(hours=day_offset_hours)
+
+        self.n_steps = 0
+        self.n_days = 0
+        self.step_count = np.zeros(self.n_cells, dtype=np.int32)
+        self.snow_days = np.zeros(self.n_cells, dtype=np.int32)
+        self.first_day = np.full(self.n_cells, -1, dtype=np.int32)
+        self.last_day = np.full(self.n_cells, -1, dtype=np.int32)
+        self.current_spell = np.zeros(self.n_cells, dtype=np.int32)
+        self.longest_spell = np.zeros(self.n_cells, dtype=np.int32)
+        self.max_depth = np.full(self.n_cells, np.nan)
+        self.max_depth_time = np.full(self.n_cells, np.nan)
+        self.frozen_total = np.zeros(self.n_cells)
+
+        self._day: Optional[int] = None
+        self._day_bits: List[np.ndarray] = []
+        self.first_time = None
+        self.last_time = None
+
+    def _day_number(self, t) -> int:
+        return ((t - self.day_offset).date() - datetime(1970, 1, 1).date()).days
+
+    def _close_day(self):
+        if self._day is None or not self._day_bits:
+            return
+        bits = np.unpackbits(np.stack(self._day_bits), axis=1, count=self.n_cells)
+        covered = bits.sum(axis=0, dtype=np.int32) >= self.day_fraction * len(self._day_bits)
+
+        self.snow_days += covered
+        self.first_day[covered & (self.first_day < 0)] = self._day
+        self.last_day[covered] = self._day
+        self.current_spell = np.where(covered, self.current_spell + 1, 0)
+        np.maximum(self.longest_spell, self.current_spell, out=self.longest_spell)
+
+        self.n_days += 1
+        self._day_bits = []
+
+    def update(self, t, cover=None, depth=None, frozen=None):
+        """
+        t 须按时间顺序；cover 为布尔 / 0-1 掩码，depth（m）、frozen（mm，时段量）可为 None
+        """
+        day = self._day_number(t)
+        if self._day is not None and day != self._day:
+            self._close_day()
+            if day != self._day + 1:
+                # 中间缺整天，连续积雪日数不能跨过去
+                self.current_spell[:] = 0
+        self._day = day
+        self.first_time = self.first_time or t
+        self.last_time = t
+
+        if cover is not None:
+            mask = np.asarray(cover).ravel() > 0
+            self._day_bits.append(np.packbits(mask))
+            self.step_count += mask
+
+        if depth is not None:
+            d = np.asarray(depth, dtype=np.float64).ravel()
+            larger = d > np.nan_to_num(self.max_depth, nan=-np.inf)
+            self.max_depth[larger] = d[larger]
+            self.max_depth_time[larger] = date2num(t, self.time_units)
+
+        if frozen is not None:
+            self.frozen_total += np.nan_to_num(np.asarray(frozen, dtype=np.float64).ravel())
+
+        self.n_steps += 1
+
+    def products(self) -> Dict[str, np.ndarray]:
+        """
+        收尾（归并最后一天）并返回各产品，形状 (ny, nx)；初 / 终雪日为 days since 1970-01-01，-1 表示无
+        """
+        self._close_day()
+        with np.errstate(invalid="ignore", divide="ignore"):
+            freq = self.step_count / max(self.n_steps, 1)
+        out = {
+            "snow_days": self.snow_days,
+            "cover_frequency": freq,
+            "first_snow_day": self.first_day,
+            "last_snow_day": self.last_day,
+            "longest_spell": self.longest_spell,
+            "max_depth": self.max_depth,
+            "max_depth_time": self.max_depth_time,
+            "frozen_total": self.frozen_total,
+        }
+        return {name: arr.reshape(self.shape) for name, arr in out.items()}
+
+
+CLIMATOLOGY_ATTRS = {
+    "snow_days": ("days", "积雪日数"),
+    "cover_frequency": ("1", "覆盖时次比例"),
+    "first_snow_day": (SnowClimatology.time_units, "初雪日"),
+    "last_snow_day": (SnowClimatology.time_units, "终雪日"),
+    "longest_spell": ("days", "最长连续积雪日数"),
+    "max_depth": ("m", "最大积雪深度"),
+    "max_depth_time": (SnowClimatology.time_units, "最大积雪深度出现时间"),
+    "frozen_total": ("mm", "累计冻结降水"),
+}
+
+
+def write_snow_climatology(clim: SnowClimatology, out_nc: str, lat2d, lon2d, attrs: Optional[dict] = None):
+    products = clim.products()
+    with Dataset(out_nc, "w") as nc:
+        ny, nx = clim.shape
+        nc.createDimension("south_north", ny)
+        nc.createDimension("west_east", nx)
+        nc.description = "WRF 积雪季节统计"
+        nc.n_steps = clim.n_steps
+        nc.n_days = clim.n_days
+        nc.day_fraction = clim.day_fraction
+        nc.period = f"{clim.first_time:%Y-%m-%d %H} ~ {clim.last_time:%Y-%m-%d %H}"
+        for key, value in (attrs or {}).items():
+            setattr(nc, key, value)
+
+        dims = ("south_north", "west_east")
+        for name, arr in (("XLAT", lat2d), ("XLONG", lon2d)):
+            nc.createVariable(name, "f4", dims, zlib=True)[:] = arr
+        for name, arr in products.items():
+            units, long_name = CLIMATOLOGY_ATTRS[name]
+            if arr.dtype.kind == "i":
+                v = nc.createVariable(name, "i4", dims, zlib=True, fill_value=-1 if name.endswith("_day") else None)
+            else:
+                v = nc.createVariable(name, "f8" if "since" in units else "f4", dims, zlib=True)
+            v.units = units
+            v.long_name = long_name
+            v[:] = arr
+    print(f"已保存: {out_nc}")
@@ -0,0 +1,352 @@
+# -*- coding: utf-8 -*-
+"""
+整层网格的大气稳定度 / 对流指数（向量化）
+
+原来 SI_index_plots.py / SI_index_cartopy_plots.py 对每个 (j, i) 气柱循环，
+每次调用 log_interpolate_1d 两次 + mpcalc.parcel_profile（带单位、带 try/except），
+杭州小区域都要几分钟。这里对所有气柱、所有时次一起做：
+
+1. 在 ln p 上把 T / Td 插值到 850、500 hPa（wrf_thermo.interp_to_pressure）
+2. 850 hPa 气块：干绝热到 LCL，再湿绝热到 500 hPa（wrf_thermo.lifted_parcel_temperature，
+   湿绝热段可以用 RK4 积分，也可以查 wrf_moist_adiabat 的假绝热表）
+3. SI = T500 - T850_lifted
+
+输入可以是 (Z, Y, X) 或 (T, Z, Y, X)，垂直维由 axis 指定。
+
+对流指数（convective_indices）：
+SB / ML / MU 三种气块的 CAPE、CIN、LCL、LFC、EL，以及 LI、K 指数、总指数 TT。
+CAPE / CIN 的定义与 mpcalc.cape_cin 一致（虚温订正、插入 LCL 层、
+LFC 取最低、EL 取最高、在 ln p 上对浮力做梯形积分），只是所有气柱一起算：
+廓线统一成 (Z, N) 数组，气块起点放在第 0 层，顶部不足的层补 NaN。
+"""
+
+import numpy as np
+
+from wrf_thermo import (
+    KAPPA, Rd, ZERO_DEGC,
+    dewpoint_from_vapor_pressure, equivalent_potential_temperature, interp_to_pressure,
+    lcl, lifted_parcel_temperature, parcel_profile, potential_temperature,
+    saturation_mixing_ratio, vapor_pressure, virtual_temperature,
+)
+
+
+# =========================================================
+# 1. Showalter Index
+# =========================================================
+def showalter_index(p_hpa, t_c, td_c, axis=-3, log_interp=True, n_steps=40, table=None):
+    """
+    p_hpa : 气压（hPa）
+    t_c   : 温度（degC）
+    td_c  : 露点（degC），与 t_c 同形状
+    axis  : 垂直维
+    log_interp: True 在 ln p 上插值（同 SI_index_plots.py 的 log_interpolate_1d），
+                False 在 p 上插值（同 mpcalc.showalter_index）
+    table : wrf_moist_adiabat.get_table() 得到的假绝热查算表；None 时 RK4 积分
+
+    返回 SI（degC 温差），去掉垂直维；气柱不覆盖 850 / 500 hPa 的格点为 NaN
+    """
+    t_k = np.asarray(np.ma.filled(t_c, np.nan), dtype=np.float64) + ZERO_DEGC
+    td_k = np.asarray(np.ma.filled(td_c, np.nan), dtype=np.float64) + ZERO_DEGC
+
+    t850 = interp_to_pressure(t_k, p_hpa, 850.0, axis=axis, log=log_interp)
+    td850 = interp_to_pressure(td_k, p_hpa, 850.0, axis=axis, log=log_interp)
+    t500 = interp_to_pressure(t_k, p_hpa, 500.0, axis=axis, log=log_interp)
+
+    t850_lifted = lifted_parcel_temperature(850.0, t850, td850, 500.0,
+                                            n_steps=n_steps, table=table)
+
+    return t500 - t850_lifted
+
+
+# =========================================================
+# 2. 气柱整理的小工具（垂直维在第 0 维，N 个气柱）
+# =========================================================
+def _take(a, k):
+    """
+    每个气柱取第 k 层，k 形状 (N,)
+    """
+    return np.take_along_axis(a, np.asarray(k)[None], axis=0)[0]
+
+
+def _compact(valid, *arrays):
+    """
+    把每个气柱中 valid 的层按原顺序挪到前面，其余补 NaN
+    （气块起点因此总在第 0 层）
+    """
+    order = np.argsort(~valid, axis=0, kind="stable")
+    keep = np.take_along_axis(valid, order, axis=0)
+    return [np.where(keep, np.take_along_axis(a, order, axis=0), np.nan) for a in arrays]
+
+
+def _insert_level(p, p_new, *arrays):
+    """
+    在每个气柱中插入气压为 p_new 的一层（p 随下标减小），
+    arrays 在新层上的值按 p 线性插值（与 MetPy _insert_lcl_level 相同）。
+    返回 (Z+1, N) 的 p 和各数组
+    """
+    nz = p.shape[0]
+    m = (p >= p_new).sum(axis=0)              # 新层插入的位置
+    lo = np.clip(m - 1, 0, nz - 1)
+    hi = np.clip(m, 0, nz - 1)
+
+    idx = np.arange(nz + 1)[:, None]
+    src = np.clip(np.where(idx < m, idx, idx - 1), 0, nz - 1)
+
+    p_lo, p_hi = _take(p, lo), _take(p, hi)
+    out = [np.where(idx == m, p_new, np.take_along_axis(p, src, axis=0))]
+
+    with np.errstate(invalid="ignore", divide="ignore"):
+        w = (p_new - p_lo) / (p_hi - p_lo)
+        for a in arrays:
+            a_lo, a_hi = _take(a, lo), _take(a, hi)
+            val = np.where(m < nz, a_lo + w * (a_hi - a_lo), np.nan)
+            out.append(np.where(idx == m, val, np.take_along_axis(a, src, axis=0)))
+    return out
+
+
+def _isclose(a, b):
+    return np.isclose(a, b, rtol=1e-5, atol=1e-8)
+
+
+# =========================================================
+# 3. CAPE / CIN（整理好的气柱）
+# =========================================================
+def _cape_cin_columns(p, t_k, td_k, table=None):
+    """
+    p, t_k, td_k: (Z, N)，第 0 层为气块起点，顶部可以有 NaN
+
+    返回 dict：cape, cin（J/kg），lcl_p, lfc_p, el_p（hPa）
+    """
+    # 起点过饱和（WRF 里常见）按饱和处理，与 parcel_profile 一致；
+    # 起点层的环境露点一起截断，起点上气块与环境相同
+    td_k = td_k.copy()
+    td_k[0] = np.minimum(td_k[0], t_k[0])
+    p0, t0, td0 = p[0], t_k[0], td_k[0]
+    p_lcl, t_lcl = lcl(p0, t0, td0)
+
+    P, TE, TDE = _insert_level(p, p_lcl, t_k, td_k)
+    TP = parcel_profile(P, t0, td0, table=table)
+    # 插入的 LCL 层上 MetPy 取 Romps 的 t_lcl
+    TP = np.where(P == p_lcl, t_lcl, TP)
+
+    # 虚温订正：LCL 以下气块混合比守恒，以上取气块温度下的饱和混合比
+    with np.errstate(invalid="ignore"):
+        w_parcel = np.where(P > p_lcl, saturation_mixing_ratio(p0, td0), saturation_mixing_ratio(P, TP))
+        tv_env = virtual_temperature(TE, saturation_mixing_ratio(P, TDE))
+        tv_par = virtual_temperature(TP, w_parcel)
+        b = tv_par - tv_env
+        lnp = np.log(P)
+
+    valid = np.isfinite(b)
+    last = np.maximum(valid.sum(axis=0) - 1, 0)
+
+    # MetPy 的 lfc / el 用虚温起点算 LCL
+    p_lcl_v, _ = lcl(p0, tv_par[0], td0)
+
+    # 相邻两层之间的零点（第 0 层与起点重合，从第 1 层开始找，同 MetPy）
+    b_lo, b_hi = b[:-1], b[1:]
+    lnp_lo, lnp_hi = lnp[:-1], lnp[1:]
+    layer_ok = np.isfinite(b_lo) & np.isfinite(b_hi)
+    layer_ok[0] = False
+    with np.errstate(invalid="ignore", divide="ignore", over="ignore"):
+        lnc = lnp_lo + b_lo / (b_lo - b_hi) * (lnp_hi - lnp_lo)
+        pc = np.exp(lnc)
+    inc = layer_ok & (b_lo < 0) & (b_hi > 0)     # 气块由冷变暖
+    dec = layer_ok & (b_lo > 0) & (b_hi < 0)     # 气块由暖变冷
+    cross = inc | dec
+
+    # ---------------- LFC（最低的一个）----------------
+    cand = inc & (pc < p_lcl_v)
+    lfc_cross = _take(pc, np.argmax(cand, axis=0))
+    min_dec_p = np.where(dec, pc, np.inf).min(axis=0)
+    pos_above = (valid & (P < p_lcl_v) & ~((tv_par < tv_env) | _isclose(tv_par, tv_env))).any(axis=0)
+
+    lfc_p = np.where(
+        cand.any(axis=0), lfc_cross,
+        np.where(inc.any(axis=0),
+                 np.where(dec.any(axis=0) & (min_dec_p > p_lcl_v), np.nan, p_lcl_v),
+                 np.where(pos_above, p_lcl_v, np.nan)),
+    )
+
+    # ---------------- EL（最高的一个）----------------
+    k_top = np.where(dec, np.arange(dec.shape[0])[:, None], -1).max(axis=0)
+    el_cross = _take(pc, np.maximum(k_top, 0))
+    el_p = np.where(_take(b, last) > 0, np.nan,
+                    np.where((k_top >= 0) & (el_cross < p_lcl_v), el_cross, np.nan))
+    el_use = np.where(np.isnan(el_p), _take(P, last), el_p)
+
+    # ---------------- 积分 ----------------
+    # 节点 = 各层 + 零点；与 MetPy 一样只保留落在积分区间内的节点之间的梯形
+    def in_cape(x):
+        return ((x <= lfc_p) | _isclose(x, lfc_p)) & ((x >= el_use) | _isclose(x, el_use))
+
+    def in_cin(x):
+        return (x >= lfc_p) | _isclose(x, lfc_p)
+
+    p_lo, p_hi = P[:-1], P[1:]
+    with np.errstate(invalid="ignore"):
+        whole = 0.5 * (b_lo + b_hi) * (lnp_lo - lnp_hi)
+        part_lo = 0.5 * b_lo * (lnp_lo - lnc)
+        part_hi = 0.5 * b_hi * (lnc - lnp_hi)
+
+    def integrate(keep):
+        k_lo, k_hi, k_c = keep(p_lo), keep(p_hi), keep(pc)
+        seg = np.where(cross,
+                       np.where(k_lo & k_c, part_lo, 0.0) + np.where(k_c & k_hi, part_hi, 0.0),
+                       np.where(k_lo & k_hi, whole, 0.0))
+        seg = np.where(np.isfinite(b_lo) & np.isfinite(b_hi), seg, 0.0)
+        return Rd * seg.sum(axis=0)
+
+    has_lfc = np.isfinite(lfc_p)
+    cape = np.where(has_lfc, integrate(in_cape), 0.0)
+    cin = np.where(has_lfc, np.minimum(integrate(in_cin), 0.0), 0.0)
+
+    # 起点本身无效的气柱
+    bad = ~np.isfinite(p0 + t0 + td0)
+    cape[bad] = np.nan
+    cin[bad] = np.nan
+
+    return {"cape": cape, "cin": cin, "lcl_p": p_lcl, "lfc_p": lfc_p, "el_p": el_p}
+
+
+# =========================================================
+# 4. 三种气块
+# =========================================================
+def _mixed_layer_start(p, t_k, td_k, depth):
+    """
+    最低 depth hPa 内按气压加权平均的位温和混合比（同 mpcalc.mixed_layer，
+    层顶按 ln p 插值），换算成地面气压上的气块温度和露点
+    """
+    p0 = p[0]
+    p_top = p0 - depth
+    theta = potential_temperature(p, t_k)
+    w = saturation_mixing_ratio(p, td_k)
+
+    inside = p >= p_top
+    n_in = inside.sum(axis=0)
+    seg_in = inside[:-1] & inside[1:]
+    dp = p[:-1] - p[1:]
+
+    means = []
+    for f in (theta, w):
+        full = np.where(seg_in, 0.5 * (f[:-1] + f[1:]) * dp, 0.0).sum(axis=0)
+        f_top = interp_to_pressure(f, p, p_top, axis=0, log=True)
+        k_last = np.maximum(n_in - 1, 0)
+        p_last, f_last = _take(p, k_last), _take(f, k_last)
+        means.append((full + 0.5 * (f_last + f_top) * (p_last - p_top)) / depth)
+
+    theta_ml, w_ml = means
+    t_ml = theta_ml * (p0 / 1000.0) ** KAPPA
+    td_ml = dewpoint_from_vapor_pressure(vapor_pressure(p0, w_ml))
+    return t_ml, td_ml
+
+
+def _parcel_columns(kind, p, t_k, td_k, ml_depth=100.0, mu_depth=300.0):
+    """
+    按气块类型整理气柱，使第 0 层为气块起点：
+    sb : 最低层
+    ml : 最低 ml_depth hPa 混合后的气块放在地面气压上，接 p < p0 - ml_depth 的环境层
+    mu : 最低 mu_depth hPa 内 θe 最大的层，及其以上各层
+         （θe 用截到气温的露点算，过饱和层和其他起点一样按饱和处理）
+    """
+    nz = p.shape[0]
+    levels = np.arange(nz)[:, None]
+
+    if kind == "sb":
+        return p, t_k, td_k
+
+    if kind == "ml":
+        t_ml, td_ml = _mixed_layer_start(p, t_k, td_k, ml_depth)
+        t_k = np.where(levels == 0, t_ml, t_k)
+        td_k = np.where(levels == 0, td_ml, td_k)
+        valid = (levels == 0) | (p < p[0] - ml_depth)
+        return _compact(valid, p, t_k, td_k)
+
+    if kind == "mu":
+        layer = (p >= p[0] - mu_depth) | _isclose(p, p[0] - mu_depth)
+        with np.errstate(invalid="ignore"):
+            theta_e = np.where(layer, equivalent_potential_temperature(p, t_k, np.minimum(td_k, t_k)), -np.inf)
+        k_mu = np.argmax(np.nan_to_num(theta_e, nan=-np.inf), axis=0)
+        return _compact(levels >= k_mu, p, t_k, td_k)
+
+    raise ValueError(f"未知的气块类型: {kind}")
+
+
+# =========================================================
+# 5. 对流指数总入口
+# =========================================================
+def _indices_chunk(p, t_k, td_k, z_agl, table, ml_depth, mu_depth):
+    out = {}
+
+    for kind in ("sb", "ml", "mu"):
+        pp, tt, dd = _parcel_columns(kind, p, t_k, td_k, ml_depth, mu_depth)
+        res = _cape_cin_columns(pp, tt, dd, table=table)
+        out[f"{kind}cape"] = res["cape"]
+        out[f"{kind}cin"] = res["cin"]
+        out[f"{kind}lcl_p"] = res["lcl_p"]
+        out[f"{kind}lfc_p"] = res["lfc_p"]
+        out[f"{kind}el_p"] = res["el_p"]
+        if z_agl is not None:
+            out[f"{kind}lcl_hgt"] = interp_to_pressure(z_agl, p, res["lcl_p"], axis=0)
+            out[f"{kind}lfc_hgt"] = interp_to_pressure(z_agl, p, res["lfc_p"], axis=0)
+
+    # 环境层结指数，同 MetPy：在 p 上线性插值
+    t850, t700, t500 = (interp_to_pressure(t_k, p, lev, axis=0, log=False) for lev in (850.0, 700.0, 500.0))
+    td850, td700 = (interp_to_pressure(td_k, p, lev, axis=0, log=False) for lev in (850.0, 700.0))
+    out["k_index"] = (t850 - t500) + (td850 - ZERO_DEGC) - (t700 - td700)
+    out["total_totals"] = (t850 - t500) + (td850 - t500)
+
+    # LI：地面气块直接抬升到 500 hPa
+    tp500 = lifted_parcel_temperature(p[0], t_k[0], td_k[0], 500.0, table=table)
+    out["lifted_index"] = t500 - tp500
+
+    return out
+
+
+def convective_indices(p_hpa, t_c, qv, z=None, hgt=None, axis=-3, table=None,
+                       chunk_columns=16384, ml_depth=100.0, mu_depth=300.0):
+    """
+    p_hpa : 气压（hPa），如 (Z, Y, X) 或 (T, Z, Y, X)
+    t_c   : 温度（degC）
+    qv    : 水汽混合比 QVAPOR（kg/kg）
+    z     : 质量层位势高度（m），给定时输出 LCL / LFC 高度
+    hgt   : 地形高度（m），形状为去掉垂直维后的形状；给定时高度为离地高度
+    axis  : 垂直维
+    table : wrf_moist_adiabat.get_table()，None 时湿绝热用 RK4
+    chunk_columns: 每次处理的气柱数，控制内存（时间、水平维一起展平后分块）
+
+    返回 dict，各项形状为去掉垂直维后的形状：
+        {sb,ml,mu}cape, {sb,ml,mu}cin           J/kg
+        {sb,ml,mu}lcl_p, {sb,ml,mu}lfc_p, ..el_p  hPa（不存在为 NaN）
+        {sb,ml,mu}lcl_hgt, {sb,ml,mu}lfc_hgt      m（给了 z 时）
+        lifted_index, k_index, total_totals     degC
+    """
+    def columns(a):
+        a = np.moveaxis(np.asarray(np.ma.filled(a, np.nan), dtype=np.float64), axis, 0)
+        return a.reshape(a.shape[0], -1), a.shape[1:]
+
+    p, out_shape = columns(p_hpa)
+    t_k, _ = columns(t_c)
+    t_k = t_k + ZERO_DEGC
+    w, _ = columns(qv)
+    w = np.maximum(w, 1e-10)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        td_k = dewpoint_from_vapor_pressure(vapor_pressure(p, w))
+
+    z_agl = None
+    if z is not None:
+        z_agl, _ = columns(z)
+        if hgt is not None:
+            z_agl = z_agl - np.broadcast_to(np.asarray(hgt, dtype=np.float64), out_shape).reshape(1, -1)
+
+    n = p.shape[1]
+    result = {}
+    for s in range(0, n, chunk_columns):
+        sl = slice(s, min(s + chunk_columns, n))
+        part = _indices_chunk(p[:, sl], t_k[:, sl], td_k[:, sl],
+                              None if z_agl is None else z_agl[:, sl],
+                              table, ml_depth, mu_depth)
+        for k, v in part.items():
+            result.setdefault(k, np.empty(n))[sl] = v
+
+    return {k: v.reshape(out_shape) for k, v in result.items()}
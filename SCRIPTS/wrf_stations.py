@@ -0,0 +1,320 @@
+# -*- coding: utf-8 -*-
+"""
+多站点探空廓线批量提取
+
+plots_equal_lines.py / temp_profile.py 每次只从一个文件里取一个 (j, i) 的气柱。
+业务上需要 200 多个站、每个输出时次都有探空，这里分三步：
+
+1. 站点表（id, lat, lon）只在第一个文件上定位一次（wrf_gridindex），得到每站最近格点 (j, i)
+2. 每个 wrfout 只读这些气柱：站点集中时读一个包住全部站点的矩形 hyperslab，
+   站点分散时逐站读 var[:, :, j, i]，都不会读整层三维场
+3. 结果追加写入一个 station × Time × level 的 netCDF 站点库
+   （气压、温度、露点、地球坐标 u/v、高度），之后画探空图直接读库，不再碰 wrfout
+
+站点表格式（CSV，# 开头为注释，首行可以是表头）：
+    58457,30.23,120.17
+    58238,32.00,118.80
+
+用法：
+    from wrf_stations import read_station_list, locate_stations, StationStore, extract_file
+"""
+
+import os
+import csv
+from datetime import datetime
+from typing import Dict, List, NamedTuple, Optional, Sequence
+
+import numpy as np
+from netCDF4 import Dataset, date2num, num2date
+
+from wrf_gridindex import get_grid_index
+from wrf_thermo import G, KAPPA, ZERO_DEGC, dewpoint_from_mixing_ratio
+
+
+class Station(NamedTuple):
+    id: str
+    lat: float
+    lon: float
+
+
+# 站点库里的廓线变量及单位
+PROFILE_UNITS = {
+    "pressure": "hPa",
+    "temperature": "degC",
+    "dewpoint": "degC",
+    "u": "m s-1",
+    "v": "m s-1",
+    "height": "m",
+}
+
+
+# =========================================================
+# 1. 站点表与定位
+# =========================================================
+def read_station_list(path: str) -> List[Station]:
+    """
+    读 id,lat,lon 三列的 CSV；非数字的首行当表头跳过
+    """
+    stations = []
+    with open(path, newline="", encoding="utf-8") as f:
+        for row in csv.reader(f):
+            row = [c.strip() for c in row]
+            if not row or not row[0] or row[0].startswith("#"):
+                continue
+            try:
+                stations.append(Station(row[0], float(row[1]), float(row[2])))
+            except (ValueError, IndexError):
+                if stations:
+                    raise ValueError(f"[read_station_list] 无法解析的行: {row}")
+    if len(stations) == 0:
+        raise ValueError(f"[read_station_list] 站点表为空: {path}")
+    return stations
+
+
+def locate_stations(stations: Sequence[Station], lat2d, lon2d,
+                    max_dist_km: Optional[float] = None) -> Dict[str, np.ndarray]:
+    """
+    每站的最近格点（wrf_gridindex 的 KD 树，一次查询全部站点）
+
+    max_dist_km: 超过这个距离认为站点不在区域内（默认取区域中心格距）
+
+    返回 {"j", "i", "grid_lat", "grid_lon", "dist_km", "inside"}，长度都等于站数
+    """
+    index = get_grid_index(lat2d, lon2d)
+    j, i, dist_km = index.nearest([s.lat for s in stations], [s.lon for s in stations])
+
+    if max_dist_km is None:
+        max_dist_km = index.spacing_km
+
+    return {
+        "j": j,
+        "i": i,
+        "grid_lat": index.lat[j, i],
+        "grid_lon": index.lon[j, i],
+        "dist_km": dist_km,
+        "inside": dist_km <= max_dist_km,
+    }
+
+
+# =========================================================
+# 2. 只读站点气柱
+# =========================================================
+def read_columns(var, j, i, stagger: Optional[str] = None, box=None) -> np.ndarray:
+    """
+    var[..., y, x] 在 (j, i) 处的值，返回 (..., 站数)；
+    三维场即 (Time, level, 站数) 的气柱，二维场为 (Time, 站数)
+
+    stagger: "x" / "y" 时取相邻两个跳点的平均（U / V）
+    box    : (j0, j1, i0, i1)，给定时读一个矩形 hyperslab 再在内存里取点
+    """
+    nsj = 2 if stagger == "y" else 1
+    nsi = 2 if stagger == "x" else 1
+
+    if box is not None:
+        j0, j1, i0, i1 = box
+        block = np.asarray(var[..., j0:j1 + nsj, i0:i1 + nsi], dtype=np.float64)
+        cols = sum(block[..., j - j0 + dj, i - i0 + di] for dj in range(nsj) for di in range(nsi))
+        return cols / (nsj * nsi)
+
+    cols = [np.asarray(var[..., jj:jj + nsj, ii:ii + nsi], dtype=np.float64).mean(axis=(-2, -1))
+            for jj, ii in zip(j, i)]
+    return np.stack(cols, axis=-1)
+
+
+def column_box(j, i, box_factor: float = 16.0):
+    """
+    包围全部点的矩形 (j0, j1, i0, i1)；矩形格点数超过 点数 × box_factor 时返回 None（逐点读）
+    """
+    box = (int(np.min(j)), int(np.max(j)), int(np.min(i)), int(np.max(i)))
+    n_box = (box[1] - box[0] + 2) * (box[3] - box[2] + 2)
+    return box if n_box <= box_factor * np.size(j) else None
+
+
+def read_station_profiles(nc: Dataset, j, i, box_factor: float = 16.0) -> Dict[str, np.ndarray]:
+    """
+    一个 wrfout 里全部时次、全部站点的廓线，各量形状 (站数, Time, level)
+
+    box_factor: 包围矩形的格点数不超过 站数 × box_factor 时整块读，否则逐站读
+    """
+    j = np.asarray(j, dtype=np.int64)
+    i = np.asarray(i, dtype=np.int64)
+    box = column_box(j, i, box_factor)
+
+    def col(name, stagger=None):
+        return read_columns(nc.variables[name], j, i, stagger, box)
+
+    p_pa = col("P") + col("PB")
+    tk = (col("T") + 300.0) * (p_pa / 100000.0) ** KAPPA
+    qv = np.maximum(col("QVAPOR"), 1e-12)
+
+    p_hpa = p_pa / 100.0
+    td = dewpoint_from_mixing_ratio(p_hpa, qv) - ZERO_DEGC
+
+    ph = (col("PH") + col("PHB")) / G
+    z = 0.5 * (ph[:, :-1] + ph[:, 1:])
+
+    # 网格坐标风转地球坐标风（与 wrf-python uvmet 相同）
+    u = col("U", "x")
+    v = col("V", "y")
+    if "COSALPHA" in nc.variables and "SINALPHA" in nc.variables:
+        cosa = col("COSALPHA")[:, None, :]
+        sina = col("SINALPHA")[:, None, :]
+        u, v = u * cosa - v * sina, v * cosa + u * sina
+
+    fields = {
+        "pressure": p_hpa,
+        "temperature": tk - ZERO_DEGC,
+        "dewpoint": td,
+        "u": u,
+        "v": v,
+        "height": z,
+    }
+    # (Time, level, 站) -> (站, Time, level)
+    return {name: np.ascontiguousarray(arr.transpose(2, 0, 1)) for name, arr in fields.items()}
+
+
+def file_times(nc: Dataset, wrf_file: str) -> List[datetime]:
+    """
+    文件内各时次的时间；没有 Times 变量时按文件名
+    """
+    if "Times" in nc.variables:
+        raw = nc.variables["Times"][:]
+        return [datetime.strptime(b"".join(row).decode(), "%Y-%m-%d_%H:%M:%S") for row in raw]
+    from wrf_read_data import parse_wrf_time_from_filename
+    return [parse_wrf_time_from_filename(wrf_file)]
+
+
+# =========================================================
+# 3. 站点库（station x Time x level）
+# =========================================================
+class StationStore:
+    """
+    station 维在前、Time 为无限维，逐文件追加；
+    站点元数据（id、经纬度、对应格点、距离）写一次
+    """
+
+    time_units = "hours since 1970-01-01 00:00:00"
+
+    def __init__(self, nc: Dataset):
+        self.nc = nc
+
+    @classmethod
+    def create(cls, path: str, stations: Sequence[Station], loc: Dict[str, np.ndarray],
+               n_level: int, source: str = "") -> "StationStore":
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        nc = Dataset(path, "w", format="NETCDF4")
+        nc.createDimension("station", len(stations))
+        nc.createDimension("Time", None)
+        nc.createDimension("bottom_top", n_level)
+        nc.description = "WRF 站点探空廓线（wrf_stations）"
+        nc.source = source
+
+        sid = nc.createVariable("station_id", str, ("station",))
+        sid[:] = np.array([s.id for s in stations], dtype=object)
+
+        static = {
+            "lat": [s.lat for s in stations],
+            "lon": [s.lon for s in stations],
+            "grid_lat": loc["grid_lat"],
+            "grid_lon": loc["grid_lon"],
+            "dist_km": loc["dist_km"],
+        }
+        for name, arr in static.items():
+            nc.createVariable(name, "f8", ("station",))[:] = arr
+        for name in ("j", "i"):
+            nc.createVariable(f"grid_{name}", "i4", ("station",))[:] = loc[name]
+
+        t = nc.createVariable("time", "f8", ("Time",))
+        t.units = cls.time_units
+
+        for name, unit in PROFILE_UNITS.items():
+            v = nc.createVariable(name, "f4", ("station", "Time", "bottom_top"), zlib=True,
+                                  chunksizes=(1, 1, n_level))
+            v.units = unit
+
+        print(f"[StationStore] 新建: {path}（{len(stations)} 个站，{n_level} 层）")
+        return cls(nc)
+
+    @classmethod
+    def open_append(cls, path: str) -> "StationStore":
+        return cls(Dataset(path, "a"))
+
+    def station_ids(self) -> List[str]:
+        return [str(s) for s in self.nc.variables["station_id"][:]]
+
+    def locations(self) -> Dict[str, np.ndarray]:
+        v = self.nc.variables
+        return {"j": np.asarray(v["grid_j"][:]), "i": np.asarray(v["grid_i"][:])}
+
+    def times(self) -> List[datetime]:
+        t = self.nc.variables["time"]
+        if len(t) == 0:
+            return []
+        return list(num2date(t[:], self.time_units, only_use_cftime_datetimes=False,
+                             only_use_python_datetimes=True))
+
+    def append(self, times: Sequence[datetime], fields: Dict[str, np.ndarray]):
+        """
+        fields 各量形状 (站数, len(times), level)
+        """
+        k0 = len(self.nc.dimensions["Time"])
+        k1 = k0 + len(times)
+        self.nc.variables["time"][k0:k1] = date2num(list(times), self.time_units)
+        for name in PROFILE_UNITS:
+            self.nc.variables[name][:, k0:k1, :] = fields[name]
+
+    def close(self):
+        self.nc.close()
+
+
+def read_station_store(path: str, station_ids: Optional[Sequence[str]] = None,
+                       names: Optional[Sequence[str]] = None) -> Dict[str, object]:
+    """
+    读站点库；station_ids 给定时只读这些站（按给定顺序）
+    names 为 None 时读全部廓线量，[] 时只读站号、经纬度和时间
+
+    返回 {"station_id", "lat", "lon", "time", 各廓线量 (站数, Time, level)}
+    """
+    with Dataset(path) as nc:
+        all_ids = [str(s) for s in nc.variables["station_id"][:]]
+        if station_ids is None:
+            idx = np.arange(len(all_ids))
+        else:
+            missing = [s for s in station_ids if s not in all_ids]
+            if missing:
+                raise KeyError(f"[read_station_store] 站点库中没有: {missing}")
+            idx = np.array([all_ids.index(s) for s in station_ids])
+
+        t = nc.variables["time"]
+        out = {
+            "station_id": [all_ids[k] for k in idx],
+            "lat": np.asarray(nc.variables["lat"][:])[idx],
+            "lon": np.asarray(nc.variables["lon"][:])[idx],
+            "time": list(num2date(t[:], t.units, only_use_cftime_datetimes=False,
+                                  only_use_python_datetimes=True)),
+        }
+        for name in PROFILE_UNITS if names is None else names:
+            v = nc.variables[name]
+            out[name] = np.stack([np.asarray(v[k], dtype=np.float64) for k in idx])
+    return out
+
+
+# =========================================================
+# 4. 单个 wrfout -> 站点库
+# =========================================================
+def extract_file(wrf_file: str, loc: Dict[str, np.ndarray], store: StationStore,
+                 after: Optional[datetime] = None, box_factor: float = 16.0) -> int:
+    """
+    把一个 wrfout 里晚于 after 的时次写进站点库，返回写入的时次数
+    """
+    with Dataset(wrf_file) as nc:
+        times = file_times(nc, wrf_file)
+        keep = [k for k, t in enumerate(times) if after is None or t > after]
+        if not keep:
+            return 0
+
+        fields = read_station_profiles(nc, loc["j"], loc["i"], box_factor)
+
+    k0, k1 = keep[0], keep[-1] + 1
+    store.append(times[k0:k1], {name: arr[:, k0:k1] for name, arr in fields.items()})
+    return k1 - k0
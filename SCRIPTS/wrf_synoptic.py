@@ -0,0 +1,339 @@
+# -*- coding: utf-8 -*-
+"""
+500 hPa 天气分析的共用计算
+
+从 weather_detection/500hPa_geopotential_analysis.py 中抽出来的风切变线诊断，
+供单时次绘图、合成分析（wrf_composite.py）等共用。
+
+批量版本：shear_line_masks 对 (T, Y, X) 整块计算（平滑、梯度、腐蚀只沿水平两维，
+百分位阈值逐时次向量化求），run_synoptic_batch 把整个模拟的等压面场、
+运动学量和切变线掩码写进一个 netCDF。
+trough_masks 由平滑后位势高度的拉普拉斯（正值为气旋性曲率）给出槽区，供 wrf_tracking 跟踪。
+给了 metrics（wrf_kinematics.GridMetrics）时，辐散和形变按 DX / DY 与地图系数求，单位 s-1。
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from datetime import datetime
+from typing import Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+from netCDF4 import Dataset, date2num, num2date
+from scipy.ndimage import gaussian_filter, binary_erosion, generate_binary_structure
+
+from wrf_kinematics import GridMetrics, kinematic_fields, laplacian, read_grid_metrics
+from wrf_mapreduce import resolve_workers, split_files
+from wrf_stations import file_times
+from wrf_thermo import G, KAPPA, ZERO_DEGC, interp_to_pressure, sea_level_pressure
+
+
+SYNOPTIC_FIELDS = ("z", "u", "v", "t")
+SURFACE_FIELDS = ("slp",)
+READ_FIELDS = SYNOPTIC_FIELDS + SURFACE_FIELDS
+KINEMATIC_FIELDS = ("div", "deform")
+MASK_FIELDS = ("shear_mask", "shear_edge")
+
+FIELD_ATTRS = {
+    "z": ("m", "geopotential height"),
+    "u": ("m s-1", "grid-relative x-wind"),
+    "v": ("m s-1", "grid-relative y-wind"),
+    "t": ("degC", "temperature"),
+    "slp": ("hPa", "sea level pressure"),
+    "div": ("s-1", "horizontal divergence of smoothed wind"),
+    "deform": ("s-1", "total deformation of smoothed wind"),
+    "shear_mask": ("1", "shear-line candidate area"),
+    "shear_edge": ("1", "shear-line candidate edge"),
+}
+
+
+# =========================================================
+# 1. 风切变线与槽区（近似诊断）
+# =========================================================
+def shear_line_masks(u, v, smooth_sigma=1.2, shear_percentile=88,
+                     conv_percentile=35, metrics: Optional[GridMetrics] = None):
+    """
+    shear_line_mask 的批量版本：u / v 形状 (..., Y, X)，前面的维度（通常是时间）逐片独立处理，
+    结果与逐时次调用 shear_line_mask 完全相同
+
+    metrics=None 时沿用 np.gradient 的格点单位（每格点 m/s）；
+    给了 metrics 时由 wrf_kinematics 按网格距和地图系数求（s-1）
+
+    返回：
+    shear_mask, shear_edge, div, deform（形状与输入相同）
+    """
+    u = np.asarray(u, dtype=np.float64)
+    v = np.asarray(v, dtype=np.float64)
+    lead = u.ndim - 2
+    spatial = (0,) * lead + (1, 1)
+
+    # sigma 在前导维上取 0：只在水平面内平滑，时次之间不混
+    u = gaussian_filter(u, np.multiply(spatial, smooth_sigma))
+    v = gaussian_filter(v, np.multiply(spatial, smooth_sigma))
+
+    if metrics is None:
+        dudy, dudx = np.gradient(u, axis=(-2, -1))
+        dvdy, dvdx = np.gradient(v, axis=(-2, -1))
+        div = dudx + dvdy
+        deform = np.sqrt((dudx - dvdy)**2 + (dudy + dvdx)**2)
+    else:
+        kin = kinematic_fields(u, v, metrics, names=("div", "deform"))
+        div, deform = kin["div"], kin["deform"]
+
+    # 逐时次阈值：把水平两维拉平后沿最后一维求百分位
+    flat = u.shape[:-2] + (-1,)
+    shear_thr = np.nanpercentile(deform.reshape(flat), shear_percentile, axis=-1)[..., None, None]
+    conv_thr = np.nanpercentile(div.reshape(flat), conv_percentile, axis=-1)[..., None, None]
+
+    shear_mask = (deform >= shear_thr) & (div <= conv_thr)
+    shear_mask = gaussian_filter(shear_mask.astype(float), np.multiply(spatial, 1.0)) > 0.35
+
+    # 腐蚀结构元只在中间那一片有值，相当于逐片做二维腐蚀
+    structure = np.zeros((3,) * lead + (3, 3), dtype=bool)
+    structure[(1,) * lead] = generate_binary_structure(2, 1)
+    shear_edge = shear_mask ^ binary_erosion(shear_mask, structure=structure)
+
+    return shear_mask, shear_edge, div, deform
+
+
+def shear_line_mask(u500, v500, smooth_sigma=1.2, shear_percentile=88,
+                    conv_percentile=35, metrics: Optional[GridMetrics] = None):
+    """
+    说明：
+    “风切变线”自动识别并没有唯一标准。
+    这里采用：
+    1) 500hPa 风场形变（deformation）较大
+    2) 同时位于相对辐合区
+    3) 对满足条件区域的边界作线
+
+    单时次 (Y, X)，实际计算见 shear_line_masks。
+
+    返回：
+    shear_mask, shear_edge, div, deform
+    """
+    return shear_line_masks(u500, v500, smooth_sigma=smooth_sigma,
+                            shear_percentile=shear_percentile,
+                            conv_percentile=conv_percentile, metrics=metrics)
+
+
+def trough_masks(z, smooth_sigma=2.0, trough_percentile=85,
+                 metrics: Optional[GridMetrics] = None):
+    """
+    槽区（近似）：平滑后的位势高度拉普拉斯 ∇²z 不低于逐时次的 trough_percentile 百分位
+    （北半球 ∇²z > 0 对应气旋性曲率 / 正的地转涡度），只保留 ∇²z > 0 的格点
+
+    z 形状 (..., Y, X)，前导维逐片独立；metrics=None 时为格点单位
+    返回：trough_mask, lap
+    """
+    z = np.asarray(z, dtype=np.float64)
+    lead = z.ndim - 2
+    z = gaussian_filter(z, np.multiply((0,) * lead + (1, 1), smooth_sigma))
+
+    if metrics is None:
+        lap = np.gradient(np.gradient(z, axis=-1), axis=-1) + np.gradient(np.gradient(z, axis=-2), axis=-2)
+    else:
+        lap = laplacian(z, metrics)
+
+    thr = np.nanpercentile(lap.reshape(z.shape[:-2] + (-1,)), trough_percentile, axis=-1)[..., None, None]
+    return (lap >= thr) & (lap > 0), lap
+
+
+# =========================================================
+# 2. 读取等压面场（不依赖 wrf-python）
+# =========================================================
+def read_isobaric_fields(wrf_file: str, level: float = 500.0) -> Tuple[List[datetime], Dict[str, np.ndarray]]:
+    """
+    一个文件内全部时次的 z / u / v / t 插值到 level (hPa)，再加海平面气压 slp，
+    返回 (times, {name: (t, Y, X)})
+
+    与 wrf.interplevel 一样在 p 上线性插值；u / v 为跳点平均到质量点的网格风（同 ua / va），
+    z 为位势高度（m），t 为气温（°C），slp 与 getvar("slp") 同算法（hPa）
+    """
+    with Dataset(wrf_file) as nc:
+        times = file_times(nc, wrf_file)
+        var = nc.variables
+        p_hpa = (np.asarray(var["P"][:], dtype=np.float64) + var["PB"][:]) / 100.0
+        tk = (np.asarray(var["T"][:], dtype=np.float64) + 300.0) * (p_hpa / 1000.0) ** KAPPA
+        ph = (np.asarray(var["PH"][:], dtype=np.float64) + var["PHB"][:]) / G
+        u = np.asarray(var["U"][:], dtype=np.float64)
+        v = np.asarray(var["V"][:], dtype=np.float64)
+        qv = np.asarray(var["QVAPOR"][:], dtype=np.float64)
+
+    columns = {
+        "z": 0.5 * (ph[:, :-1] + ph[:, 1:]),
+        "u": 0.5 * (u[..., :-1] + u[..., 1:]),
+        "v": 0.5 * (v[..., :-1, :] + v[..., 1:, :]),
+        "t": tk - ZERO_DEGC,
+    }
+    fields = {name: interp_to_pressure(columns[name], p_hpa, level, axis=-3, log=False)
+              for name in SYNOPTIC_FIELDS}
+    fields["slp"] = sea_level_pressure(p_hpa, tk, qv, columns["z"], axis=-3)
+    return times, fields
+
+
+def _read_chunk(files: Sequence[str], level: float):
+    times, parts = [], {name: [] for name in READ_FIELDS}
+    for f in files:
+        t, fields = read_isobaric_fields(f, level)
+        times.extend(t)
+        for name in READ_FIELDS:
+            parts[name].append(fields[name])
+    return times, {name: np.concatenate(arrs, axis=0) for name, arrs in parts.items()}
+
+
+def iter_isobaric_stacks(files: Sequence[str], level: float = 500.0, files_per_block: int = 24,
+                         workers: int = 1):
+    """
+    按时间顺序逐块产出 (times, {name: (T, Y, X)})；每块 files_per_block 个文件，
+    workers > 1 时块内文件分给多个进程读取
+    """
+    files = list(files)
+    workers = resolve_workers(workers)
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    try:
+        for b in range(0, len(files), files_per_block):
+            block = files[b:b + files_per_block]
+            if pool is None:
+                yield _read_chunk(block, level)
+                continue
+            times, parts = [], {name: [] for name in READ_FIELDS}
+            chunks = split_files(block, workers)
+            for t, fields in pool.map(_read_chunk, chunks, [level] * len(chunks)):
+                times.extend(t)
+                for name in READ_FIELDS:
+                    parts[name].append(fields[name])
+            yield times, {name: np.concatenate(arrs, axis=0) for name, arrs in parts.items()}
+    finally:
+        if pool is not None:
+            pool.shutdown()
+
+
+# =========================================================
+# 3. 批量处理与输出
+# =========================================================
+class SynopticStore:
+    """
+    Time 为无限维，逐块追加；等压面场与运动学量 f4 压缩，掩码 int8
+    """
+
+    time_units = "hours since 1970-01-01 00:00:00"
+
+    def __init__(self, nc: Dataset):
+        self.nc = nc
+
+    @classmethod
+    def create(cls, path: str, lat, lon, level: float, params: dict,
+               metrics: Optional[GridMetrics] = None) -> "SynopticStore":
+        nc = Dataset(path, "w")
+        ny, nx = np.shape(lat)
+        nc.createDimension("Time", None)
+        nc.createDimension("south_north", ny)
+        nc.createDimension("west_east", nx)
+        nc.description = f"{level:g} hPa 等压面场、海平面气压、运动学量与风切变线掩码（逐时次）"
+        nc.level_hpa = float(level)
+        for key, value in params.items():
+            nc.setncattr(key, value)
+
+        dims = ("south_north", "west_east")
+        nc.createVariable("XLAT", "f4", dims, zlib=True)[:] = lat
+        nc.createVariable("XLONG", "f4", dims, zlib=True)[:] = lon
+        if metrics is not None:
+            # 后续的面积、距离和运动学计算要用
+            nc.DX, nc.DY = metrics.dx, metrics.dy
+            nc.createVariable("MAPFAC_M", "f4", dims, zlib=True)[:] = metrics.msfm
+            if metrics.f is not None:
+                nc.createVariable("F", "f4", dims, zlib=True)[:] = metrics.f
+        tv = nc.createVariable("time", "f8", ("Time",))
+        tv.units = cls.time_units
+
+        for name in READ_FIELDS + KINEMATIC_FIELDS + MASK_FIELDS:
+            is_mask = name in MASK_FIELDS
+            v = nc.createVariable(name, "i1" if is_mask else "f4", ("Time",) + dims, zlib=True,
+                                  chunksizes=(1, ny, nx),
+                                  fill_value=None if is_mask else np.float32(np.nan))
+            v.units, v.long_name = FIELD_ATTRS[name]
+        return cls(nc)
+
+    def append(self, times: Sequence[datetime], fields: Dict[str, np.ndarray]):
+        n0 = len(self.nc.dimensions["Time"])
+        n1 = n0 + len(times)
+        self.nc.variables["time"][n0:n1] = date2num(list(times), self.time_units)
+        for name, arr in fields.items():
+            self.nc.variables[name][n0:n1] = arr.astype(np.int8) if name in MASK_FIELDS else arr
+
+    def close(self):
+        self.nc.close()
+
+
+def run_synoptic_batch(files: Sequence[str], out_nc: str, level: float = 500.0,
+                       smooth_sigma=1.2, shear_percentile=88, conv_percentile=35,
+                       files_per_block: int = 24, workers: int = 1, verbose: bool = True) -> int:
+    """
+    整个模拟一次调用：逐块读等压面场、整块求切变线，追加写入 out_nc
+
+    平滑、梯度和阈值都只在水平面内，分块与否结果相同；
+    files_per_block 只决定内存占用（块内 T 个时次同时在内存里）。
+    辐散 / 形变按第一个文件的 DX / DY 和地图系数求（wrf_kinematics）。
+    返回写入的时次数
+    """
+    files = list(files)
+    if len(files) == 0:
+        raise FileNotFoundError("[run_synoptic_batch] 文件列表为空。")
+
+    with Dataset(files[0]) as nc:
+        lat = np.asarray(nc.variables["XLAT"][0])
+        lon = np.asarray(nc.variables["XLONG"][0])
+        metrics = read_grid_metrics(nc)
+
+    params = dict(smooth_sigma=smooth_sigma, shear_percentile=shear_percentile,
+                  conv_percentile=conv_percentile)
+    store = SynopticStore.create(out_nc, lat, lon, level, params, metrics)
+    n_steps = 0
+    t0 = time.perf_counter()
+    try:
+        for times, fields in iter_isobaric_stacks(files, level, files_per_block, workers):
+            mask, edge, div, deform = shear_line_masks(fields["u"], fields["v"], metrics=metrics, **params)
+            fields.update(div=div, deform=deform, shear_mask=mask, shear_edge=edge)
+            store.append(times, fields)
+            n_steps += len(times)
+            if verbose:
+                print(f"[run_synoptic_batch] {times[0]:%Y-%m-%d %H} ~ {times[-1]:%Y-%m-%d %H}，"
+                      f"累计 {n_steps} 个时次，用时 {time.perf_counter() - t0:.1f} s")
+    finally:
+        store.close()
+
+    if verbose:
+        print(f"[run_synoptic_batch] 已保存: {out_nc}")
+    return n_steps
+
+
+def read_synoptic_store(path: str, names: Optional[Sequence[str]] = None,
+                        time_slice: slice = slice(None)) -> Tuple[List[datetime], Dict[str, np.ndarray], dict]:
+    """
+    读回 run_synoptic_batch 的输出：(times, {name: (T, Y, X)}, 全局属性)
+    names=None 读全部场，XLAT / XLONG 总是带上
+    """
+    with Dataset(path) as nc:
+        tv = nc.variables["time"]
+        times = [datetime(d.year, d.month, d.day, d.hour, d.minute, d.second)
+                 for d in num2date(tv[time_slice], tv.units)]
+        if names is None:
+            names = [n for n in READ_FIELDS + KINEMATIC_FIELDS + MASK_FIELDS if n in nc.variables]
+        fields = {"XLAT": np.asarray(nc.variables["XLAT"][:]),
+                  "XLONG": np.asarray(nc.variables["XLONG"][:])}
+        for name in names:
+            arr = np.asarray(np.ma.filled(nc.variables[name][time_slice], np.nan))
+            fields[name] = arr.astype(bool) if name in MASK_FIELDS else arr
+        attrs = {k: nc.getncattr(k) for k in nc.ncattrs()}
+    return times, fields, attrs
+
+
+def read_store_metrics(path: str) -> Optional[GridMetrics]:
+    """
+    输出文件里的网格度量（只有质量点地图系数）；没有写度量的旧文件返回 None
+    """
+    with Dataset(path) as nc:
+        if "MAPFAC_M" not in nc.variables or "DX" not in nc.ncattrs():
+            return None
+        f = np.asarray(nc.variables["F"][:], dtype=np.float64) if "F" in nc.variables else None
+        return GridMetrics(float(nc.DX), float(nc.DY),
+                           np.asarray(nc.variables["MAPFAC_M"][:], dtype=np.float64), f=f)
@@ -0,0 +1,220 @@
+# -*- coding: utf-8 -*-
+"""
+逐气柱物理量的分块并行执行器
+
+SI、CAPE/CIN 这类逐气柱算法即使向量化了，在大嵌套区域上也只用得到一个核。
+气柱之间互不相关，所以把 (south_north, west_east) 平面切成若干块（tile），
+每块交给进程池里的一个进程算，最后拼回整张网格：
+
+- 输入数组先复制进 multiprocessing.shared_memory（每个数组只复制一次），
+  子进程按名字挂接后直接切片视图，不再逐块 pickle 大数组
+- 输出也放在共享内存里，子进程把自己那块结果原地写回，主进程不需要收集/拼接
+- 第一块在主进程里算，顺便确定输出的名字、形状和 dtype
+
+约定：
+- 参与分块的数组最后两维必须是 (south_north, west_east)，前面的维度（时间、垂直层）原样保留；
+  hgt 这类二维场同样参与分块
+- 核函数 func(**inputs, **kwargs) 返回一个数组或 {名字: 数组} 字典，
+  结果最后两维同样是 (块的 ny, 块的 nx)
+- func 必须是模块级函数（子进程要能按名字 import），kwargs 在每个子进程启动时只 pickle 一次
+
+用法：
+    from wrf_tiling import run_tiled
+    si = run_tiled(showalter_index, {"p_hpa": p, "t_c": t, "td_c": td},
+                   workers=8, axis=0, log_interp=False, table=table)
+    res = run_tiled(convective_indices, {"p_hpa": p, "t_c": tc, "qv": qv, "z": z, "hgt": hgt},
+                    workers=8, axis=1, table=table)
+"""
+
+import time
+from concurrent.futures import ProcessPoolExecutor
+from multiprocessing import shared_memory
+from typing import Callable, Dict, List, Optional, Tuple, Union
+
+import numpy as np
+
+from wrf_mapreduce import resolve_workers
+
+
+Tile = Tuple[int, int, int, int]          # (j0, j1, i0, i1)
+ArrayOrDict = Union[np.ndarray, Dict[str, np.ndarray]]
+
+
+# =========================================================
+# 1. 共享内存数组
+# =========================================================
+class SharedArray:
+    """
+    一块 SharedMemory 加上 (shape, dtype)，spec 可以 pickle 传给子进程再 attach
+    """
+
+    def __init__(self, shm: shared_memory.SharedMemory, shape, dtype):
+        self.shm = shm
+        self.shape = tuple(shape)
+        self.dtype = np.dtype(dtype)
+        self.array = np.ndarray(self.shape, dtype=self.dtype, buffer=shm.buf)
+
+    @classmethod
+    def empty(cls, shape, dtype) -> "SharedArray":
+        nbytes = max(1, int(np.prod(shape)) * np.dtype(dtype).itemsize)
+        return cls(shared_memory.SharedMemory(create=True, size=nbytes), shape, dtype)
+
+    @classmethod
+    def copy_of(cls, arr) -> "SharedArray":
+        arr = np.asarray(arr)
+        out = cls.empty(arr.shape, arr.dtype)
+        out.array[...] = arr
+        return out
+
+    @property
+    def spec(self) -> Tuple[str, tuple, str]:
+        return self.shm.name, self.shape, self.dtype.str
+
+    @classmethod
+    def attach(cls, spec) -> "SharedArray":
+        name, shape, dtype = spec
+        return cls(shared_memory.SharedMemory(name=name), shape, dtype)
+
+    def close(self):
+        # 先释放 ndarray 对缓冲区的引用，否则 close 会报 BufferError
+        self.array = None
+        self.shm.close()
+
+    def unlink(self):
+        self.shm.unlink()
+
+
+# =========================================================
+# 2. 分块方案
+# =========================================================
+def plan_tiles(ny: int, nx: int,
+               n_tiles: Optional[int] = None,
+               tile_shape: Optional[Tuple[int, int]] = None) -> List[Tile]:
+    """
+    tile_shape 给定时按 (ty, tx) 规则切块；
+    否则切成约 n_tiles 个整行条带（行方向内存连续），行数不够时再切列
+    """
+    if tile_shape is None:
+        n_tiles = max(1, int(n_tiles or 1))
+        n_y = min(ny, n_tiles)
+        n_x = min(nx, -(-n_tiles // n_y))
+        ty, tx = -(-ny // n_y), -(-nx // n_x)
+    else:
+        ty, tx = (max(1, int(s)) for s in tile_shape)
+
+    return [(j0, min(j0 + ty, ny), i0, min(i0 + tx, nx))
+            for j0 in range(0, ny, ty)
+            for i0 in range(0, nx, tx)]
+
+
+def _tile_view(arr: np.ndarray, tile: Tile) -> np.ndarray:
+    j0, j1, i0, i1 = tile
+    return arr[..., j0:j1, i0:i1]
+
+
+def _as_dict(result) -> Dict[str, np.ndarray]:
+    if isinstance(result, dict):
+        return result
+    return {None: result}
+
+
+# =========================================================
+# 3. 子进程
+# =========================================================
+_WORKER: Dict[str, object] = {}
+
+
+def _init_worker(func, kwargs, input_specs, output_specs):
+    """
+    每个子进程只执行一次：挂接全部共享数组，记下核函数和参数
+    """
+    shared = {}
+    for group, specs in (("inputs", input_specs), ("outputs", output_specs)):
+        shared[group] = {name: SharedArray.attach(spec) for name, spec in specs.items()}
+
+    _WORKER.update(func=func, kwargs=kwargs, shared=shared)
+
+
+def _run_tile(tile: Tile) -> Tile:
+    shared = _WORKER["shared"]
+    inputs = {name: _tile_view(sa.array, tile) for name, sa in shared["inputs"].items()}
+
+    result = _as_dict(_WORKER["func"](**inputs, **_WORKER["kwargs"]))
+    for name, arr in result.items():
+        _tile_view(shared["outputs"][name].array, tile)[...] = arr
+    return tile
+
+
+# =========================================================
+# 4. 驱动
+# =========================================================
+def run_tiled(func: Callable[..., ArrayOrDict],
+              inputs: Dict[str, np.ndarray],
+              workers: int = 1,
+              tiles_per_worker: int = 4,
+              tile_shape: Optional[Tuple[int, int]] = None,
+              verbose: bool = True,
+              **kwargs) -> ArrayOrDict:
+    """
+    func            : 模块级的逐气柱函数，func(**inputs, **kwargs) -> 数组 或 {名字: 数组}
+    inputs          : {参数名: 数组}，最后两维都是 (ny, nx)
+    workers         : 进程数；1 表示在当前进程整块直接算（不切块）
+    tiles_per_worker: 每个进程分到的块数，块多一些可以平衡山区 / 海上气柱的计算量差异
+    tile_shape      : 指定 (ty, tx) 块大小，覆盖 tiles_per_worker
+    kwargs          : 原样传给 func 的其它参数（如 axis、table）
+
+    返回与 func 相同结构的整网格结果
+    """
+    if len(inputs) == 0:
+        raise ValueError("[run_tiled] inputs 为空。")
+
+    inputs = {name: np.asarray(arr) for name, arr in inputs.items()}
+    ny, nx = next(iter(inputs.values())).shape[-2:]
+    for name, arr in inputs.items():
+        if arr.ndim < 2 or arr.shape[-2:] != (ny, nx):
+            raise ValueError(f"[run_tiled] {name} 的最后两维 {arr.shape[-2:]} 与 ({ny}, {nx}) 不一致。")
+
+    workers = resolve_workers(workers)
+    tiles = plan_tiles(ny, nx, workers * max(1, tiles_per_worker), tile_shape)
+
+    if workers == 1 or len(tiles) == 1:
+        return func(**inputs, **kwargs)
+
+    t0 = time.perf_counter()
+    if verbose:
+        print(f"[run_tiled] {ny}x{nx} 网格，{len(tiles)} 块，{workers} 个进程")
+
+    shared_in: Dict[str, SharedArray] = {}
+    shared_out: Dict[str, SharedArray] = {}
+    try:
+        for name, arr in inputs.items():
+            shared_in[name] = SharedArray.copy_of(arr)
+
+        # 第一块在主进程算，确定输出结构
+        first = _as_dict(func(**{name: _tile_view(sa.array, tiles[0]) for name, sa in shared_in.items()},
+                              **kwargs))
+        for name, arr in first.items():
+            arr = np.asarray(arr)
+            shared_out[name] = SharedArray.empty(arr.shape[:-2] + (ny, nx), arr.dtype)
+            _tile_view(shared_out[name].array, tiles[0])[...] = arr
+
+        init_args = (func, kwargs,
+                     {name: sa.spec for name, sa in shared_in.items()},
+                     {name: sa.spec for name, sa in shared_out.items()})
+
+        with ProcessPoolExecutor(max_workers=workers, initializer=_init_worker,
+                                 initargs=init_args) as pool:
+            for _ in pool.map(_run_tile, tiles[1:]):
+                pass
+
+        result = {name: sa.array.copy() for name, sa in shared_out.items()}
+
+    finally:
+        for sa in list(shared_in.values()) + list(shared_out.values()):
+            sa.close()
+            sa.unlink()
+
+    if verbose:
+        print(f"[run_tiled] 完成，用时 {time.perf_counter() - t0:.2f} s")
+
+    return result[None] if list(result) == [None] else result
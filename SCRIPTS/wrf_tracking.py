@@ -0,0 +1,417 @@
+# -*- coding: utf-8 -*-
+"""
+天气系统目标的标记与跨时次跟踪
+
+- label_objects    : (T, Y, X) 布尔掩码整块做连通区域标记（只在水平面内连通，时次之间不连），
+                     用 bincount 一次求出全部目标的面积、质心、取向和长短轴
+- overlap_pairs    : 相邻时次目标的重叠像元数，整块一次求出
+- detect_extrema   : (T, Y, X) 场整块求局地极小 / 极大（ndimage 极值滤波 + 突出度阈值），
+                     用于位势高度低 / 高中心和海平面气压低中心
+- link_objects     : 先按重叠、再按质心距离（cKDTree 空间索引）做相邻时次一对一匹配，得到轨迹号
+- write_track_table: 每个目标一行的 CSV 轨迹表
+
+整个过程没有逐时次 / 逐格点的 Python 循环，只有匹配时对候选对的一次遍历，
+一个月 3 小时一次的输出几秒内完成。
+
+表格统一为 {列名: 一维数组} 的字典，每行一个目标（或一个中心点）。
+
+用法：
+    from wrf_tracking import label_objects, overlap_pairs, link_objects, write_track_table
+    labels, objs = label_objects(shear_mask, min_cells=4, cell_area=area, lat=lat, lon=lon)
+    pairs = overlap_pairs(labels, objs)
+    objs["track_id"], objs["parent"] = link_objects(objs, max_dist=500.0, pairs=pairs)
+"""
+
+import csv
+from datetime import datetime
+from typing import Dict, Optional, Sequence, Tuple
+
+import numpy as np
+from scipy.ndimage import generate_binary_structure, label, minimum_filter, uniform_filter
+from scipy.spatial import cKDTree
+
+
+Table = Dict[str, np.ndarray]
+
+TIME_FORMAT = "%Y-%m-%d_%H:%M:%S"
+
+
+# =========================================================
+# 1. 连通区域标记与属性
+# =========================================================
+def label_objects(masks, min_cells: int = 1, connectivity: int = 2,
+                  cell_area=None, dx: float = 1.0, dy: float = 1.0,
+                  lat=None, lon=None) -> Tuple[np.ndarray, Table]:
+    """
+    masks        : (T, Y, X) 布尔数组
+    min_cells    : 少于该格点数的目标丢弃
+    connectivity : 1 为四邻域，2 为八邻域（细长的切变线用八邻域）
+    cell_area    : (Y, X) 每个格点的真实面积（km²），None 时面积按格点数
+    dx / dy      : 质心 / 长短轴换算成距离时的网格距（km），默认格点单位
+    lat / lon    : (Y, X)，给了就输出质心经纬度
+
+    返回 labels (T, Y, X) int32（0 为背景，目标号从 1 起、按时次递增），
+    以及目标表（第 k 行对应目标号 k+1）：
+        obj_id（= 目标号 - 1，轨迹表里 parent 指向它）, step, cells, area,
+        y, x（网格距离单位的质心）, j, i（质心下标）,
+        orientation（长轴与网格 x 轴夹角，度，逆时针为正）, major, minor（长短轴长度）,
+        lat, lon
+    """
+    masks = np.asarray(masks, dtype=bool)
+    if masks.ndim != 3:
+        raise ValueError(f"[label_objects] masks 应为 (T, Y, X)，实际 {masks.shape}")
+    # 时间方向不连通：结构元只有中间一片
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = generate_binary_structure(2, connectivity)
+    labels, n = label(masks, structure=structure)
+    labels = labels.astype(np.int32, copy=False)
+
+    flat = labels.ravel()
+    cells = np.bincount(flat, minlength=n + 1)
+
+    # 去掉小目标，其余重新编号（保持时间顺序）
+    keep = cells >= max(1, int(min_cells))
+    keep[0] = False
+    if not keep[1:].all():
+        remap = np.zeros(n + 1, dtype=np.int32)
+        remap[keep] = np.arange(1, keep.sum() + 1, dtype=np.int32)
+        labels = remap[labels]
+        flat = labels.ravel()
+        n = int(keep.sum())
+        cells = np.bincount(flat, minlength=n + 1)
+
+    if n == 0:
+        empty = np.zeros(0)
+        cols = ["obj_id", "step", "cells", "area", "y", "x", "j", "i", "orientation", "major", "minor"]
+        if lat is not None and lon is not None:
+            cols += ["lat", "lon"]
+        return labels, {c: empty.astype(np.int64 if c in ("obj_id", "step", "cells") else np.float64) for c in cols}
+
+    sel = flat > 0
+    lab = flat[sel]
+    tt, jj, ii = np.unravel_index(np.flatnonzero(sel), masks.shape)
+
+    def total(weights):
+        return np.bincount(lab, weights=weights, minlength=n + 1)[1:]
+
+    count = cells[1:].astype(np.float64)
+    step = (total(tt) / count).round().astype(np.int64)
+    j_mean = total(jj) / count
+    i_mean = total(ii) / count
+
+    # 二阶中心矩（以网格距离计），给取向和长短轴
+    y = jj * dy
+    x = ii * dx
+    y_mean, x_mean = j_mean * dy, i_mean * dx
+    mu_xx = total(x * x) / count - x_mean ** 2
+    mu_yy = total(y * y) / count - y_mean ** 2
+    mu_xy = total(x * y) / count - x_mean * y_mean
+    # 单个格点的矩加上 1/12 个格距²，与连续面积的二阶矩一致
+    mu_xx += dx * dx / 12.0
+    mu_yy += dy * dy / 12.0
+    half_diff = 0.5 * (mu_xx - mu_yy)
+    root = np.sqrt(half_diff ** 2 + mu_xy ** 2)
+    lam1 = 0.5 * (mu_xx + mu_yy) + root
+    lam2 = np.maximum(0.5 * (mu_xx + mu_yy) - root, 0.0)
+
+    table = {
+        "obj_id": np.arange(n, dtype=np.int64),
+        "step": step,
+        "cells": cells[1:].astype(np.int64),
+        "area": count if cell_area is None else total(np.asarray(cell_area, dtype=np.float64)[jj, ii]),
+        "y": y_mean,
+        "x": x_mean,
+        "j": j_mean,
+        "i": i_mean,
+        "orientation": np.degrees(0.5 * np.arctan2(2.0 * mu_xy, mu_xx - mu_yy)),
+        "major": 4.0 * np.sqrt(lam1),
+        "minor": 4.0 * np.sqrt(lam2),
+    }
+    if lat is not None and lon is not None:
+        table["lat"] = total(np.asarray(lat, dtype=np.float64)[jj, ii]) / count
+        table["lon"] = total(np.asarray(lon, dtype=np.float64)[jj, ii]) / count
+    return labels, table
+
+
+def overlap_pairs(labels, table: Table) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    相邻时次（t, t+1）在同一格点上都有目标的 (源目标, 目标, 重叠比例)，目标下标从 0 起；
+    重叠比例 = 重叠格点数 / 两者中较小目标的格点数
+    """
+    labels = np.asarray(labels)
+    n = len(table["cells"])
+    if labels.shape[0] < 2 or n == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+
+    a = labels[:-1].ravel()
+    b = labels[1:].ravel()
+    both = (a > 0) & (b > 0)
+    code = a[both].astype(np.int64) * (n + 1) + b[both]
+    uniq, count = np.unique(code, return_counts=True)
+    src, dst = np.divmod(uniq, n + 1)
+    src, dst = src - 1, dst - 1
+    cells = table["cells"]
+    return src, dst, count / np.minimum(cells[src], cells[dst])
+
+
+# =========================================================
+# 2. 极值中心
+# =========================================================
+def detect_extrema(field, kind: str = "min", size: int = 9, prominence_size: int = 21,
+                   min_prominence: float = 0.0, edge: Optional[int] = None,
+                   dx: float = 1.0, dy: float = 1.0, lat=None, lon=None) -> Table:
+    """
+    field           : (T, Y, X)，如 z500（m）、slp（hPa）
+    kind            : "min"（低压 / 低中心）或 "max"（高压 / 高中心）
+    size            : 极值邻域边长（格点），中心在 size × size 窗口内最低（最高）才算
+    prominence_size : 突出度窗口边长（格点）；突出度 = 窗口平均 − 中心值（极大时反号）
+    min_prominence  : 突出度阈值（与 field 同单位），去掉平坦场里的弱扰动
+    edge            : 离边界不足 edge 格的点不要（默认 size // 2，边界上的“极值”多是截断造成的）
+    dx / dy         : y / x 列的网格距（km），默认格点单位
+
+    邻域和突出度只在水平面内（滤波窗口时间维为 1），所有时次一次算完；
+    相邻格点数值相等的平台只保留一个点。
+    返回中心点表：obj_id, step, j, i, y, x, value, prominence（, lat, lon）
+    """
+    if kind not in ("min", "max"):
+        raise ValueError(f"[detect_extrema] kind 只能是 min / max: {kind}")
+    f = np.asarray(np.ma.filled(field, np.nan), dtype=np.float64)
+    if f.ndim != 3:
+        raise ValueError(f"[detect_extrema] field 应为 (T, Y, X)，实际 {f.shape}")
+    nt, ny, nx = f.shape
+    edge = size // 2 if edge is None else int(edge)
+
+    # 统一成找极小；NaN 处在极值判断里为 +inf，在平均里用该时次的均值
+    g = f if kind == "min" else -f
+    finite = np.isfinite(g)
+    g_inf = np.where(finite, g, np.inf)
+    with np.errstate(invalid="ignore"):
+        g_mean = np.where(finite, g, np.nanmean(g, axis=(1, 2), keepdims=True))
+
+    is_min = minimum_filter(g_inf, size=(1, size, size), mode="nearest") == g_inf
+    prominence = uniform_filter(g_mean, size=(1, prominence_size, prominence_size), mode="nearest") - g_mean
+    cand = is_min & finite & (prominence >= min_prominence)
+    if edge > 0:
+        cand[:, :edge, :] = False
+        cand[:, ny - edge:, :] = False
+        cand[:, :, :edge] = False
+        cand[:, :, nx - edge:] = False
+
+    # 平台去重：候选点在水平面内连通的只留第一个
+    structure = np.zeros((3, 3, 3), dtype=bool)
+    structure[1] = generate_binary_structure(2, 2)
+    lab, _ = label(cand, structure=structure)
+    flat = lab.ravel()
+    idx = np.flatnonzero(flat)
+    _, first = np.unique(flat[idx], return_index=True)
+    idx = idx[first]
+    tt, jj, ii = np.unravel_index(idx, f.shape)
+
+    table = {
+        "obj_id": np.arange(len(idx), dtype=np.int64),
+        "step": tt.astype(np.int64),
+        "j": jj.astype(np.float64),
+        "i": ii.astype(np.float64),
+        "y": jj * float(dy),
+        "x": ii * float(dx),
+        "value": f.ravel()[idx],
+        "prominence": prominence.ravel()[idx],
+    }
+    if lat is not None and lon is not None:
+        table["lat"] = np.asarray(lat, dtype=np.float64)[jj, ii]
+        table["lon"] = np.asarray(lon, dtype=np.float64)[jj, ii]
+    return table
+
+
+# =========================================================
+# 3. 跨时次关联
+# =========================================================
+def distance_pairs(step, y, x, max_dist: float, max_gap: int = 1) -> Tuple[np.ndarray, np.ndarray, np.ndarray]:
+    """
+    时次差 1..max_gap、质心距离不超过 max_dist 的全部 (源, 目标, 距离)，源在前
+
+    所有点放进一棵 cKDTree：第三个坐标为 时次 × 大常数（大于 max_dist），
+    把源点的时间坐标平移 g 个时次后做一次半径查询，只会命中 t+g 时次的点
+    """
+    step = np.asarray(step, dtype=np.int64)
+    pts = np.column_stack([np.asarray(y, dtype=np.float64), np.asarray(x, dtype=np.float64)])
+    if len(step) == 0:
+        empty = np.zeros(0, dtype=np.int64)
+        return empty, empty, np.zeros(0)
+
+    big = 4.0 * max_dist + 1.0
+    tree = cKDTree(np.column_stack([pts, step * big]))
+
+    srcs, dsts, dists = [], [], []
+    for gap in range(1, max(1, int(max_gap)) + 1):
+        query = cKDTree(np.column_stack([pts, (step + gap) * big]))
+        sdm = query.sparse_distance_matrix(tree, max_dist, output_type="ndarray")
+        srcs.append(sdm["i"].astype(np.int64))
+        dsts.append(sdm["j"].astype(np.int64))
+        dists.append(sdm["v"])
+    return np.concatenate(srcs), np.concatenate(dsts), np.concatenate(dists)
+
+
+def link_objects(table: Table, max_dist: float,
+                 pairs: Optional[Tuple[np.ndarray, np.ndarray, np.ndarray]] = None,
+                 min_overlap: float = 0.1, max_gap: int = 1) -> Tuple[np.ndarray, np.ndarray]:
+    """
+    相邻时次一对一匹配，返回 (track_id, parent)：
+    parent 为上一时次同一轨迹的目标下标（即 obj_id，起点为 -1），track_id 从 0 起按起点时间编号
+
+    匹配顺序：重叠比例 >= min_overlap 的候选按重叠比例从大到小优先，
+    其余按质心距离（table["y"], table["x"]，单位同 max_dist）从近到远；
+    每个目标最多接一个前驱、一个后继，分裂 / 合并时只有最匹配的一支延续，其余另起轨迹。
+    max_gap > 1 时允许中间漏掉 max_gap-1 个时次（目标短暂消失）
+    """
+    step = np.asarray(table["step"], dtype=np.int64)
+    n = len(step)
+    parent = np.full(n, -1, dtype=np.int64)
+    if n == 0:
+        return np.zeros(0, dtype=np.int64), parent
+
+    cand_src, cand_dst, cand_key = [], [], []
+    if pairs is not None:
+        src, dst, frac = pairs
+        ok = frac >= min_overlap
+        cand_src.append(src[ok])
+        cand_dst.append(dst[ok])
+        cand_key.append(-1.0 - frac[ok])          # 重叠候选排在最前面
+    src, dst, dist = distance_pairs(step, table["y"], table["x"], max_dist, max_gap)
+    gap = step[dst] - step[src]
+    cand_src.append(src)
+    cand_dst.append(dst)
+    cand_key.append(gap * (max_dist + 1.0) + dist)  # 先近时次，再近距离
+
+    src = np.concatenate(cand_src)
+    dst = np.concatenate(cand_dst)
+    order = np.argsort(np.concatenate(cand_key), kind="stable")
+
+    has_child = np.zeros(n, dtype=bool)
+    for s, d in zip(src[order].tolist(), dst[order].tolist()):
+        if parent[d] < 0 and not has_child[s]:
+            parent[d] = s
+            has_child[s] = True
+
+    # 目标按时次排好（label_objects 的编号即如此），前驱总在前面
+    order = np.argsort(step, kind="stable")
+    track_id = np.full(n, -1, dtype=np.int64)
+    next_id = 0
+    for k in order.tolist():
+        p = parent[k]
+        if p >= 0:
+            track_id[k] = track_id[p]
+        else:
+            track_id[k] = next_id
+            next_id += 1
+    return track_id, parent
+
+
+def track_summary(table: Table, times: Optional[Sequence[datetime]] = None) -> Table:
+    """
+    每条轨迹一行：track_id, n_steps, first_step, last_step, path_length
+    （path_length 为相邻质心距离之和，单位同 y / x），
+    有 area 列时加 mean_area / max_area，有 value 列时加 min_value / max_value；
+    给了 times 时附加起止时间
+    """
+    tid = np.asarray(table["track_id"], dtype=np.int64)
+    if len(tid) == 0:
+        return {"track_id": np.zeros(0, dtype=np.int64)}
+    n_tracks = int(tid.max()) + 1
+    step = np.asarray(table["step"], dtype=np.int64)
+    count = np.bincount(tid, minlength=n_tracks)
+
+    first = np.full(n_tracks, np.iinfo(np.int64).max)
+    last = np.full(n_tracks, -1, dtype=np.int64)
+    np.minimum.at(first, tid, step)
+    np.maximum.at(last, tid, step)
+
+    parent = np.asarray(table["parent"], dtype=np.int64)
+    has_parent = parent >= 0
+    seg = np.zeros(len(tid))
+    seg[has_parent] = np.hypot(table["y"][has_parent] - table["y"][parent[has_parent]],
+                               table["x"][has_parent] - table["x"][parent[has_parent]])
+
+    out = {
+        "track_id": np.arange(n_tracks),
+        "n_steps": count,
+        "first_step": first,
+        "last_step": last,
+        "path_length": np.bincount(tid, weights=seg, minlength=n_tracks),
+    }
+    if "area" in table:
+        out["mean_area"] = np.bincount(tid, weights=table["area"], minlength=n_tracks) / count
+        max_area = np.zeros(n_tracks)
+        np.maximum.at(max_area, tid, table["area"])
+        out["max_area"] = max_area
+    if "value" in table:
+        lo = np.full(n_tracks, np.inf)
+        hi = np.full(n_tracks, -np.inf)
+        np.minimum.at(lo, tid, table["value"])
+        np.maximum.at(hi, tid, table["value"])
+        out["min_value"], out["max_value"] = lo, hi
+    if times is not None:
+        out["first_time"] = np.array([times[k].strftime(TIME_FORMAT) for k in first])
+        out["last_time"] = np.array([times[k].strftime(TIME_FORMAT) for k in last])
+    return out
+
+
+# =========================================================
+# 4. 轨迹表
+# =========================================================
+def sort_by_track(table: Table) -> Table:
+    """
+    按 (track_id, step) 排序，同一条轨迹的行连在一起
+    """
+    order = np.lexsort((table["step"], table["track_id"]))
+    return {name: np.asarray(col)[order] for name, col in table.items()}
+
+
+def write_track_table(path: str, table: Table, times: Optional[Sequence[datetime]] = None,
+                      columns: Optional[Sequence[str]] = None, precision: int = 4):
+    """
+    CSV 轨迹表，每行一个目标；给了 times 时在 step 后加一列 time
+    """
+    columns = list(columns or table.keys())
+    n = len(table[columns[0]]) if columns else 0
+    header = list(columns)
+    cols = [np.asarray(table[c]) for c in columns]
+    if times is not None and "step" in columns:
+        k = columns.index("step") + 1
+        header.insert(k, "time")
+        cols.insert(k, np.array([times[s].strftime(TIME_FORMAT) for s in table["step"]]))
+
+    def fmt(col):
+        if np.issubdtype(col.dtype, np.floating):
+            return [f"{v:.{precision}f}" if np.isfinite(v) else "" for v in col.tolist()]
+        return [str(v) for v in col.tolist()]
+
+    rows = zip(*[fmt(c) for c in cols]) if n else []
+    with open(path, "w", newline="", encoding="utf-8") as f:
+        writer = csv.writer(f)
+        writer.writerow(header)
+        writer.writerows(rows)
+    print(f"[write_track_table] 已保存: {path}（{n} 行）")
+
+
+def read_track_table(path: str) -> Table:
+    """
+    读回 write_track_table 的 CSV；整数列为 int64，time 列保持字符串，其余为 float64
+    """
+    with open(path, newline="", encoding="utf-8") as f:
+        reader = csv.reader(f)
+        header = next(reader)
+        rows = list(reader)
+    cols = list(zip(*rows)) if rows else [()] * len(header)
+
+    table: Table = {}
+    for name, col in zip(header, cols):
+        if name.endswith("time"):
+            table[name] = np.array(col, dtype=str)
+            continue
+        try:
+            table[name] = np.array([int(v) for v in col], dtype=np.int64)
+        except ValueError:
+            table[name] = np.array([float(v) if v else np.nan for v in col])
+    return table
@@ -0,0 +1,299 @@
+# -*- coding: utf-8 -*-
+"""
+批量检查 wrfout 里有哪些变量（只读文件头）
+
+shells/check_wrf_snow_vars.sh 对每个文件起一个 ncdump -h 进程，再对每个变量 grep 一遍整个文件头，
+几千个文件时非常慢。这里在进程内完成：
+
+- 经典格式（CDF-1 / CDF-2 64 位偏移 / CDF-5，WRF 默认输出）：直接解析文件头，
+  只读开头几十 KB，不经过 netCDF-C 库，纯 Python 读文件时释放 GIL，可以用线程池并发
+- netCDF4 / HDF5 格式：用 netCDF4.Dataset 打开只取变量表（netCDF-C 不是线程安全的，加锁串行）
+- 结果按 (路径, mtime, 文件大小) 缓存到 JSON，缓存里存完整变量表，
+  换一组要检查的变量也不用重扫；目录没变时再检查几乎是瞬时的
+
+用法：
+    from wrf_varscan import scan_files, format_matrix
+    results = scan_files(wrf_files, workers=8)
+    print(format_matrix(results, ["SNOWC", "SNOWH", "SR"]))
+"""
+
+import os
+import json
+import struct
+import threading
+from concurrent.futures import ThreadPoolExecutor
+from typing import Dict, List, NamedTuple, Optional, Sequence, Tuple
+
+
+DEFAULT_CACHE = os.path.join(os.path.expanduser("~"), ".cache", "wrf_varscan.json")
+
+# 经典格式的标签与类型长度
+_NC_DIMENSION = 0x0A
+_NC_VARIABLE = 0x0B
+_NC_ATTRIBUTE = 0x0C
+_TYPE_SIZE = {1: 1, 2: 1, 3: 2, 4: 4, 5: 4, 6: 8, 7: 1, 8: 2, 9: 4, 10: 8, 11: 8}
+
+_NC_LIB_LOCK = threading.Lock()
+
+
+class FileSchema(NamedTuple):
+    """
+    format   : CDF-1 / CDF-2 / CDF-5 / HDF5
+    dims     : {维度名: 长度}（无限维为当前记录数）
+    variables: {变量名: 维度名元组}
+    """
+    format: str
+    dims: Dict[str, int]
+    variables: Dict[str, Tuple[str, ...]]
+
+
+# =========================================================
+# 1. 经典格式文件头解析
+# =========================================================
+class _HeaderReader:
+    """
+    按需从文件开头往后读，文件头多长就读多长
+    """
+
+    def __init__(self, f, block: int = 65536):
+        self.f = f
+        self.block = block
+        self.buf = b""
+        self.pos = 0
+
+    def take(self, n: int) -> bytes:
+        need = self.pos + n - len(self.buf)
+        if need > 0:
+            chunk = self.f.read(max(need, self.block))
+            if len(chunk) < need:
+                raise ValueError("文件头不完整")
+            self.buf += chunk
+        out = self.buf[self.pos:self.pos + n]
+        self.pos += n
+        return out
+
+    def uint32(self) -> int:
+        return struct.unpack(">I", self.take(4))[0]
+
+    def uint64(self) -> int:
+        return struct.unpack(">Q", self.take(8))[0]
+
+
+def read_classic_header(path: str) -> FileSchema:
+    """
+    解析 CDF-1 / CDF-2 / CDF-5 文件头（只取维度和变量名，属性跳过）
+    """
+    with open(path, "rb") as f:
+        r = _HeaderReader(f)
+        magic = r.take(4)
+        if magic[:3] != b"CDF" or magic[3] not in (1, 2, 5):
+            raise ValueError(f"不是经典 netCDF 格式: {path}")
+        version = magic[3]
+        size = r.uint64 if version == 5 else r.uint32     # NON_NEG 长度
+        offset = r.uint64 if version >= 2 else r.uint32   # 变量起始偏移
+
+        def name() -> str:
+            n = size()
+            raw = r.take(n + (-n % 4))
+            return raw[:n].decode("utf-8", errors="replace")
+
+        def skip_attributes():
+            tag, n = r.uint32(), size()
+            if tag not in (0, _NC_ATTRIBUTE):
+                raise ValueError(f"属性表标签错误: {tag}")
+            for _ in range(n):
+                name()
+                nc_type = r.uint32()
+                nbytes = size() * _TYPE_SIZE[nc_type]
+                r.take(nbytes + (-nbytes % 4))
+
+        numrecs = size()
+
+        tag, n_dims = r.uint32(), size()
+        if tag not in (0, _NC_DIMENSION):
+            raise ValueError(f"维度表标签错误: {tag}")
+        dim_names, dims = [], {}
+        for _ in range(n_dims):
+            dname = name()
+            length = size()
+            dim_names.append(dname)
+            dims[dname] = length if length > 0 else numrecs
+
+        skip_attributes()
+
+        tag, n_vars = r.uint32(), size()
+        if tag not in (0, _NC_VARIABLE):
+            raise ValueError(f"变量表标签错误: {tag}")
+        variables = {}
+        for _ in range(n_vars):
+            vname = name()
+            dimids = [size() for _ in range(size())]
+            skip_attributes()
+            r.uint32()      # nc_type
+            size()          # vsize
+            offset()        # begin
+            variables[vname] = tuple(dim_names[k] for k in dimids)
+
+    return FileSchema(f"CDF-{version}", dims, variables)
+
+
+def read_hdf5_header(path: str) -> FileSchema:
+    from netCDF4 import Dataset
+
+    with _NC_LIB_LOCK:
+        with Dataset(path) as nc:
+            dims = {name: len(d) for name, d in nc.dimensions.items()}
+            variables = {name: tuple(v.dimensions) for name, v in nc.variables.items()}
+    return FileSchema("HDF5", dims, variables)
+
+
+def read_schema(path: str) -> FileSchema:
+    with open(path, "rb") as f:
+        magic = f.read(4)
+    if magic[:3] == b"CDF":
+        return read_classic_header(path)
+    if magic == b"\x89HDF":
+        return read_hdf5_header(path)
+    raise ValueError(f"无法识别的文件格式: {path}")
+
+
+# =========================================================
+# 2. mtime 缓存
+# =========================================================
+class SchemaCache:
+    """
+    {绝对路径: {"mtime_ns", "size", "format", "dims", "variables"}}，
+    mtime 或大小变了的条目视为失效
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_CACHE):
+        self.path = path
+        self.entries: Dict[str, dict] = {}
+        self.dirty = False
+        if path and os.path.exists(path):
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    self.entries = json.load(f)
+            except (OSError, ValueError):
+                print(f"[SchemaCache] 缓存损坏，忽略: {path}")
+                self.entries = {}
+
+    @staticmethod
+    def _stamp(path: str) -> Tuple[int, int]:
+        st = os.stat(path)
+        return st.st_mtime_ns, st.st_size
+
+    def get(self, path: str) -> Optional[FileSchema]:
+        entry = self.entries.get(os.path.abspath(path))
+        if entry is None:
+            return None
+        if (entry["mtime_ns"], entry["size"]) != self._stamp(path):
+            return None
+        return FileSchema(entry["format"], entry["dims"],
+                          {k: tuple(v) for k, v in entry["variables"].items()})
+
+    def put(self, path: str, schema: FileSchema):
+        mtime_ns, size = self._stamp(path)
+        self.entries[os.path.abspath(path)] = {
+            "mtime_ns": mtime_ns, "size": size, "format": schema.format,
+            "dims": schema.dims, "variables": {k: list(v) for k, v in schema.variables.items()},
+        }
+        self.dirty = True
+
+    def save(self):
+        if not self.path or not self.dirty:
+            return
+        os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        tmp = self.path + ".tmp"
+        with open(tmp, "w", encoding="utf-8") as f:
+            json.dump(self.entries, f)
+        os.replace(tmp, self.path)
+        self.dirty = False
+
+
+# =========================================================
+# 3. 并发扫描
+# =========================================================
+def scan_files(files: Sequence[str], workers: int = 8, cache: Optional[SchemaCache] = None,
+               verbose: bool = True) -> Dict[str, Optional[FileSchema]]:
+    """
+    返回 {文件: FileSchema}，读不了的文件为 None（错误信息打印出来）
+    cache=None 时使用默认缓存文件；不想用缓存传 SchemaCache(None)
+    """
+    cache = SchemaCache() if cache is None else cache
+    results: Dict[str, Optional[FileSchema]] = {}
+    todo, n_hit = [], 0
+    for f in files:
+        if not os.path.isfile(f):
+            print(f"文件不存在: {f}")
+            results[f] = None
+            continue
+        schema = cache.get(f)
+        if schema is None:
+            todo.append(f)
+        else:
+            results[f] = schema
+            n_hit += 1
+
+    def scan_one(f):
+        try:
+            return f, read_schema(f), None
+        except (OSError, ValueError, KeyError, struct.error) as e:
+            return f, None, e
+
+    if todo:
+        with ThreadPoolExecutor(max_workers=max(1, workers)) as pool:
+            for f, schema, err in pool.map(scan_one, todo):
+                if err is not None:
+                    print(f"[scan_files] 读取失败 {f}: {err}")
+                    results[f] = None
+                    continue
+                results[f] = schema
+                cache.put(f, schema)
+        cache.save()
+
+    if verbose:
+        print(f"[scan_files] {len(files)} 个文件，缓存命中 {n_hit}，新读取 {len(todo)}")
+    return {f: results[f] for f in files}
+
+
+# =========================================================
+# 4. 输出
+# =========================================================
+def format_matrix(results: Dict[str, Optional[FileSchema]], var_names: Sequence[str],
+                  found: str = "Y", missing: str = ".") -> str:
+    """
+    文件 × 变量 的矩阵；最后一行为每个变量出现的文件数
+    """
+    labels = [os.path.basename(f) for f in results]
+    width = max([len(s) for s in labels] + [4])
+    col = max([len(v) for v in var_names] + [3])
+
+    lines = [" " * width + "  " + " ".join(v.rjust(col) for v in var_names)]
+    counts = [0] * len(var_names)
+    for label, schema in zip(labels, results.values()):
+        if schema is None:
+            lines.append(label.ljust(width) + "  " + "(读取失败)")
+            continue
+        cells = []
+        for k, v in enumerate(var_names):
+            ok = v in schema.variables
+            counts[k] += ok
+            cells.append((found if ok else missing).rjust(col))
+        lines.append(label.ljust(width) + "  " + " ".join(cells))
+    lines.append("-" * len(lines[0]))
+    lines.append("合计".ljust(width - 2) + "  " + " ".join(str(c).rjust(col) for c in counts))
+    return "\n".join(lines)
+
+
+def group_by_variables(results: Dict[str, Optional[FileSchema]], var_names: Sequence[str]) -> Dict[Tuple[str, ...], List[str]]:
+    """
+    按 var_names 中存在的变量组合分组：{存在的变量元组: [文件, ...]}
+    """
+    groups: Dict[Tuple[str, ...], List[str]] = {}
+    for f, schema in results.items():
+        if schema is None:
+            continue
+        key = tuple(v for v in var_names if v in schema.variables)
+        groups.setdefault(key, []).append(f)
+    return groups
@@ -0,0 +1,425 @@
+#!/usr/bin/env python3
+# -*- coding: utf-8 -*-
+
+"""
+台风“桦加沙”（Ragasa, 2025）路径识别与以台风为中心的统计：
+- 输入为 cdsapi.py 下载的 ERA5 逐小时单层场（msl, 10u, 10v, sst），GRIB / Zarr / netCDF 均可
+- 按时间分块读取（每块 TIME_CHUNK 个时次，只把这一块读进内存），一遍完成：
+  1) 在上一时刻位置（按前两个时刻的移动外推）附近找 MSLP 最低点作为中心，
+     搜索范围用格点的 KD 树（单位球面上的 cKDTree）按半径截取，不扫全场
+  2) 中心附近的最大 10 m 风速、最大风速半径、中心气压差（相对 500–800 km 环境气压）、
+     分象限的 7 / 10 / 12 级风圈半径、方位平均的风速和气压径向廓线
+  3) 以中心为原点截取 ±BOX_HALF_DEG 的 msl / 10 m 风速 / sst 小区域
+- 输出：路径表（CSV）、台风相对场与径向廓线（netCDF，含全过程合成平均）、路径图
+"""
+
+import warnings
+from pathlib import Path
+import numpy as np
+import pandas as pd
+import xarray as xr
+import matplotlib.pyplot as plt
+import cartopy.crs as ccrs
+import cartopy.feature as cfeature
+from scipy.spatial import cKDTree
+
+# ========= 固定配置 =========
+DATA_PATH = Path(__file__).resolve().parent / "ragasa.grib"   # cdsapi.py 下载的文件（.grib / .zarr / .nc）
+OUTDIR = Path(__file__).resolve().parent / "ragasa_output"
+TIME_CHUNK = 24                 # 每次读入的时次数
+
+# 初始位置：None 表示在 INIT_BOX 内取起始时刻的 MSLP 最低点
+INIT_TIME = None                # 如 "2025-09-18T00:00"
+INIT_LAT, INIT_LON = None, None
+INIT_BOX = (5.0, 30.0, 115.0, 165.0)   # lat_min, lat_max, lon_min, lon_max
+
+SEARCH_RADIUS_KM = 250.0        # 每小时在外推位置附近找中心的半径
+METRIC_RADIUS_KM = 500.0        # 最大风速 / 最大风速半径的统计范围
+ENV_RADII_KM = (500.0, 800.0)   # 环境气压的环形区域
+RADIAL_MAX_KM = 800.0           # 径向廓线与风圈半径的最大半径
+RADIAL_BIN_KM = 25.0
+WIND_RADII_MS = {"r7": 13.9, "r10": 24.5, "r12": 32.7}   # 7 / 10 / 12 级风下限
+QUADRANTS = ("ne", "se", "sw", "nw")
+
+MIN_DEFICIT_HPA = 2.0           # 中心气压差连续 MAX_WEAK 个时次低于该值即认为消散
+MAX_WEAK = 6
+BOX_HALF_DEG = 10.0             # 台风相对场的半宽（度）
+
+EARTH_RADIUS_KM = 6371.0
+# ======================================
+
+# 各变量在 GRIB（shortName）/ Zarr / netCDF 中可能的名字
+VAR_ALIASES = {
+    "msl": ("msl", "mean_sea_level_pressure", "MSL"),
+    "u10": ("10u", "u10", "10m_u_component_of_wind", "U10"),
+    "v10": ("10v", "v10", "10m_v_component_of_wind", "V10"),
+    "sst": ("sst", "sea_surface_temperature", "SST"),
+}
+
+
+# =========================
+# 读取
+# =========================
+def open_grib_var_shortname(path, shortname):
+    """按 shortName 过滤打开 GRIB 里的一个变量（与 src/ 下的脚本相同的做法）。"""
+    ds = xr.open_dataset(
+        path, engine="cfgrib",
+        backend_kwargs={"filter_by_keys": {"shortName": shortname}, "indexpath": ""},
+    )
+    da = ds[list(ds.data_vars)[0]]
+    da.name = shortname
+    return da
+
+def open_field(path, key):
+    """
+    打开一个变量（惰性，不读数据）：.grib/.grb 用 cfgrib，.zarr 用 open_zarr，其余按 netCDF；
+    统一成 (time, lat, lon)，经度 0–360 升序保持原样。找不到返回 None。
+    """
+    path = Path(path)
+    suffix = path.suffix.lower()
+    da = None
+    if suffix in (".grib", ".grb", ".grib2"):
+        for name in VAR_ALIASES[key]:
+            try:
+                da = open_grib_var_shortname(path, name)
+                break
+            except Exception:
+                continue
+    else:
+        ds = xr.open_zarr(path) if suffix == ".zarr" else xr.open_dataset(path)
+        for name in VAR_ALIASES[key]:
+            if name in ds.data_vars:
+                da = ds[name]
+                break
+    if da is None:
+        return None
+
+    rename = {k: v for k, v in (("latitude", "lat"), ("longitude", "lon"), ("valid_time", "time"))
+              if k in da.dims}
+    da = da.rename(rename)
+    # 去掉 number / step / surface 之类的单例维
+    for dim in list(da.dims):
+        if dim not in ("time", "lat", "lon") and da.sizes[dim] == 1:
+            da = da.isel({dim: 0}, drop=True)
+    return da.transpose("time", "lat", "lon")
+
+def open_era5(path):
+    """返回 {key: DataArray}；msl / u10 / v10 必须有，sst 可选。"""
+    fields = {}
+    for key in VAR_ALIASES:
+        da = open_field(path, key)
+        if da is None:
+            if key == "sst":
+                print("[WARN] 数据中没有 sst，跳过海温统计")
+                continue
+            raise RuntimeError(f"在 {path} 中没有找到变量 {key}（别名 {VAR_ALIASES[key]}）")
+        fields[key] = da
+    return fields
+
+def iter_time_chunks(fields, start=0, chunk=TIME_CHUNK):
+    """按时间分块读入：每次产出 (该块的时间, {key: ndarray (t, lat, lon)})。"""
+    times = fields["msl"]["time"].values
+    for a in range(start, len(times), chunk):
+        b = min(a + chunk, len(times))
+        block = {key: np.asarray(da.isel(time=slice(a, b)).values, dtype=np.float32)
+                 for key, da in fields.items()}
+        yield times[a:b], block
+
+
+# =========================
+# 球面几何与空间索引
+# =========================
+def to_xyz(lat, lon):
+    """经纬度（度）-> 单位球面三维坐标。"""
+    la, lo = np.radians(lat), np.radians(lon)
+    return np.stack([np.cos(la) * np.cos(lo), np.cos(la) * np.sin(lo), np.sin(la)], axis=-1)
+
+def chord(km):
+    """大圆距离 -> 单位球面弦长（KD 树的查询半径）。"""
+    return 2.0 * np.sin(km / EARTH_RADIUS_KM / 2.0)
+
+def distance_bearing(lat0, lon0, lat, lon):
+    """中心到各点的大圆距离（km）和方位角（度，正北为 0、顺时针）。"""
+    p0, l0, p, l = np.radians(lat0), np.radians(lon0), np.radians(lat), np.radians(lon)
+    dl = l - l0
+    a = np.sin((p - p0) / 2) ** 2 + np.cos(p0) * np.cos(p) * np.sin(dl / 2) ** 2
+    dist = 2.0 * EARTH_RADIUS_KM * np.arcsin(np.sqrt(np.clip(a, 0.0, 1.0)))
+    brg = np.degrees(np.arctan2(np.sin(dl) * np.cos(p),
+                                np.cos(p0) * np.sin(p) - np.sin(p0) * np.cos(p) * np.cos(dl))) % 360.0
+    return dist, brg
+
+class GridIndex:
+    """规则经纬网格点的 KD 树：按中心和半径取格点的一维下标。"""
+
+    def __init__(self, lat, lon):
+        self.lat = np.asarray(lat, dtype=np.float64)
+        self.lon = np.asarray(lon, dtype=np.float64)
+        self.nlat, self.nlon = len(self.lat), len(self.lon)
+        lon2d, lat2d = np.meshgrid(self.lon, self.lat)
+        self.lat_flat = lat2d.ravel()
+        self.lon_flat = lon2d.ravel()
+        self.tree = cKDTree(to_xyz(self.lat_flat, self.lon_flat))
+
+    def query(self, lat, lon, radius_km):
+        idx = self.tree.query_ball_point(to_xyz(lat, lon), chord(radius_km), return_sorted=False)
+        return np.asarray(idx, dtype=np.int64)
+
+    def nearest(self, lat, lon):
+        return int(self.tree.query(to_xyz(lat, lon))[1])
+
+    def on_edge(self, idx):
+        j, i = divmod(int(idx), self.nlon)
+        return j in (0, self.nlat - 1) or i in (0, self.nlon - 1)
+
+
+# =========================
+# 单个时次的中心与指标
+# =========================
+def find_center(msl_flat, index, guess_lat, guess_lon, radius_km=SEARCH_RADIUS_KM):
+    """在猜测位置半径内找 MSLP 最低的格点，返回一维下标（找不到为 -1）。"""
+    idx = index.query(guess_lat, guess_lon, radius_km)
+    if idx.size == 0:
+        return -1
+    vals = msl_flat[idx]
+    if not np.isfinite(vals).any():
+        return -1
+    return int(idx[np.nanargmin(vals)])
+
+def storm_metrics(center, msl_flat, wspd_flat, sst_flat, index):
+    """
+    中心附近的指标：中心气压、气压差、最大风速及其半径、分象限风圈半径、径向廓线、中心海温
+    （距离和方位只对 RADIAL_MAX_KM 内的格点算）
+    """
+    clat, clon = index.lat_flat[center], index.lon_flat[center]
+    idx = index.query(clat, clon, RADIAL_MAX_KM)
+    dist, brg = distance_bearing(clat, clon, index.lat_flat[idx], index.lon_flat[idx])
+    msl, wspd = msl_flat[idx], wspd_flat[idx]
+
+    out = {"lat": clat, "lon": clon, "msl_hpa": msl_flat[center] / 100.0}
+
+    env = (dist >= ENV_RADII_KM[0]) & (dist <= ENV_RADII_KM[1])
+    out["deficit_hpa"] = (np.nanmean(msl[env]) - msl_flat[center]) / 100.0 if env.any() else np.nan
+
+    inner = (dist <= METRIC_RADIUS_KM) & np.isfinite(wspd)
+    if inner.any():
+        k = np.argmax(np.where(inner, wspd, -np.inf))
+        out["vmax_ms"], out["rmw_km"] = float(wspd[k]), float(dist[k])
+    else:
+        out["vmax_ms"], out["rmw_km"] = np.nan, np.nan
+
+    # 分象限风圈：该象限内风速达到阈值的最远距离（没有则为 0）
+    quad = (brg // 90.0).astype(np.int64) % 4
+    for name, thr in WIND_RADII_MS.items():
+        radius = np.zeros(4)
+        hit = wspd >= thr
+        np.maximum.at(radius, quad[hit], dist[hit])
+        for q, label in enumerate(QUADRANTS):
+            out[f"{name}_{label}_km"] = radius[q]
+
+    # 方位平均的径向廓线
+    nbin = int(np.ceil(RADIAL_MAX_KM / RADIAL_BIN_KM))
+    b = np.minimum((dist // RADIAL_BIN_KM).astype(np.int64), nbin - 1)
+    ok = np.isfinite(wspd) & np.isfinite(msl)
+    count = np.bincount(b[ok], minlength=nbin).astype(np.float64)
+    with np.errstate(invalid="ignore", divide="ignore"):
+        out["wspd_profile"] = np.bincount(b[ok], weights=wspd[ok], minlength=nbin) / count
+        out["msl_profile"] = np.bincount(b[ok], weights=msl[ok], minlength=nbin) / count / 100.0
+
+    if sst_flat is not None:
+        near = (dist <= 100.0) & np.isfinite(sst_flat[idx])
+        out["sst_c"] = float(np.mean(sst_flat[idx][near]) - 273.15) if near.any() else np.nan
+    return out
+
+def extract_box(field2d, j, i, half_j, half_i):
+    """以 (j, i) 为中心截取 (2*half_j+1, 2*half_i+1) 的小区域，出界部分为 NaN。"""
+    ny, nx = field2d.shape
+    out = np.full((2 * half_j + 1, 2 * half_i + 1), np.nan, dtype=np.float32)
+    j0, j1 = max(j - half_j, 0), min(j + half_j + 1, ny)
+    i0, i1 = max(i - half_i, 0), min(i + half_i + 1, nx)
+    out[j0 - (j - half_j):j1 - (j - half_j), i0 - (i - half_i):i1 - (i - half_i)] = field2d[j0:j1, i0:i1]
+    return out
+
+
+# =========================
+# 整个过程一遍完成
+# =========================
+def initial_position(msl2d, index):
+    """INIT_LAT/LON 给定时直接用，否则取 INIT_BOX 内 MSLP 最低点。"""
+    if INIT_LAT is not None and INIT_LON is not None:
+        return float(INIT_LAT), float(INIT_LON)
+    lat_min, lat_max, lon_min, lon_max = INIT_BOX
+    lat_ok = (index.lat >= lat_min) & (index.lat <= lat_max)
+    lon_ok = (index.lon >= lon_min) & (index.lon <= lon_max)
+    sub = np.where(lat_ok[:, None] & lon_ok[None, :], msl2d, np.nan)
+    j, i = np.unravel_index(np.nanargmin(sub), sub.shape)
+    return float(index.lat[j]), float(index.lon[i])
+
+def track_storm(fields):
+    """
+    按时间分块读入，逐时次跟踪（后一时次依赖前一时次的位置，时间方向只能顺序做）；
+    返回 (路径表 DataFrame, 台风相对场与廓线 xr.Dataset)
+    """
+    lat = fields["msl"]["lat"].values
+    lon = fields["msl"]["lon"].values
+    index = GridIndex(lat, lon)
+    dlat = abs(float(lat[1] - lat[0]))
+    dlon = abs(float(lon[1] - lon[0]))
+    half_j, half_i = int(round(BOX_HALF_DEG / dlat)), int(round(BOX_HALF_DEG / dlon))
+    lat_desc = lat[0] > lat[-1]
+
+    all_times = fields["msl"]["time"].values
+    start = 0
+    if INIT_TIME is not None:
+        start = int(np.searchsorted(all_times, np.datetime64(INIT_TIME)))
+
+    rows, boxes, profiles = [], {k: [] for k in ("msl", "wspd", "sst")}, {"wspd": [], "msl": []}
+    prev, prev2 = None, None
+    n_weak = 0
+    finished = False
+
+    for times, block in iter_time_chunks(fields, start):
+        for k, t in enumerate(times):
+            msl2d = block["msl"][k]
+            wspd2d = np.hypot(block["u10"][k], block["v10"][k])
+            sst2d = block["sst"][k] if "sst" in block else None
+
+            if prev is None:
+                guess = initial_position(msl2d, index)
+            elif prev2 is None:
+                guess = prev
+            else:
+                # 按前两个时次的移动线性外推
+                guess = (2 * prev[0] - prev2[0], 2 * prev[1] - prev2[1])
+
+            center = find_center(msl2d.ravel(), index, *guess)
+            if center < 0 or index.on_edge(center):
+                print(f"[{np.datetime_as_string(t, unit='h')}] 中心离开数据范围，停止跟踪")
+                finished = True
+                break
+
+            m = storm_metrics(center, msl2d.ravel(), wspd2d.ravel(),
+                              None if sst2d is None else sst2d.ravel(), index)
+            n_weak = n_weak + 1 if not (m["deficit_hpa"] >= MIN_DEFICIT_HPA) else 0
+            if n_weak >= MAX_WEAK:
+                print(f"[{np.datetime_as_string(t, unit='h')}] 中心气压差连续 {MAX_WEAK} 个时次 "
+                      f"< {MIN_DEFICIT_HPA} hPa，认为已消散")
+                finished = True
+                break
+
+            j, i = divmod(center, index.nlon)
+            for key, f2d in (("msl", msl2d / 100.0), ("wspd", wspd2d), ("sst", sst2d)):
+                if f2d is None:
+                    continue
+                box = extract_box(f2d, j, i, half_j, half_i)
+                boxes[key].append(box[::-1] if lat_desc else box)     # 统一成纬度向北递增
+            profiles["wspd"].append(m.pop("wspd_profile"))
+            profiles["msl"].append(m.pop("msl_profile"))
+            m["time"] = t
+            rows.append(m)
+
+            prev2, prev = prev, (m["lat"], m["lon"])
+            print(f"[{np.datetime_as_string(t, unit='h')}] {m['lat']:6.2f}N {m['lon']:7.2f}E  "
+                  f"{m['msl_hpa']:7.1f} hPa  Vmax {m['vmax_ms']:5.1f} m/s  RMW {m['rmw_km']:5.0f} km")
+        if finished:
+            break
+
+    if not rows:
+        raise RuntimeError("没有识别到任何台风中心")
+
+    # 末尾的弱时次不算在路径里
+    while len(rows) > 1 and not (rows[-1]["deficit_hpa"] >= MIN_DEFICIT_HPA):
+        rows.pop()
+        for v in list(boxes.values()) + list(profiles.values()):
+            if len(v) > len(rows):
+                v.pop()
+
+    track = pd.DataFrame(rows).set_index("time")
+    # 移动速度（km/h）和移向（度）
+    dist, brg = distance_bearing(track["lat"].values[:-1], track["lon"].values[:-1],
+                                 track["lat"].values[1:], track["lon"].values[1:])
+    hours = np.diff(track.index.values).astype("timedelta64[s]").astype(np.float64) / 3600.0
+    track["speed_kmh"] = np.concatenate([[np.nan], dist / hours])
+    track["heading_deg"] = np.concatenate([[np.nan], brg])
+
+    radius = (np.arange(len(profiles["wspd"][0])) + 0.5) * RADIAL_BIN_KM
+    rel_lat = np.arange(-half_j, half_j + 1) * dlat
+    rel_lon = np.arange(-half_i, half_i + 1) * dlon
+    ds = xr.Dataset(
+        coords={"time": track.index.values, "dlat": rel_lat, "dlon": rel_lon, "radius": radius},
+        attrs={"description": "以台风中心为原点的 ERA5 场（中心 = 搜索半径内 MSLP 最低格点）",
+               "search_radius_km": SEARCH_RADIUS_KM, "radial_bin_km": RADIAL_BIN_KM},
+    )
+    units = {"msl": "hPa", "wspd": "m s-1", "sst": "K"}
+    with warnings.catch_warnings():
+        # 靠近数据边界时小区域外缘全是 NaN
+        warnings.simplefilter("ignore", RuntimeWarning)
+        for key, stack in boxes.items():
+            if stack:
+                arr = np.stack(stack)
+                ds[key] = (("time", "dlat", "dlon"), arr, {"units": units[key]})
+                # 全过程合成（台风相对坐标下的平均 / 最大）
+                ds[f"{key}_mean"] = (("dlat", "dlon"), np.nanmean(arr, axis=0), {"units": units[key]})
+        ds["wspd_max"] = (("dlat", "dlon"), np.nanmax(ds["wspd"].values, axis=0), {"units": "m s-1"})
+    ds["wspd_profile"] = (("time", "radius"), np.stack(profiles["wspd"]), {"units": "m s-1"})
+    ds["msl_profile"] = (("time", "radius"), np.stack(profiles["msl"]), {"units": "hPa"})
+    for col in track.columns:
+        ds[f"track_{col}"] = ("time", track[col].values)
+    return track, ds
+
+
+# =========================
+# 画图
+# =========================
+def plot_track(track, ds, out_png):
+    proj = ccrs.PlateCarree()
+    fig = plt.figure(figsize=(15, 6), dpi=150)
+
+    ax1 = fig.add_subplot(1, 2, 1, projection=proj)
+    ax1.coastlines(resolution="50m", linewidth=0.6)
+    ax1.add_feature(cfeature.BORDERS, linewidth=0.4)
+    ax1.gridlines(draw_labels=True, linewidth=0.3, alpha=0.4)
+    ax1.plot(track["lon"], track["lat"], "-", color="gray", linewidth=0.8, transform=proj)
+    sc = ax1.scatter(track["lon"], track["lat"], c=track["msl_hpa"], cmap="RdBu", s=12, transform=proj)
+    plt.colorbar(sc, ax=ax1, pad=0.02, aspect=30).set_label("Center MSLP (hPa)")
+    pad = 5.0
+    ax1.set_extent([track["lon"].min() - pad, track["lon"].max() + pad,
+                    track["lat"].min() - pad, track["lat"].max() + pad], crs=proj)
+    t0 = np.datetime_as_string(track.index.values[0], unit="h")
+    t1 = np.datetime_as_string(track.index.values[-1], unit="h")
+    ax1.set_title(f"Ragasa track (ERA5)  {t0} ~ {t1}")
+
+    ax2 = fig.add_subplot(1, 2, 2)
+    cf = ax2.contourf(ds["dlon"], ds["dlat"], ds["wspd_mean"], levels=20, cmap="viridis")
+    plt.colorbar(cf, ax=ax2, pad=0.02, aspect=30).set_label("10 m wind speed (m/s)")
+    cs = ax2.contour(ds["dlon"], ds["dlat"], ds["msl_mean"], levels=12, colors="k", linewidths=0.5)
+    ax2.clabel(cs, fmt="%.0f", inline=True, fontsize=6)
+    ax2.set_aspect("equal")
+    ax2.set_xlabel("Longitude offset (deg)")
+    ax2.set_ylabel("Latitude offset (deg)")
+    ax2.set_title("Storm-centered composite: 10 m wind + MSLP")
+
+    fig.tight_layout()
+    fig.savefig(out_png, bbox_inches="tight")
+    plt.close(fig)
+
+def main():
+    OUTDIR.mkdir(parents=True, exist_ok=True)
+    fields = open_era5(DATA_PATH)
+    print("[DATA]", DATA_PATH, {k: tuple(da.shape) for k, da in fields.items()})
+
+    track, ds = track_storm(fields)
+
+    track.to_csv(OUTDIR / "ragasa_track.csv", float_format="%.3f")
+    ds.to_netcdf(OUTDIR / "ragasa_storm_relative.nc")
+    plot_track(track, ds, OUTDIR / "ragasa_track.png")
+
+    best = track["msl_hpa"].idxmin()
+    print(f"[PEAK] {np.datetime_as_string(np.datetime64(best), unit='h')}  "
+          f"{track.loc[best, 'msl_hpa']:.1f} hPa  Vmax {track['vmax_ms'].max():.1f} m/s")
+    print("Saved:",
+          OUTDIR / "ragasa_track.csv",
+          OUTDIR / "ragasa_storm_relative.nc",
+          OUTDIR / "ragasa_track.png")
+
+if __name__ == "__main__":
+    main()